@@ -0,0 +1,725 @@
+"""
+Vectorised payroll calculations.
+
+Computes gross income, PAYE, NI, deductions and net income for a whole
+payroll in one call using NumPy arrays. Every figure matches the scalar
+methods of EmployeeSalaryInfo to the penny, including which rows are
+flagged as invalid.
+
+The get*Batch functions mirror the EmployeeSalaryInfo get methods,
+writing values, statuses and small integer error codes into reusable
+ResultBuffer arrays rather than one FloatSuccessType per figure.
+
+EmployeeBatch stores a payroll column by column so millions of employees
+cost a few contiguous arrays rather than one object each.
+"""
+
+import numpy as np
+
+from income_calculator import EmployeeSalaryInfo, FloatSuccessType, \
+    getYearSchedule
+
+
+class FloatArraySuccessType:
+    """Array counterpart of FloatSuccessType, one value and status per row"""
+    def __init__(self, value, status):
+        self.value = value
+        self.status = status
+
+    def __len__(self):
+        return len(self.value)
+
+    def __repr__(self):
+        return f'FloatArraySuccessType(value={self.value!r}, '\
+               f'status={self.status!r})'
+
+
+# error codes held by ResultBuffer.error, index into errorMessages
+errorMessages = (
+    '',
+    "Value not valid",
+    "Taxable income invalid",
+    "Year not valid",
+    'Post tax expenses invalid',
+)
+errorCodes = {message: code for code, message in enumerate(errorMessages)}
+
+
+class ResultBuffer:
+    """
+    Preallocated value, status and error code arrays for one figure
+
+    The batch get functions write into a ResultBuffer in place, so a
+    payroll run reuses a few arrays instead of creating a FloatSuccessType
+    per figure. Messages are only looked up when asked for.
+    """
+    __slots__ = ('value', 'status', 'error')
+
+    def __init__(self, size):
+        self.value = np.zeros(size)
+        self.status = np.zeros(size, dtype=bool)
+        self.error = np.zeros(size, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.value)
+
+    def message(self, row):
+        """Return the FloatSuccessType message for row"""
+        return errorMessages[self.error[row]]
+
+    def result(self, row):
+        """Return row as a FloatSuccessType"""
+        return FloatSuccessType(
+            float(self.value[row]), bool(self.status[row]), self.message(row)
+        )
+
+    def _fail(self, failed, code):
+        """Zero and flag rows in failed which have no error yet"""
+        failed = failed & (self.error == 0)
+        np.copyto(self.error, code, where=failed)
+        np.copyto(self.value, 0.0, where=failed)
+        self.status &= ~failed
+
+
+def _resultBuffer(out, shape):
+    """Return out cleared for reuse, or a new ResultBuffer of shape"""
+    if out is None:
+        out = ResultBuffer(shape)
+    elif out.value.shape != shape:
+        raise ValueError(
+            f'ResultBuffer has shape {out.value.shape}, expected {shape}'
+        )
+
+    out.status.fill(True)
+    out.error.fill(0)
+    return out
+
+
+class BatchResult:
+    """Per-row results of a batch payroll calculation"""
+    fields = ('grossIncome', 'payePaid', 'niPaid', 'pension', 'deductions',
+              'netIncome')
+
+    def __init__(self, grossIncome, payePaid, niPaid, pension, deductions,
+                 netIncome):
+        self.grossIncome = grossIncome
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.pension = pension
+        self.deductions = deductions
+        self.netIncome = netIncome
+
+    def __len__(self):
+        return len(self.netIncome)
+
+    def take(self, rows):
+        """Return the results for an array of row indices"""
+        return BatchResult(*(
+            FloatArraySuccessType(
+                getattr(self, field).value[rows],
+                getattr(self, field).status[rows],
+            )
+            for field in self.fields
+        ))
+
+    @classmethod
+    def concatenate(cls, results):
+        """Join results of consecutive row ranges into one BatchResult"""
+        results = list(results)
+
+        return cls(*(
+            FloatArraySuccessType(
+                np.concatenate(
+                    [getattr(result, field).value for result in results]
+                ),
+                np.concatenate(
+                    [getattr(result, field).status for result in results]
+                ),
+            )
+            for field in cls.fields
+        ))
+
+
+def roundPennies(values, out=None):
+    """
+    Round an array to 2 decimal places exactly as the builtin round does
+
+    np.round scales by 100 before rounding, which can land on the other
+    side of a half-penny tie than round() does on the original double.
+    Only values that sit next to a tie are re-rounded in Python. out may
+    be values itself to round in place.
+    """
+    values = np.asarray(values, dtype=np.float64)
+
+    scaled = values * 100.0
+    with np.errstate(invalid='ignore'):
+        nearTie = np.abs(scaled - np.floor(scaled) - 0.5) \
+                  <= np.abs(scaled) * 1e-15 + 1e-9
+    ties = np.flatnonzero(nearTie)
+    tieValues = values.flat[ties].tolist()  # kept before out may overwrite
+
+    rounded = np.round(values, 2, out=out)
+    for index, value in zip(ties, tieValues):
+        rounded.flat[index] = round(value, 2)
+
+    return rounded
+
+
+def isArrayValid(values):
+    """Array counterpart of isFloatValid, True where a value is not negative"""
+    with np.errstate(invalid='ignore'):
+        return ~(values < 0)
+
+
+def scheduleArrays(schedule):
+    """Return a TaxSchedule as thresholds, rates and cumulative arrays"""
+    return (
+        np.asarray(schedule.thresholds, dtype=np.float64),
+        np.asarray(schedule.rates, dtype=np.float64),
+        np.asarray(schedule.cumulative, dtype=np.float64),
+    )
+
+
+def _taxDue(incomeTaxable, thresholds, rates, cumulative):
+    """Return unrounded tax due on each income, see TaxSchedule.taxDue"""
+    if len(thresholds) == 0:
+        return np.zeros(np.shape(incomeTaxable))
+
+    band = np.searchsorted(thresholds, incomeTaxable, side='left') - 1
+    inBand = band >= 0
+    band = np.maximum(band, 0)
+
+    taxPaid = cumulative[band] \
+              + (incomeTaxable - thresholds[band]) * rates[band]
+
+    return np.where(inBand, taxPaid, 0.0)
+
+
+def pensionBatch(year, incomeTaxable, percentage, post_tax=False):
+    """
+    Return the pension addPension would deduct for each taxable income
+
+    Raises KeyError when year has no pension band.
+    """
+    pensionBand = getYearSchedule(year).pensionBand
+    if pensionBand is None:
+        raise KeyError(year)
+
+    lower_band, upper_band = pensionBand
+    pensionable_earnings = np.minimum(
+        np.maximum(np.asarray(incomeTaxable, dtype=np.float64) - lower_band,
+                   0.0),
+        upper_band - lower_band
+    )
+    pension = pensionable_earnings * (percentage/100)
+    if post_tax:
+        pension *= 0.8
+
+    return pension
+
+
+def _asColumn(values, size):
+    """Return values as a float64 array, zeros when not given"""
+    if values is None:
+        return np.zeros(size)
+
+    return np.asarray(values, dtype=np.float64)
+
+
+def distinctRows(*columns):
+    """
+    Return (first, inverse) for the distinct rows across 1-D columns
+
+    first indexes one row per distinct combination of values and inverse
+    maps every row to its position in first. Each column is reduced to
+    integer codes and the codes combined into one key, which is much
+    faster than a row-wise np.unique(axis=0).
+    """
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    count = 1
+    for column in columns:
+        if not len(column) or column.min() == column.max():
+            continue  # one value, nothing to tell rows apart
+
+        values, codes = np.unique(column, return_inverse=True)
+        if count * len(values) >= 2**62:
+            _, key = np.unique(key, return_inverse=True)
+            count = int(key.max()) + 1
+        key = key * len(values) + codes
+        count *= len(values)
+
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    return first, inverse
+
+
+def calculateBatch(year, incomeTaxable, incomeNonTaxable=None,
+                   expensePreTax=None, expensePostTax=None, percentage=0.0,
+                   pre_tax=False, post_tax=False, deduplicate=False):
+    """
+    Return gross, PAYE, NI, pension, deductions and net for every row
+
+    A pension percentage is applied to every row as calculatePayslip
+    does, added to the row's expenses rather than replacing them, without
+    changing the input arrays. With deduplicate, identical
+    rows are collapsed first and each distinct row is computed once.
+    """
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+    size = incomeTaxable.shape
+    incomeNonTaxable, expensePreTax, expensePostTax = np.broadcast_arrays(
+        _asColumn(incomeNonTaxable, size),
+        _asColumn(expensePreTax, size),
+        _asColumn(expensePostTax, size),
+    )
+
+    if deduplicate:
+        columns = [
+            np.broadcast_to(column, size).reshape(-1)
+            for column in (incomeTaxable, incomeNonTaxable, expensePreTax,
+                           expensePostTax)
+        ]
+        first, inverse = distinctRows(*columns)
+        result = calculateBatch(
+            year, *(column[first] for column in columns),
+            percentage=percentage, pre_tax=pre_tax, post_tax=post_tax
+        )
+        return result.take(inverse.reshape(size))
+
+    validTaxable = isArrayValid(incomeTaxable)
+    validPreTax = isArrayValid(expensePreTax)
+
+    grossStatus = validTaxable & isArrayValid(incomeNonTaxable)
+    grossIncome = np.where(
+        grossStatus,
+        roundPennies(incomeTaxable + incomeNonTaxable),
+        0.0
+    )
+
+    try:
+        schedule = getYearSchedule(year)
+    except KeyError:
+        schedule = None
+    yearValid = schedule is not None
+
+    pension = np.zeros(size)
+    if percentage and yearValid:
+        yearValid = post_tax != pre_tax and \
+            0 <= percentage <= 100 and \
+            schedule.pensionBand is not None
+        if yearValid:
+            pension = pensionBatch(year, incomeTaxable, percentage, post_tax)
+            if post_tax:
+                expensePostTax = expensePostTax + pension
+            else:
+                expensePreTax = expensePreTax + pension
+
+    taxStatus = validTaxable & validPreTax & (incomeTaxable > expensePreTax)
+    if not yearValid:
+        taxStatus = np.zeros(size, dtype=bool)
+    taxableIncome = np.where(taxStatus, incomeTaxable - expensePreTax, 0.0)
+
+    if yearValid:
+        paye = scheduleArrays(schedule.paye)
+        ni = scheduleArrays(schedule.ni)
+        payePaid = np.where(
+            taxStatus, roundPennies(_taxDue(taxableIncome, *paye)), 0.0
+        )
+        niPaid = np.where(
+            taxStatus, roundPennies(_taxDue(taxableIncome, *ni)), 0.0
+        )
+    else:
+        payePaid = np.zeros(size)
+        niPaid = np.zeros(size)
+
+    deductionsStatus = taxStatus & isArrayValid(expensePostTax)
+    deductions = np.where(
+        deductionsStatus,
+        roundPennies(payePaid + niPaid + expensePostTax + expensePreTax),
+        0.0
+    )
+
+    netStatus = grossStatus & deductionsStatus
+    netIncome = np.where(
+        netStatus, roundPennies(grossIncome - deductions), 0.0
+    )
+
+    return BatchResult(
+        FloatArraySuccessType(grossIncome, grossStatus),
+        FloatArraySuccessType(payePaid, taxStatus),
+        FloatArraySuccessType(niPaid, taxStatus),
+        FloatArraySuccessType(
+            np.where(taxStatus, roundPennies(pension), 0.0), taxStatus
+        ),
+        FloatArraySuccessType(deductions, deductionsStatus),
+        FloatArraySuccessType(netIncome, netStatus),
+    )
+
+
+def getGrossIncomeBatch(incomeTaxable, incomeNonTaxable=None, out=None):
+    """Write getGrossIncome for every row into out, a ResultBuffer"""
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+    incomeNonTaxable = _asColumn(incomeNonTaxable, incomeTaxable.shape)
+    out = _resultBuffer(out, incomeTaxable.shape)
+
+    np.add(incomeTaxable, incomeNonTaxable, out=out.value)
+    roundPennies(out.value, out=out.value)
+    out._fail(
+        ~(isArrayValid(incomeTaxable) & isArrayValid(incomeNonTaxable)),
+        errorCodes["Value not valid"]
+    )
+    return out
+
+
+def _taxBatch(year, field, incomeTaxable, expensePreTax, out):
+    """Write PAYE or NI, as getPAYEPaid and getNIPaid do, into out"""
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+    expensePreTax = _asColumn(expensePreTax, incomeTaxable.shape)
+    out = _resultBuffer(out, incomeTaxable.shape)
+
+    with np.errstate(invalid='ignore'):
+        np.greater(incomeTaxable, expensePreTax, out=out.status)
+    out.status &= isArrayValid(incomeTaxable) & isArrayValid(expensePreTax)
+    out._fail(~out.status, errorCodes["Taxable income invalid"])
+
+    try:
+        schedule = getattr(getYearSchedule(year), field)
+    except KeyError:
+        out._fail(out.status.copy(), errorCodes["Year not valid"])
+        return out
+
+    np.subtract(incomeTaxable, expensePreTax, out=out.value)
+    np.copyto(out.value, 0.0, where=~out.status)
+    out.value[...] = _taxDue(out.value, *scheduleArrays(schedule))
+    roundPennies(out.value, out=out.value)
+    np.copyto(out.value, 0.0, where=~out.status)
+    return out
+
+
+def getPAYEPaidBatch(year, incomeTaxable, expensePreTax=None, out=None):
+    """Write getPAYEPaid for every row into out, a ResultBuffer"""
+    return _taxBatch(year, 'paye', incomeTaxable, expensePreTax, out)
+
+
+def getNIPaidBatch(year, incomeTaxable, expensePreTax=None, out=None):
+    """Write getNIPaid for every row into out, a ResultBuffer"""
+    return _taxBatch(year, 'ni', incomeTaxable, expensePreTax, out)
+
+
+def getDeductionsBatch(year, incomeTaxable, expensePreTax=None,
+                       expensePostTax=None, out=None, scratch=None):
+    """
+    Write getDeductions for every row into out, a ResultBuffer
+
+    NI is worked in scratch, a second ResultBuffer of the same shape, so
+    a caller passing both allocates nothing per call.
+    """
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+    expensePreTax = _asColumn(expensePreTax, incomeTaxable.shape)
+    expensePostTax = _asColumn(expensePostTax, incomeTaxable.shape)
+
+    out = _taxBatch(year, 'paye', incomeTaxable, expensePreTax, out)
+    niPaid = _taxBatch(year, 'ni', incomeTaxable, expensePreTax, scratch)
+
+    out.value += niPaid.value
+    out.value += expensePostTax
+    out.value += expensePreTax
+    roundPennies(out.value, out=out.value)
+    out._fail(
+        ~isArrayValid(expensePostTax), errorCodes['Post tax expenses invalid']
+    )
+    np.copyto(out.value, 0.0, where=~out.status)
+    return out
+
+
+def getNetIncomeBatch(year, incomeTaxable, incomeNonTaxable=None,
+                      expensePreTax=None, expensePostTax=None, out=None,
+                      scratch=None):
+    """
+    Write getNetIncome for every row into out, a ResultBuffer
+
+    NI and then gross income are worked in scratch, as for
+    getDeductionsBatch.
+    """
+    out = getDeductionsBatch(
+        year, incomeTaxable, expensePreTax, expensePostTax, out, scratch
+    )
+    grossIncome = getGrossIncomeBatch(
+        incomeTaxable, incomeNonTaxable, scratch
+    )
+
+    # gross income is checked first, so its error wins
+    failed = ~grossIncome.status
+    np.copyto(out.error, grossIncome.error, where=failed)
+    out.status &= grossIncome.status
+
+    np.subtract(grossIncome.value, out.value, out=out.value)
+    roundPennies(out.value, out=out.value)
+    np.copyto(out.value, 0.0, where=~out.status)
+    return out
+
+
+class YearMatrixResult:
+    """
+    Results of a batch of employees across several years
+
+    Every field holds FloatArraySuccessType arrays shaped
+    (employees, years), with columns in the order of years.
+    """
+    def __init__(self, years, results):
+        self.years = tuple(years)
+        for field in BatchResult.fields:
+            setattr(self, field, FloatArraySuccessType(
+                np.stack(
+                    [getattr(result, field).value for result in results],
+                    axis=-1
+                ),
+                np.stack(
+                    [getattr(result, field).status for result in results],
+                    axis=-1
+                ),
+            ))
+
+    def column(self, year):
+        """Return the index of year in the result columns"""
+        return self.years.index(year)
+
+
+def calculateYears(years, incomeTaxable, incomeNonTaxable=None,
+                   expensePreTax=None, expensePostTax=None, percentage=0.0,
+                   pre_tax=False, post_tax=False):
+    """
+    Return calculateBatch for every year as (employees, years) matrices
+
+    Each year works from the same inputs, so pensions for one year never
+    leak into the expenses used for another.
+    """
+    years = list(years)
+    return YearMatrixResult(years, [
+        calculateBatch(
+            year, incomeTaxable, incomeNonTaxable, expensePreTax,
+            expensePostTax, percentage, pre_tax, post_tax
+        )
+        for year in years
+    ])
+
+
+def _rowField(name):
+    """Attribute reading and writing one cell of an EmployeeBatch column"""
+    def getter(self):
+        return float(self._batch.column(name)[self._row])
+
+    def setter(self, value):
+        self._batch.column(name)[self._row] = value
+        self._invalidate(name)
+
+    return property(getter, setter)
+
+
+class EmployeeRow(EmployeeSalaryInfo):
+    """
+    EmployeeSalaryInfo view of one EmployeeBatch row
+
+    Reads and writes go straight to the batch columns, so columns only
+    hold numbers and assigning anything else raises ValueError. A row can
+    change through another view or the columns themselves, so views
+    work results out on every call rather than memoising them.
+    """
+    incomeTaxable = _rowField('incomeTaxable')
+    incomeNonTaxable = _rowField('incomeNonTaxable')
+    expensePreTax = _rowField('expensePreTax')
+    expensePostTax = _rowField('expensePostTax')
+
+    getGrossIncome = EmployeeSalaryInfo.getGrossIncome.__wrapped__
+    getPAYEPaid = EmployeeSalaryInfo.getPAYEPaid.__wrapped__
+    getNIPaid = EmployeeSalaryInfo.getNIPaid.__wrapped__
+    computePayslip = EmployeeSalaryInfo.computePayslip.__wrapped__
+    getDeductions = EmployeeSalaryInfo.getDeductions.__wrapped__
+    getNetIncome = EmployeeSalaryInfo.getNetIncome.__wrapped__
+
+    def __init__(self, batch, row):
+        self._batch = batch
+        self._row = row
+        self._initState()
+
+    def addEvent(self, year, effective, field, annualAmount):
+        """
+        Return False, a view is not kept so could not keep an event
+
+        Use an EmployeeSalaryInfo, or MonthlyPayroll for a whole batch.
+        """
+        return False
+
+    def getPeriodPayslips(self, year):
+        """Return the PeriodPayslips of year from the row's current values"""
+        self._periodPayslips.pop(year, None)
+        return super().getPeriodPayslips(year)
+
+    @property
+    def employee_name(self):
+        return self._batch.names[self._row]
+
+    @employee_name.setter
+    def employee_name(self, value):
+        self._batch.names[self._row] = value
+
+
+class EmployeeBatch:
+    """Columnar store of employee names, incomes and expenses"""
+    columns = (
+        'incomeTaxable', 'incomeNonTaxable', 'expensePreTax', 'expensePostTax'
+    )
+
+    def __init__(self, capacity=1024):
+        self.names = []
+        self._size = 0
+        self._columns = {
+            name: np.zeros(max(capacity, 1)) for name in self.columns
+        }
+
+    @classmethod
+    def fromEmployees(cls, employees):
+        """Build a batch from EmployeeSalaryInfo objects"""
+        employees = list(employees)
+        batch = cls(len(employees))
+        batch.extend(
+            [e.employee_name for e in employees],
+            **{
+                name: [getattr(e, name) for e in employees]
+                for name in cls.columns
+            }
+        )
+        return batch
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError('EmployeeBatch index out of range')
+
+        return EmployeeRow(self, row)
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield EmployeeRow(self, row)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the numeric columns"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def column(self, name):
+        """Return the filled part of a column as an array view"""
+        return self._columns[name][:self._size]
+
+    def _reserve(self, size):
+        """Grow every column to hold at least size rows"""
+        capacity = len(self._columns['incomeTaxable'])
+        if size <= capacity:
+            return
+
+        capacity = max(size, capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def append(self, employee_name, incomeTaxable=0.0, incomeNonTaxable=0.0,
+               expensePreTax=0.0, expensePostTax=0.0):
+        """Add one employee and return its row view"""
+        self._reserve(self._size + 1)
+        row = self._size
+
+        self._columns['incomeTaxable'][row] = incomeTaxable
+        self._columns['incomeNonTaxable'][row] = incomeNonTaxable
+        self._columns['expensePreTax'][row] = expensePreTax
+        self._columns['expensePostTax'][row] = expensePostTax
+        self.names.append(employee_name)
+        self._size += 1
+
+        return EmployeeRow(self, row)
+
+    def extend(self, names, incomeTaxable=None, incomeNonTaxable=None,
+               expensePreTax=None, expensePostTax=None):
+        """Add many employees at once from lists or arrays"""
+        names = list(names)
+        values = {
+            'incomeTaxable': incomeTaxable,
+            'incomeNonTaxable': incomeNonTaxable,
+            'expensePreTax': expensePreTax,
+            'expensePostTax': expensePostTax,
+        }
+        for name, column in values.items():
+            if column is not None and len(column) != len(names):
+                raise ValueError(
+                    f'{name} has {len(column)} values for {len(names)} names'
+                )
+
+        start = self._size
+        self._reserve(start + len(names))
+        for name, column in values.items():
+            if column is not None:
+                self._columns[name][start:start + len(names)] = column
+
+        self.names.extend(names)
+        self._size += len(names)
+        return True
+
+    def calculate(self, year, percentage=0.0, pre_tax=False,
+                  post_tax=False, deduplicate=False):
+        """Return calculateBatch results for every employee"""
+        return calculateBatch(
+            year,
+            *(self.column(name) for name in self.columns),
+            percentage=percentage,
+            pre_tax=pre_tax,
+            post_tax=post_tax,
+            deduplicate=deduplicate,
+        )
+
+    def getGrossIncome(self, out=None):
+        """Return getGrossIncomeBatch for every employee"""
+        return getGrossIncomeBatch(
+            self.column('incomeTaxable'), self.column('incomeNonTaxable'),
+            out
+        )
+
+    def getPAYEPaid(self, year, out=None):
+        """Return getPAYEPaidBatch for every employee"""
+        return getPAYEPaidBatch(
+            year, self.column('incomeTaxable'), self.column('expensePreTax'),
+            out
+        )
+
+    def getNIPaid(self, year, out=None):
+        """Return getNIPaidBatch for every employee"""
+        return getNIPaidBatch(
+            year, self.column('incomeTaxable'), self.column('expensePreTax'),
+            out
+        )
+
+    def getDeductions(self, year, out=None, scratch=None):
+        """Return getDeductionsBatch for every employee"""
+        return getDeductionsBatch(
+            year, self.column('incomeTaxable'), self.column('expensePreTax'),
+            self.column('expensePostTax'), out, scratch
+        )
+
+    def getNetIncome(self, year, out=None, scratch=None):
+        """Return getNetIncomeBatch for every employee"""
+        return getNetIncomeBatch(
+            year, *(self.column(name) for name in self.columns), out=out,
+            scratch=scratch
+        )
+
+    def calculateYears(self, years, percentage=0.0, pre_tax=False,
+                       post_tax=False):
+        """Return calculateYears results for every employee"""
+        return calculateYears(
+            years,
+            *(self.column(name) for name in self.columns),
+            percentage=percentage,
+            pre_tax=pre_tax,
+            post_tax=post_tax,
+        )
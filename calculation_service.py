@@ -0,0 +1,293 @@
+"""
+Local asyncio calculation service.
+
+Serves take home pay over HTTP/JSON on localhost. Requests arriving
+within a short window are coalesced into one calculateBatch call per
+year and the results are fanned back out to each caller.
+
+POST /calculate with either a single employee
+    {"year": "2021-2022", "incomeTaxable": 30000, ...}
+or a bulk request
+    {"year": "2021-2022", "employees": [{"incomeTaxable": 30000}, ...]}
+GET /metrics returns request counts, queue depth and p50/p99 latency.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from batch_calculator import calculateBatch
+
+
+inputFields = (
+    'incomeTaxable', 'incomeNonTaxable', 'expensePreTax', 'expensePostTax'
+)
+resultFields = (
+    'grossIncome', 'payePaid', 'niPaid', 'deductions', 'netIncome'
+)
+
+
+class ServiceMetrics:
+    """Request counts, queue depth and recent latencies of a service"""
+    def __init__(self, window=10000):
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.queueDepth = 0
+        self.maxQueueDepth = 0
+        self.latencies = deque(maxlen=window)
+
+    def percentile(self, pct):
+        """Return the pct percentile latency in seconds of recent requests"""
+        if not self.latencies:
+            return 0.0
+        return float(np.percentile(self.latencies, pct))
+
+    def toDict(self):
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            'queueDepth': self.queueDepth,
+            'maxQueueDepth': self.maxQueueDepth,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
+
+
+class MicroBatcher:
+    """Coalesce concurrent calculation requests into batch calculations"""
+    def __init__(self, window=0.002, maxRows=100000, metrics=None):
+        self.window = window
+        self.maxRows = maxRows
+        self.metrics = metrics or ServiceMetrics()
+        self._pending = []
+        self._pendingRows = 0
+        self._flushHandle = None
+
+    async def submit(self, year, rows):
+        """Return result dicts for rows of (incomeTaxable, ...) tuples"""
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((year, rows, future))
+        self._pendingRows += len(rows)
+
+        self.metrics.requests += 1
+        self.metrics.rows += len(rows)
+        self.metrics.queueDepth = len(self._pending)
+        self.metrics.maxQueueDepth = max(
+            self.metrics.maxQueueDepth, self.metrics.queueDepth
+        )
+
+        if self._pendingRows >= self.maxRows:
+            self.flush()
+        elif self._flushHandle is None:
+            self._flushHandle = asyncio.get_running_loop().call_later(
+                self.window, self.flush
+            )
+
+        try:
+            return await future
+        finally:
+            self.metrics.latencies.append(time.perf_counter() - started)
+
+    def flush(self):
+        """Calculate every pending request, one batch per year"""
+        if self._flushHandle is not None:
+            self._flushHandle.cancel()
+            self._flushHandle = None
+
+        pending, self._pending = self._pending, []
+        self._pendingRows = 0
+        self.metrics.queueDepth = 0
+
+        byYear = {}
+        for request in pending:
+            byYear.setdefault(request[0], []).append(request)
+
+        for year, requests in byYear.items():
+            rows = [row for _, requestRows, _ in requests
+                    for row in requestRows]
+            columns = []
+            status = []
+            try:
+                if rows:
+                    result = calculateBatch(year, *zip(*rows))
+                    columns = [
+                        getattr(result, field).value.tolist()
+                        for field in resultFields
+                    ]
+                    status = result.netIncome.status.tolist()
+            except Exception as error:
+                # fail the batch's callers rather than leave them waiting
+                for _, _, future in requests:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            finally:
+                self.metrics.batches += 1
+
+            start = 0
+            for _, requestRows, future in requests:
+                end = start + len(requestRows)
+                if not future.done():
+                    future.set_result([
+                        dict(
+                            zip(resultFields,
+                                (column[i] for column in columns)),
+                            status=status[i],
+                        )
+                        for i in range(start, end)
+                    ])
+                start = end
+
+
+def _parseEmployee(employee):
+    """
+    Return an input row tuple, ValueError if a value is not a finite
+    number that fits a float
+    """
+    row = []
+    for field in inputFields:
+        value = employee.get(field, 0.0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'{field} not valid')
+        try:
+            value = float(value)
+        except OverflowError:
+            raise ValueError(f'{field} not valid') from None
+        if not math.isfinite(value):
+            raise ValueError(f'{field} not valid')
+        row.append(value)
+    return tuple(row)
+
+
+class CalculationService:
+    """HTTP/JSON front end for a MicroBatcher on a local port"""
+    def __init__(self, host='127.0.0.1', port=0, window=0.002,
+                 maxRows=100000):
+        self.host = host
+        self.port = port
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(window, maxRows, self.metrics)
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handleConnection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def serveForever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def handle(self, method, path, body):
+        """Return (status code, response object) for one request"""
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics.toDict()
+        if method != 'POST' or path != '/calculate':
+            return 404, {'error': 'Not found'}
+
+        try:
+            request = json.loads(body or b'{}')
+            year = request['year']
+            if not isinstance(year, str):
+                raise ValueError('Year not valid')
+            bulk = 'employees' in request
+            employees = request['employees'] if bulk else [request]
+            rows = [_parseEmployee(employee) for employee in employees]
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            return 400, {'error': str(error)}
+
+        try:
+            results = await self.batcher.submit(year, rows)
+        except Exception as error:
+            return 500, {'error': str(error)}
+        return 200, results if bulk else results[0]
+
+    async def _handleConnection(self, reader, writer):
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                method, path, _ = requestLine.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                status, response = await self.handle(method, path, body)
+                payload = json.dumps(response).encode()
+                keepAlive = headers.get('connection', '').lower() \
+                    != 'close'
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}'
+                    f'\r\nContent-Type: application/json'
+                    f'\r\nContent-Length: {len(payload)}'
+                    f'\r\nConnection: {"keep-alive" if keepAlive else "close"}'
+                    f'\r\n\r\n'.encode() + payload
+                )
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def request(host, port, method, path, payload=None):
+    """Send one request to a CalculationService and return (status, json)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: {host}\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+        .encode() + body
+    )
+    await writer.drain()
+
+    statusLine = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    response = await reader.readexactly(int(headers['content-length']))
+    writer.close()
+
+    return int(statusLine.split()[1]), json.loads(response)
+
+
+if __name__ == '__main__':
+    service = CalculationService(port=8080)
+    asyncio.run(service.serveForever())
@@ -21,126 +21,33 @@ OUTPUTS/ACCESSIBLE METHODS:
 ✓ Gross annual income - float
 ✓ PAYE paid - float
 ✓ NI paid - float
-Pension deducted - float
-Gross deductions - float
-Net take home year - float
-Net take home month - float
-Net take home day - float
-Net take home hour - float
+✓ Pension deducted - float
+✓ Gross deductions - float
+✓ Net take home year - float
+✓ Net take home month - float
+✓ Net take home day - float
+✓ Net take home hour - float
 
 """
 
+from collections import OrderedDict
+from functools import wraps
+from numbers import Real
+from operator import attrgetter
 
-pensionBands = {
-    '2021-2022':{
-        'lower_level': 6240.0,
-        'higher_level': 50270.0
-    },
-    '2020-2021':{
-        'lower_level': 6240.0,
-        'higher_level': 50000.0
-    },
-    '2019-2020':{
-        'lower_level': 6136.0,
-        'higher_level': 50000.0
-    },
-    '2018-2019':{
-        'lower_level': 6032.0,
-        'higher_level': 46350.0
-    },
-}
+import numpy as np
 
+from rate_registry import RateRegistry, TaxSchedule, YearSchedule, \
+    compileSchedule, taxRateBandType
 
-taxRates = {
-    '2021-2022':{
-        'PAYE_rate1':{
-            'threshold': 12579.0,
-            'rate_pct': 20.0
-        },
-        'PAYE_rate2':{
-            'threshold': 50279.0,
-            'rate_pct': 40.0,
-        },
-        'PAYE_rate3':{
-            'threshold': 150000.0,
-            'rate_pct': 45.0
-        },
-        'NI_rate1':{
-            'threshold': 9568.0,
-            'rate_pct': 12.0
-        },
-        'NI_rate2':{
-            'threshold': 50270.0,
-            'rate_pct': 2.0
-        },
-    },
-    '2020-2021':{
-        'PAYE_rate1':{
-            'threshold': 12500.0,
-            'rate_pct': 20.0
-        },
-        'PAYE_rate2':{
-            'threshold': 50000.0,
-            'rate_pct': 40.0,
-        },
-        'PAYE_rate3':{
-            'threshold': 150000.0,
-            'rate_pct': 45.0
-        },
-        'NI_rate1':{
-            'threshold': 9500.0,
-            'rate_pct': 12.0
-        },
-        'NI_rate2':{
-            'threshold': 50000.0,
-            'rate_pct': 2.0
-        },
-    },
-    '2019-2020':{
-        'PAYE_rate1':{
-            'threshold': 12500.0,
-            'rate_pct': 20.0 
-        },
-        'PAYE_rate2':{
-            'threshold': 50000.0,
-            'rate_pct': 40.0,
-        },
-        'PAYE_rate3':{
-            'threshold': 150000.0,
-            'rate_pct': 45.0
-        },
-        'NI_rate1':{
-            'threshold': 8632.0,
-            'rate_pct': 12.0
-        },
-        'NI_rate2':{
-            'threshold': round(4167.0 * 12, 2),
-            'rate_pct': 2.0
-        },
-    },
-    '2018-2019':{
-        'PAYE_rate1':{
-            'threshold': 11850.0,
-            'rate_pct': 20.0
-        },
-        'PAYE_rate2':{
-            'threshold': 46350.0,
-            'rate_pct': 40.0,
-        },
-        'PAYE_rate3':{
-            'threshold': 150000.0,
-            'rate_pct': 45.0
-        },
-        'NI_rate1':{
-            'threshold': 8424.0,
-            'rate_pct': 12.0
-        },
-        'NI_rate2':{
-            'threshold': round(3863.0 * 12, 2),
-            'rate_pct': 2.0
-        },
-    },
-}
+
+# Rate tables are loaded from tax_rates.json (see rate_registry); add a
+# tax year by editing the data file.
+registry = RateRegistry()
+registry.load()
+
+pensionBands = registry.pensionBands
+taxRates = registry.taxRates
 
 
 def isFloatValid(value):
@@ -159,7 +66,104 @@ def isFloatValid(value):
         return True
 
 
+class ValidationReport:
+    """
+    Result of validating a list of values in one pass
+
+    indices and reasons list every invalid entry in order, status is True
+    and the report is truthy only when nothing was invalid.
+    """
+    __slots__ = ('count', 'indices', 'reasons', 'status', 'message')
+
+    def __init__(self, count, indices=(), reasons=(), message=''):
+        self.count = count
+        self.indices = list(indices)
+        self.reasons = list(reasons)
+        self.status = not self.indices and not message
+        if not message and self.indices:
+            message = f'{len(self.indices)} of {count} values not valid'
+        self.message = message
+
+    def __bool__(self):
+        return self.status
+
+    def errors(self):
+        """Return [(index, reason)] for every invalid entry"""
+        return list(zip(self.indices, self.reasons))
+
+    def __repr__(self):
+        if self.status:
+            return f'ValidationReport({self.count} values valid)'
+
+        return f'ValidationReport error: {self.message} {self.errors()[:5]}'
+
+
+def _asValueArray(values):
+    """Return values as a 1-D float array, None if any are not numeric"""
+    if not isinstance(values, np.ndarray):
+        try:
+            values = np.asarray(values)
+        except ValueError:  # ragged nesting
+            return None
+
+    if values.dtype.kind not in 'biuf':
+        return None
+
+    return values.reshape(-1).astype(np.float64, copy=False)
+
+
+def validateValues(values):
+    """
+    Check every value is a positive number in one pass
+
+    Returns (ValidationReport, float64 array of the values). Numeric
+    lists and arrays are checked vectorised, anything else falls back to
+    isFloatValid per entry. Unlike isFloatValid, NaN is rejected.
+    """
+    if not isinstance(values, np.ndarray):
+        values = list(values)
+    array = _asValueArray(values)
+
+    if array is not None:
+        notNumber = np.isnan(array)
+        negative = array < 0
+        indices = np.flatnonzero(notNumber | negative).tolist()
+        reasons = ['Value is NaN' if notNumber[i] else 'Value is negative'
+                   for i in indices]
+        return ValidationReport(len(array), indices, reasons), array
+
+    indices = []
+    reasons = []
+    for i, value in enumerate(values):
+        if not isFloatValid(value):
+            indices.append(i)
+            try:
+                value * 1.0
+                value < 0
+                reasons.append('Value is negative')
+            except TypeError:
+                reasons.append('Value not a number')
+        elif value != value:
+            indices.append(i)
+            reasons.append('Value is NaN')
+
+    report = ValidationReport(len(values), indices, reasons)
+    if not report:
+        return report, None
+
+    return report, np.asarray(values, dtype=np.float64)
+
+
+def _sequentialTotal(start, array):
+    """Return start plus each value in turn, as a loop of += would"""
+    if not len(array):
+        return start
+    return float(np.add.accumulate(np.concatenate(([start], array)))[-1])
+
+
 class FloatSuccessType:
+    __slots__ = ('value', 'status', 'message')
+
     def __init__(self, value, status, message=''):
         self.value = round(value, 2)
         self.status = status
@@ -184,21 +188,492 @@ class FloatSuccessType:
                 return f'Value error: {self.value}, {self.message}'
 
 
-class taxRateBandType:
-    def __init__(self, threshold, rate_pct):
-        self.threshold = threshold
-        self.rate_pct = rate_pct
+_yearSchedules = registry.schedules
+
+
+def compileYearSchedule(year):
+    """Compile taxRates and pensionBands for year, KeyError if not valid"""
+    return compileSchedule(year, taxRates[year], pensionBands.get(year))
+
+
+def getYearSchedule(year):
+    """Return the compiled schedule for year, compiling it on first use"""
+    try:
+        return _yearSchedules[year]
+    except KeyError:
+        schedule = _yearSchedules[year] = compileYearSchedule(year)
+        return schedule
+
+
+def clearScheduleCache():
+    """Forget compiled schedules, call after editing taxRates/pensionBands"""
+    _yearSchedules.clear()
+
+
+workingDaysPerYear = 260
+hoursPerDay = 7.5
+
+
+class Payslip:
+    """All outputs for one employee and year, failed payslips hold 0.0"""
+    __slots__ = (
+        'grossIncome', 'payePaid', 'niPaid', 'pension', 'deductions',
+        'netIncome', 'netMonth', 'netDay', 'netHour', 'status', 'message',
+    )
+
+    def __init__(self, grossIncome=0.0, payePaid=0.0, niPaid=0.0,
+                 pension=0.0, deductions=0.0, netIncome=0.0,
+                 status=True, message=''):
+        self.grossIncome = grossIncome
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.pension = round(pension, 2)
+        self.deductions = deductions
+        self.netIncome = netIncome
+        self.netMonth = round(netIncome / 12, 2)
+        self.netDay = round(netIncome / workingDaysPerYear, 2)
+        self.netHour = round(
+            netIncome / (workingDaysPerYear * hoursPerDay), 2
+        )
+        self.status = status
+        self.message = message
+
+    def __repr__(self):
+        if not self.status:
+            return f'Payslip error: {self.message}'
+
+        return f'Payslip(gross={self.grossIncome}, paye={self.payePaid}, '\
+               f'ni={self.niPaid}, pension={self.pension}, '\
+               f'deductions={self.deductions}, net={self.netIncome})'
+
+
+def calculatePayslip(year, incomeTaxable, incomeNonTaxable=0.0,
+                     expensePreTax=0.0, expensePostTax=0.0,
+                     percentage=0.0, pre_tax=False, post_tax=False):
+    """
+    Return a Payslip, validating inputs and deriving taxable income once
+
+    Figures match the separate EmployeeSalaryInfo methods to the penny.
+    A pension percentage is worked out as addPension does and added to
+    the pre or post tax expenses without changing any employee. That
+    deliberately differs from addPension, whose pre tax pension replaces
+    any pre tax expenses already added instead of adding to them.
+    """
+    if not (isFloatValid(incomeTaxable) and isFloatValid(incomeNonTaxable)):
+        return Payslip(status=False, message="Value not valid")
+
+    if not (isFloatValid(expensePreTax) and
+            incomeTaxable > expensePreTax):
+        return Payslip(status=False, message="Taxable income invalid")
+
+    try:
+        schedule = getYearSchedule(year)
+    except KeyError:
+        return Payslip(status=False, message="Year not valid")
+
+    pension = 0.0
+    if percentage:
+        if post_tax == pre_tax:
+            return Payslip(
+                status=False,
+                message="Pension must be either pre OR post tax"
+            )
+        if not (percentage >= 0 and percentage <= 100):
+            return Payslip(
+                status=False,
+                message="Percentage must be within 0 - 100 range"
+            )
+        if schedule.pensionBand is None:
+            return Payslip(status=False, message="Year not valid")
+
+        lower_band, upper_band = schedule.pensionBand
+        pensionable_earnings = min(
+            max(incomeTaxable - lower_band, 0.0),
+            upper_band - lower_band
+        )
+        pension = pensionable_earnings * (percentage/100)
+
+        if post_tax:
+            pension *= 0.8
+            expensePostTax += pension
+        else:
+            expensePreTax += pension
+            if not incomeTaxable > expensePreTax:
+                return Payslip(status=False, message="Taxable income invalid")
+
+    if not isFloatValid(expensePostTax):
+        return Payslip(status=False, message='Post tax expenses invalid')
+
+    taxableIncome = incomeTaxable - expensePreTax
+    grossIncome = round(incomeTaxable + incomeNonTaxable, 2)
+    payePaid = round(schedule.paye.taxDue(taxableIncome), 2)
+    niPaid = round(schedule.ni.taxDue(taxableIncome), 2)
+    deductions = round(payePaid + niPaid + expensePostTax + expensePreTax, 2)
+
+    return Payslip(
+        grossIncome,
+        payePaid,
+        niPaid,
+        pension,
+        deductions,
+        round(grossIncome - deductions, 2),
+    )
+
+
+periodsPerYear = 12
+eventFields = (
+    'incomeTaxable', 'incomeNonTaxable', 'expensePreTax', 'expensePostTax'
+)
+
+
+def taxPeriod(year, effective):
+    """
+    Return the tax month, 1 - 12, of a date in a year such as '2021-2022'
+
+    Tax month 1 runs from 6 April to 5 May. An int is taken to be a tax
+    month already. Raises ValueError when effective is not in the year.
+    """
+    if isinstance(effective, int) and not isinstance(effective, bool):
+        period = effective
+    else:
+        period = (effective.year - int(str(year)[:4])) * 12 \
+            + effective.month - 4 + (effective.day >= 6)
+
+    if not 1 <= period <= periodsPerYear:
+        raise ValueError(f'{effective} is not in tax year {year}')
+    return period
+
+
+_periodSchedules = {}
+
+
+def getPeriodSchedules(year, period):
+    """
+    Return the PAYE to date and NI per period TaxSchedules for a tax month
+
+    Raises KeyError when year is not valid.
+    """
+    schedule = getYearSchedule(year)
+    cached = _periodSchedules.get((year, period))
+    if cached is None or cached[0] is not schedule:
+        cached = _periodSchedules[year, period] = (
+            schedule,
+            schedule.paye.scaled(period / periodsPerYear),
+            schedule.ni.scaled(1 / periodsPerYear),
+        )
+
+    return cached[1:]
+
+
+class PeriodPayslip:
+    """One tax month's figures plus the year to date totals after it"""
+    __slots__ = (
+        'period', 'grossPay', 'taxablePay', 'payePaid', 'niPaid',
+        'deductions', 'netPay', 'payToDate', 'payeToDate', 'niToDate',
+        'status', 'message',
+    )
+
+    def __init__(self, period, grossPay=0.0, taxablePay=0.0, payePaid=0.0,
+                 niPaid=0.0, deductions=0.0, netPay=0.0, payToDate=0.0,
+                 payeToDate=0.0, niToDate=0.0, status=True, message=''):
+        self.period = period
+        self.grossPay = grossPay
+        self.taxablePay = taxablePay
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.deductions = deductions
+        self.netPay = netPay
+        self.payToDate = payToDate
+        self.payeToDate = payeToDate
+        self.niToDate = niToDate
+        self.status = status
+        self.message = message
+
+    def __repr__(self):
+        if not self.status:
+            return f'PeriodPayslip {self.period} error: {self.message}'
+
+        return f'PeriodPayslip({self.period}, gross={self.grossPay}, '\
+               f'paye={self.payePaid}, ni={self.niPaid}, '\
+               f'net={self.netPay})'
+
+
+def calculatePeriodPayslip(year, period, incomeTaxable, incomeNonTaxable=0.0,
+                           expensePreTax=0.0, expensePostTax=0.0,
+                           previous=None):
+    """
+    Return the PeriodPayslip for one tax month's amounts
+
+    previous is the PeriodPayslip of the month before. PAYE is worked on
+    the cumulative basis and NI per period, as MonthlyPayroll does. A
+    failed month pays nothing and carries the year to date forward.
+    """
+    toDate = (0.0, 0.0, 0.0)
+    if previous is not None:
+        toDate = (previous.payToDate, previous.payeToDate, previous.niToDate)
+    payToDate, payeToDate, niToDate = toDate
+
+    def failed(message):
+        return PeriodPayslip(
+            period, payToDate=payToDate, payeToDate=payeToDate,
+            niToDate=niToDate, status=False, message=message
+        )
+
+    if not (isFloatValid(incomeTaxable) and isFloatValid(incomeNonTaxable)):
+        return failed("Value not valid")
+
+    if not (isFloatValid(expensePreTax) and incomeTaxable >= expensePreTax):
+        return failed("Taxable income invalid")
+
+    if not isFloatValid(expensePostTax):
+        return failed('Post tax expenses invalid')
+
+    try:
+        paye, ni = getPeriodSchedules(year, period)
+    except KeyError:
+        return failed("Year not valid")
+
+    taxablePay = incomeTaxable - expensePreTax
+    payToDate += taxablePay
+    payePaid = round(round(paye.taxDue(payToDate), 2) - payeToDate, 2)
+    niPaid = round(ni.taxDue(taxablePay), 2)
+    grossPay = round(incomeTaxable + incomeNonTaxable, 2)
+    deductions = round(payePaid + niPaid + expensePreTax + expensePostTax, 2)
+
+    return PeriodPayslip(
+        period,
+        grossPay,
+        round(taxablePay, 2),
+        payePaid,
+        niPaid,
+        deductions,
+        round(grossPay - deductions, 2),
+        payToDate,
+        payeToDate + payePaid,
+        niToDate + niPaid,
+    )
+
+
+def _payslipKey(year, values, percentage, pre_tax, post_tax):
+    """
+    Return a cache key for calculatePayslip arguments, None if uncacheable
+
+    Amounts are normalised to floats so 30000 and 30000.0 share a key, and
+    pension flags are ignored when there is no pension percentage.
+    """
+    key = [year]
+    for value in values + (percentage,):
+        if type(value) is not float:
+            if not isinstance(value, Real):
+                return None
+            value = float(value)
+        if value != value:  # NaN never equals a cached key
+            return None
+        key.append(value)
+
+    if percentage:
+        key += (bool(pre_tax), bool(post_tax))
+
+    return tuple(key)
+
+
+class PayslipCache:
+    """
+    Process wide least recently used cache of calculatePayslip results
+
+    Payslips depend only on the year and the normalised inputs, so
+    employees on the same pay grade share one computed Payslip. Entries
+    remember the compiled year they were worked from and are recomputed
+    after the rate tables change. Returned payslips are shared, treat them
+    as read only.
+    """
+    def __init__(self, maxSize=100000):
+        self.maxSize = maxSize
+        self._payslips = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._payslips)
+
+    @property
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return self.hits / lookups
+
+    def clear(self):
+        """Forget every payslip and reset the counters"""
+        self._payslips.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        return True
+
+    def stats(self):
+        return {
+            'size': len(self._payslips),
+            'maxSize': self.maxSize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hitRate': self.hitRate,
+        }
+
+    def payslip(self, year, incomeTaxable, incomeNonTaxable=0.0,
+                expensePreTax=0.0, expensePostTax=0.0, percentage=0.0,
+                pre_tax=False, post_tax=False):
+        """Return calculatePayslip for the arguments, computing on a miss"""
+        arguments = (year, incomeTaxable, incomeNonTaxable, expensePreTax,
+                     expensePostTax, percentage, pre_tax, post_tax)
+        key = _payslipKey(
+            year,
+            (incomeTaxable, incomeNonTaxable, expensePreTax, expensePostTax),
+            percentage, pre_tax, post_tax
+        )
+        try:
+            schedule = getYearSchedule(year)
+            cached = self._payslips.get(key) if key is not None else None
+        except (KeyError, TypeError):  # invalid or unhashable year
+            return calculatePayslip(*arguments)
+        if key is None:
+            return calculatePayslip(*arguments)
+
+        if cached is not None and cached[0] is schedule:
+            self.hits += 1
+            self._payslips.move_to_end(key)
+            return cached[1]
+
+        self.misses += 1
+        # work from the normalised amounts so a hit and a miss always agree
+        payslip = calculatePayslip(year, *key[1:6], pre_tax, post_tax)
+        self._payslips[key] = (schedule, payslip)
+        self._payslips.move_to_end(key)
+        if len(self._payslips) > self.maxSize:
+            self._payslips.popitem(last=False)
+            self.evictions += 1
+
+        return payslip
+
+
+payslipCache = PayslipCache()
+
+
+# cached results which depend on each field, None for every result
+_dependentResults = {
+    'incomeTaxable': None,
+    'incomeNonTaxable': frozenset((
+        'getGrossIncome', 'getNetIncome', 'computePayslip'
+    )),
+    'expensePreTax': frozenset((
+        'getPAYEPaid', 'getNIPaid', 'getDeductions', 'getNetIncome',
+        'computePayslip'
+    )),
+    'expensePostTax': frozenset((
+        'getDeductions', 'getNetIncome', 'computePayslip'
+    )),
+}
+
+
+def _resultField(name):
+    """Attribute which drops the cached results depending on it when set"""
+    attribute = '_' + name
+
+    def setter(self, value):
+        setattr(self, attribute, value)
+        self._invalidate(name)
+
+    return property(attrgetter(attribute), setter)
+
+
+def _resultSchedule(args, kwargs):
+    """Return the compiled schedule of a get method's year, None if none"""
+    year = kwargs['year'] if 'year' in kwargs else args[0] if args else None
+    if year is None:
+        return None
+    try:
+        return getYearSchedule(year)
+    except (KeyError, TypeError):
+        return None
+
+
+def _cachedResult(method):
+    """
+    Memoise a get method per arguments until a result field changes
+
+    Entries remember the compiled year they were worked from, as
+    PayslipCache does, and are recomputed after the rate tables change.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def cached(self, *args, **kwargs):
+        key = (name, args, tuple(kwargs.items()) if kwargs else ())
+        schedule = _resultSchedule(args, kwargs)
+        try:
+            cachedSchedule, result = self._resultCache[key]
+        except KeyError:
+            cachedSchedule = result = None
+        except TypeError:  # unhashable argument, nothing to cache against
+            return method(self, *args, **kwargs)
+
+        if result is None or cachedSchedule is not schedule:
+            self.cacheMisses += 1
+            result = method(self, *args, **kwargs)
+            self._resultCache[key] = (schedule, result)
+            return result
+
+        self.cacheHits += 1
+        return result
+
+    return cached
 
 
 class EmployeeSalaryInfo(object):
     """An object containing salary information for an employee"""
+    incomeTaxable = _resultField('incomeTaxable')
+    incomeNonTaxable = _resultField('incomeNonTaxable')
+    expensePreTax = _resultField('expensePreTax')
+    expensePostTax = _resultField('expensePostTax')
+
     def __init__(self, employee_name):
         self.employee_name = employee_name
+        self._initState()
         self.resetTaxableIncome()
         self.resetNonTaxableIncome()
         self.resetPreTaxExpense()
         self.resetPostTaxExpense()
     
+    def _initState(self):
+        """Set up the result cache and pay events of a new employee"""
+        self._resultCache = {}
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self._events = {}
+        self._periodPayslips = {}
+        self.periodsComputed = 0
+
+    def clearResultCache(self):
+        """Forget memoised results and reset the hit/miss counters"""
+        self._resultCache.clear()
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        return True
+
+    def _invalidate(self, field):
+        """Forget cached results that depend on field"""
+        self._periodPayslips.clear()
+        dependents = _dependentResults[field]
+        cache = self._resultCache
+        if dependents is None:
+            cache.clear()
+            return
+
+        for key in [key for key in cache if key[0] in dependents]:
+            del cache[key]
+
     def resetTaxableIncome(self):
         """Clears taxable income list"""
         self.incomeTaxable = 0.0
@@ -221,25 +696,11 @@ class EmployeeSalaryInfo(object):
 
     def addTaxableIncome(self, incomeList):
         """Define the taxable income for the employee"""
-        for input in incomeList:
-
-            if isFloatValid(input):
-                self.incomeTaxable += input
-            else:
-                return False
-        
-        return True
+        return self._add('incomeTaxable', incomeList)
 
     def addNonTaxableIncome(self, incomeList):
         """Define the non-taxable income for the employee"""
-        for input in incomeList:
-
-            if isFloatValid(input):
-                self.incomeNonTaxable += input
-            else:
-                return False
-        
-        return True
+        return self._add('incomeNonTaxable', incomeList)
     
     def addPreTaxExpense(self, expenseList):
         """Define pre tax expense i.e. reduces gross income"""
@@ -260,15 +721,177 @@ class EmployeeSalaryInfo(object):
 
     def addPostTaxExpense(self, expenseList):
         """Define post tax expense i.e. reduces net income"""
-        for input in expenseList:
+        return self._add('expensePostTax', expenseList)
 
-            if isFloatValid(input):
-                self.expensePostTax += input
-            else:
+    def _add(self, field, values):
+        """
+        Add values to field, stopping at the first invalid one
+
+        The sum is built locally and assigned once, so cached results are
+        dropped once per call rather than once per value. Values before an
+        invalid one stay added.
+        """
+        total = getattr(self, field)
+        added = True
+        for value in values:
+            if not isFloatValid(value):
+                added = False
+                break
+            total += value
+
+        setattr(self, field, total)
+        return added
+
+    def _remove(self, field, values):
+        """Take values off field, all or nothing, never going below 0.0"""
+        total = getattr(self, field)
+        for value in values:
+            if not isFloatValid(value):
                 return False
-        
+            total -= value
+
+        if abs(total) < 0.005:
+            total = 0.0  # float error from removing everything added
+        elif total < 0:
+            return False
+
+        setattr(self, field, total)
+        return True
+
+    def removeTaxableIncome(self, incomeList):
+        """Take previously added incomes off the taxable income"""
+        return self._remove('incomeTaxable', incomeList)
+
+    def removeNonTaxableIncome(self, incomeList):
+        """Take previously added incomes off the non-taxable income"""
+        return self._remove('incomeNonTaxable', incomeList)
+
+    def removePreTaxExpense(self, expenseList):
+        """Take expenses off the pre tax expense"""
+        return self._remove('expensePreTax', expenseList)
+
+    def removePostTaxExpense(self, expenseList):
+        """Take expenses off the post tax expense"""
+        return self._remove('expensePostTax', expenseList)
+
+    def _addBulk(self, field, values):
+        """Validate values and add them all to field, or add none"""
+        report, array = validateValues(values)
+        if report:
+            setattr(self, field, _sequentialTotal(getattr(self, field), array))
+        return report
+
+    def addTaxableIncomeBulk(self, incomeList):
+        """addTaxableIncome applied all or nothing, returns ValidationReport"""
+        return self._addBulk('incomeTaxable', incomeList)
+
+    def addNonTaxableIncomeBulk(self, incomeList):
+        """addNonTaxableIncome all or nothing, returns ValidationReport"""
+        return self._addBulk('incomeNonTaxable', incomeList)
+
+    def addPreTaxExpenseBulk(self, expenseList):
+        """addPreTaxExpense applied all or nothing, returns ValidationReport"""
+        report, array = validateValues(expenseList)
+        if not report:
+            return report
+
+        expense = _sequentialTotal(0.0, array)
+        if not expense < self.incomeTaxable:
+            return ValidationReport(
+                report.count,
+                message='Pre tax expenses not below taxable income'
+            )
+
+        self.expensePreTax = expense
+        return report
+
+    def addPostTaxExpenseBulk(self, expenseList):
+        """addPostTaxExpense all or nothing, returns ValidationReport"""
+        return self._addBulk('expensePostTax', expenseList)
+
+    def addEvent(self, year, effective, field, annualAmount):
+        """
+        Change field to annualAmount a year from the tax month of effective
+
+        effective is a date or a tax month. Months from then on are
+        recomputed on the next read, earlier months are kept.
+        """
+        if field not in eventFields or not isFloatValid(annualAmount):
+            return False
+        try:
+            period = taxPeriod(year, effective)
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+        events = self._events.setdefault(year, [])
+        events.append((period, len(events), field, annualAmount))
+        events.sort()
+
+        payslips = self._periodPayslips.get(year)
+        if payslips is not None:
+            del payslips[period - 1:]
+        return True
+
+    def resetEvents(self, year):
+        """Remove every event for year"""
+        self._events.pop(year, None)
+        self._periodPayslips.pop(year, None)
         return True
 
+    def _periodAmounts(self, year, period):
+        """Return each event field's amount for one tax month"""
+        annual = {field: getattr(self, field) for field in eventFields}
+        for eventPeriod, _, field, annualAmount in self._events.get(year, ()):
+            if eventPeriod > period:
+                break
+            annual[field] = annualAmount
+
+        return [
+            amount / periodsPerYear if isFloatValid(amount) else amount
+            for amount in annual.values()
+        ]
+
+    def getPeriodPayslips(self, year):
+        """
+        Return a PeriodPayslip for every tax month of year
+
+        Months are computed from the events in force in each month and
+        kept until a field or an earlier event changes.
+        """
+        payslips = self._periodPayslips.setdefault(year, [])
+        previous = payslips[-1] if payslips else None
+
+        for period in range(len(payslips) + 1, periodsPerYear + 1):
+            previous = calculatePeriodPayslip(
+                year, period, *self._periodAmounts(year, period),
+                previous=previous
+            )
+            payslips.append(previous)
+            self.periodsComputed += 1
+
+        return list(payslips)
+
+    def getProratedPayslip(self, year):
+        """Return a Payslip totalling the PeriodPayslips of year"""
+        payslips = self.getPeriodPayslips(year)
+        for payslip in payslips:
+            if not payslip.status:
+                return Payslip(status=False, message=payslip.message)
+
+        def total(field):
+            return round(sum(getattr(payslip, field) for payslip in payslips),
+                         2)
+
+        return Payslip(
+            total('grossPay'),
+            total('payePaid'),
+            total('niPaid'),
+            0.0,
+            total('deductions'),
+            total('netPay'),
+        )
+
+    @_cachedResult
     def getGrossIncome(self):
         """Returns gross income with success flag at .value and .status"""
         grossIncome = 0.0
@@ -281,6 +904,7 @@ class EmployeeSalaryInfo(object):
         
         return FloatSuccessType(grossIncome, True)
     
+    @_cachedResult
     def getPAYEPaid(self, year):
         """Return PAYE paid"""
         taxPaid = 0.0
@@ -294,38 +918,15 @@ class EmployeeSalaryInfo(object):
             return FloatSuccessType(0.0, False, "Taxable income invalid")
 
         try:
-            rate1 = taxRateBandType(
-                taxRates[year]['PAYE_rate1']['threshold'],
-                taxRates[year]['PAYE_rate1']['rate_pct'],
-            )
-            rate2 = taxRateBandType(
-                taxRates[year]['PAYE_rate2']['threshold'],
-                taxRates[year]['PAYE_rate2']['rate_pct'],
-            )
-            rate3 = taxRateBandType(
-                taxRates[year]['PAYE_rate3']['threshold'],
-                taxRates[year]['PAYE_rate3']['rate_pct'],
-            )
-
+            schedule = getYearSchedule(year)
         except KeyError:
             return FloatSuccessType(0.0, False, "Year not valid")
 
-        if incomeTaxable <= rate1.threshold:
-            taxPaid = 0.0
-        elif incomeTaxable <= rate2.threshold:
-            taxPaid = (incomeTaxable - rate1.threshold) * (rate1.rate_pct/100)
-        elif incomeTaxable <= rate3.threshold:
-            taxPaid = (rate2.threshold - rate1.threshold) * (rate1.rate_pct/100) \
-                      + (incomeTaxable - rate2.threshold) * (rate2.rate_pct/100)
-        else:
-            taxPaid = (rate2.threshold - rate1.threshold) * (rate1.rate_pct/100) \
-                      + (rate3.threshold - rate2.threshold) * (rate2.rate_pct/100) \
-                      + (incomeTaxable - rate3.threshold) * (rate3.rate_pct/100)
-
-        taxPaid = round(taxPaid, 2)
+        taxPaid = round(schedule.paye.taxDue(incomeTaxable), 2)
 
         return FloatSuccessType(taxPaid, True)
     
+    @_cachedResult
     def getNIPaid(self, year):
         """Return NI paid"""
         taxPaid = 0.0
@@ -339,27 +940,11 @@ class EmployeeSalaryInfo(object):
             return FloatSuccessType(0.0, False, "Taxable income invalid")
 
         try:
-            rate1 = taxRateBandType(
-                taxRates[year]['NI_rate1']['threshold'],
-                taxRates[year]['NI_rate1']['rate_pct'],
-            )
-            rate2 = taxRateBandType(
-                taxRates[year]['NI_rate2']['threshold'],
-                taxRates[year]['NI_rate2']['rate_pct'],
-            )
-
+            schedule = getYearSchedule(year)
         except KeyError:
             return FloatSuccessType(0.0, False, "Year not valid")
 
-        if incomeTaxable <= rate1.threshold:
-            taxPaid = 0.0
-        elif incomeTaxable <= rate2.threshold:
-            taxPaid = (incomeTaxable - rate1.threshold) * (rate1.rate_pct/100)
-        else:
-            taxPaid = (rate2.threshold - rate1.threshold) * (rate1.rate_pct/100) \
-                      + (incomeTaxable - rate2.threshold) * (rate2.rate_pct/100)
-
-        taxPaid = round(taxPaid, 2)
+        taxPaid = round(schedule.ni.taxDue(incomeTaxable), 2)
 
         return FloatSuccessType(taxPaid, True)
     
@@ -382,12 +967,15 @@ class EmployeeSalaryInfo(object):
             )
         
         try:
-            upper_band = pensionBands[year]['higher_level']
-            lower_band = pensionBands[year]['lower_level']
+            pensionBand = getYearSchedule(year).pensionBand
 
         except KeyError:
             return FloatSuccessType(0.0, False, "Year not valid")
 
+        if pensionBand is None:
+            return FloatSuccessType(0.0, False, "Year not valid")
+        lower_band, upper_band = pensionBand
+
         if isFloatValid(self.incomeTaxable):
             incomeTaxable = self.incomeTaxable
         else:
@@ -409,6 +997,22 @@ class EmployeeSalaryInfo(object):
 
         return FloatSuccessType(pension, True)
 
+    @_cachedResult
+    def computePayslip(self, year, percentage=0.0, pre_tax=False,
+                       post_tax=False):
+        """Return every output for year in one pass, see calculatePayslip"""
+        return payslipCache.payslip(
+            year,
+            self.incomeTaxable,
+            self.incomeNonTaxable,
+            self.expensePreTax,
+            self.expensePostTax,
+            percentage,
+            pre_tax,
+            post_tax,
+        )
+
+    @_cachedResult
     def getDeductions(self, year):
         """Return total deductions from incomes"""
         getPAYEPaid = self.getPAYEPaid(year)
@@ -437,6 +1041,7 @@ class EmployeeSalaryInfo(object):
 
         return FloatSuccessType(deductions, True)
 
+    @_cachedResult
     def getNetIncome(self, year):
         """Return annual take home pay"""
         income = self.getGrossIncome()
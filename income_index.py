@@ -0,0 +1,208 @@
+"""
+Employees indexed by taxable income.
+
+IncomeIndex keeps the rows of an EmployeeBatch sorted by taxable income
+(incomeTaxable less expensePreTax) alongside each year's batch results.
+PAYE and NI depend only on taxable income, so when a year's rate tables
+change, changedRanges works out which taxable income ranges get a
+different result and refresh recalculates only the employees found in
+those ranges by binary search, leaving every other result in place.
+
+Results are worked without a pension, as getNetIncome is, so a change
+to pensionBands alone changes no results.
+
+The sorted incomes and their prefix sums also answer band queries in a
+few binary searches: how many employees fall in each PAYE or NI band of
+a year, which ones, and the total tax charged at a band's rate. Rows
+with invalid income, which every calculation rejects, are in no band.
+"""
+
+import math
+
+import numpy as np
+
+from batch_calculator import calculateBatch, isArrayValid
+from income_calculator import getYearSchedule
+
+
+def _slope(schedule, income):
+    """Return the marginal rate of schedule at income"""
+    band = schedule.bandIndex(income)
+    return schedule.rates[band] if band >= 0 else 0.0
+
+
+def scheduleChanges(old, new):
+    """
+    Return (low, high) taxable income ranges where two TaxSchedules differ
+
+    Both schedules are linear between the union of their thresholds, so
+    each interval either differs nowhere or everywhere inside it.
+    Incomes above low and up to high are affected, high may be inf.
+    """
+    points = sorted(set(old.thresholds) | set(new.thresholds))
+    changes = []
+    for low, high in zip(points, points[1:] + [math.inf]):
+        probe = low + 1.0 if math.isinf(high) else (low + high) / 2
+        if _slope(old, probe) != _slope(new, probe) or not math.isclose(
+                old.taxDue(probe), new.taxDue(probe),
+                rel_tol=1e-12, abs_tol=1e-9):
+            changes.append((low, high))
+
+    return changes
+
+
+def changedRanges(old, new):
+    """
+    Return the merged taxable income ranges where PAYE or NI differ
+    between two YearSchedules, in ascending order
+    """
+    changes = sorted(
+        scheduleChanges(old.paye, new.paye) + scheduleChanges(old.ni, new.ni)
+    )
+
+    merged = []
+    for low, high in changes:
+        if merged and low <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+
+    return merged
+
+
+class IncomeIndex:
+    """
+    Rows of an EmployeeBatch sorted by taxable income, with results
+
+    Build a new index after changing the batch.
+    """
+    def __init__(self, batch):
+        self.batch = batch
+        incomeTaxable = batch.column('incomeTaxable')
+        expensePreTax = batch.column('expensePreTax')
+        valid = isArrayValid(incomeTaxable) & isArrayValid(expensePreTax) \
+            & (incomeTaxable > expensePreTax)
+        taxableIncome = np.where(
+            valid, incomeTaxable - expensePreTax, -np.inf
+        )
+
+        self.order = np.argsort(taxableIncome, kind='stable')
+        self.sortedIncome = taxableIncome[self.order]
+        self._prefixSums = np.concatenate(([0.0], np.cumsum(
+            np.where(valid[self.order], self.sortedIncome, 0.0)
+        )))
+        self.results = {}
+        self._schedules = {}
+
+    def __len__(self):
+        return len(self.order)
+
+    def _checkBatch(self):
+        if len(self.batch) != len(self.order):
+            raise ValueError('EmployeeBatch changed since it was indexed')
+
+    def rowsBetween(self, low, high):
+        """Return batch rows with taxable income above low, up to high"""
+        start, stop = np.searchsorted(
+            self.sortedIncome, [low, high], side='right'
+        )
+        return self.order[start:stop]
+
+    def _bandPositions(self, year, kind):
+        """Return a TaxSchedule and sorted positions of its band edges"""
+        schedule = getattr(getYearSchedule(year), kind)
+        positions = np.append(
+            np.searchsorted(
+                self.sortedIncome, schedule.thresholds, side='right'
+            ),
+            len(self.sortedIncome)
+        )
+        return schedule, positions
+
+    def bandCounts(self, year, kind='paye'):
+        """
+        Return the number of employees in each band of year's PAYE or NI
+
+        kind is 'paye' or 'ni'. Raises KeyError when year is not valid.
+        """
+        _, positions = self._bandPositions(year, kind)
+        return np.diff(positions)
+
+    def bandRows(self, year, band, kind='paye'):
+        """Return batch rows whose taxable income is in band of year"""
+        _, positions = self._bandPositions(year, kind)
+        return self.order[positions[band]:positions[band + 1]]
+
+    def bandTax(self, year, band, kind='paye'):
+        """
+        Return the unrounded tax charged at band's rate over all employees
+
+        Employees above the band pay its rate on the whole band, those in
+        it on their income above its threshold.
+        """
+        schedule, positions = self._bandPositions(year, kind)
+        start, stop = positions[band], positions[band + 1]
+        low = schedule.thresholds[band]
+
+        inBand = self._prefixSums[stop] - self._prefixSums[start] \
+            - (stop - start) * low
+        if band + 1 < len(schedule.thresholds):
+            above = len(self.sortedIncome) - stop
+            inBand += above * (schedule.thresholds[band + 1] - low)
+
+        return inBand * schedule.rates[band]
+
+    def _columns(self, rows=None):
+        columns = (self.batch.column(name) for name in self.batch.columns)
+        if rows is None:
+            return list(columns)
+        return [column[rows] for column in columns]
+
+    def _schedule(self, year):
+        try:
+            return getYearSchedule(year)
+        except KeyError:
+            return None
+
+    def calculate(self, year):
+        """Return the BatchResult for year, calculating every row once"""
+        self._checkBatch()
+        if year not in self.results:
+            self._schedules[year] = self._schedule(year)
+            self.results[year] = calculateBatch(year, *self._columns())
+
+        return self.results[year]
+
+    def refresh(self, year):
+        """
+        Recalculate the rows whose results the current rates change
+
+        Returns the rows recalculated. A year never calculated, or one
+        which was or has become not valid, is calculated in full.
+        """
+        self._checkBatch()
+        old = self._schedules.get(year)
+        new = self._schedule(year)
+        if year not in self.results or old is None or new is None:
+            self.results.pop(year, None)
+            self.calculate(year)
+            return np.arange(len(self.order))
+
+        if old is new:
+            return np.arange(0)
+
+        rows = np.sort(np.concatenate([np.arange(0)] + [
+            self.rowsBetween(low, high)
+            for low, high in changedRanges(old, new)
+        ]))
+        if len(rows):
+            changed = calculateBatch(year, *self._columns(rows))
+            result = self.results[year]
+            for field in result.fields:
+                getattr(result, field).value[rows] = \
+                    getattr(changed, field).value
+                getattr(result, field).status[rows] = \
+                    getattr(changed, field).status
+
+        self._schedules[year] = new
+        return rows
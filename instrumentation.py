@@ -0,0 +1,168 @@
+"""
+Opt-in instrumentation of the income calculator hot path.
+
+enable() replaces the public methods of EmployeeSalaryInfo, plus
+isFloatValid, getYearSchedule, TaxSchedule.taxDue and
+FloatSuccessType.__init__, with timing wrappers. disable() puts the
+originals back, so nothing is paid while instrumentation is off.
+
+Each wrapped callable records its call count, cumulative, min and max
+seconds (inclusive of nested calls) and a count of failed results by
+message. Hooks receive every call and an export of the current stats.
+"""
+
+import inspect
+from collections import Counter
+from functools import wraps
+from time import perf_counter
+
+import income_calculator
+from income_calculator import EmployeeSalaryInfo, FloatSuccessType, \
+    TaxSchedule
+
+
+class MethodStats:
+    """Timings and failure counts for one instrumented callable"""
+    __slots__ = ('name', 'calls', 'totalSeconds', 'minSeconds',
+                 'maxSeconds', 'failures')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.totalSeconds = 0.0
+        self.minSeconds = float('inf')
+        self.maxSeconds = 0.0
+        self.failures = Counter()
+
+    @property
+    def meanSeconds(self):
+        if not self.calls:
+            return 0.0
+        return self.totalSeconds / self.calls
+
+    def add(self, seconds, result):
+        """Record one call taking seconds which returned result"""
+        self.calls += 1
+        self.totalSeconds += seconds
+        if seconds < self.minSeconds:
+            self.minSeconds = seconds
+        if seconds > self.maxSeconds:
+            self.maxSeconds = seconds
+
+        if result is False:
+            self.failures['returned False'] += 1
+        elif getattr(result, 'status', True) is False:
+            self.failures[result.message or 'no message'] += 1
+
+    def toDict(self):
+        return {
+            'calls': self.calls,
+            'totalSeconds': self.totalSeconds,
+            'meanSeconds': self.meanSeconds,
+            'minSeconds': self.minSeconds if self.calls else 0.0,
+            'maxSeconds': self.maxSeconds,
+            'failures': dict(self.failures),
+        }
+
+
+class InstrumentationHook:
+    """Base class for exporting instrumentation to a metrics system"""
+    def onCall(self, name, seconds, result):
+        """Called after every instrumented call"""
+
+    def export(self, stats):
+        """Called by exportMetrics with {name: MethodStats}"""
+
+
+stats = {}
+_hooks = []
+_originals = {}
+
+
+def _targets():
+    """Yield (owner, attribute, stats name) for every instrumented callable"""
+    for name, value in vars(EmployeeSalaryInfo).items():
+        if inspect.isfunction(value) and not name.startswith('_'):
+            yield EmployeeSalaryInfo, name, f'EmployeeSalaryInfo.{name}'
+
+    yield income_calculator, 'isFloatValid', 'isFloatValid'
+    yield income_calculator, 'getYearSchedule', 'getYearSchedule'
+    yield TaxSchedule, 'taxDue', 'TaxSchedule.taxDue'
+    yield FloatSuccessType, '__init__', 'FloatSuccessType.__init__'
+
+
+def _instrument(name, func):
+    """Return func wrapped to record its timing in stats[name]"""
+    record = stats.setdefault(name, MethodStats(name))
+
+    @wraps(func)
+    def instrumented(*args, **kwargs):
+        started = perf_counter()
+        result = func(*args, **kwargs)
+        seconds = perf_counter() - started
+
+        record.add(seconds, result)
+        for hook in _hooks:
+            hook.onCall(name, seconds, result)
+
+        return result
+
+    return instrumented
+
+
+def isEnabled():
+    return bool(_originals)
+
+
+def enable():
+    """Start recording, wrapping every instrumented callable"""
+    if _originals:
+        return False
+
+    for owner, attribute, name in list(_targets()):
+        original = getattr(owner, attribute)
+        _originals[owner, attribute] = original
+        setattr(owner, attribute, _instrument(name, original))
+
+    return True
+
+
+def disable():
+    """Stop recording and restore the original callables"""
+    if not _originals:
+        return False
+
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+    return True
+
+
+def reset():
+    """Zero every recorded statistic"""
+    for record in stats.values():
+        record.__init__(record.name)
+    return True
+
+
+def addHook(hook):
+    """Register an InstrumentationHook"""
+    _hooks.append(hook)
+    return True
+
+
+def removeHook(hook):
+    """Unregister an InstrumentationHook"""
+    if hook in _hooks:
+        _hooks.remove(hook)
+        return True
+    return False
+
+
+def exportMetrics():
+    """Pass the current stats to every hook and return them as dicts"""
+    for hook in _hooks:
+        hook.export(stats)
+
+    return {name: record.toDict() for name, record in stats.items()}
@@ -0,0 +1,152 @@
+"""
+Cumulative monthly payroll.
+
+MonthlyPayroll keeps year to date pay, PAYE and NI for every employee in
+a few arrays and advances them all one period per call. PAYE is worked
+on the cumulative basis: after period k the pay to date is taxed on the
+year's schedule with thresholds scaled by k/12, and the period's PAYE is
+the tax due to date less the tax already paid, so month 7 is one
+vectorised step rather than a recompute of months 1 to 6. NI is worked
+per period on the schedule scaled by 1/12.
+
+With the same pay every month, PAYE over the year matches getPAYEPaid on
+the annual figures to within a penny of rounding. NI is rounded each
+period so the annual total can differ from getNIPaid by a few pence.
+"""
+
+import numpy as np
+
+from batch_calculator import FloatArraySuccessType, _asColumn, _taxDue, \
+    isArrayValid, roundPennies, scheduleArrays
+from income_calculator import getYearSchedule
+
+
+class PeriodResult:
+    """Per-row figures for one payroll period"""
+    def __init__(self, period, taxablePay, payePaid, niPaid, netPay):
+        self.period = period
+        self.taxablePay = taxablePay
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.netPay = netPay
+
+    def __len__(self):
+        return len(self.netPay)
+
+
+class MonthlyPayroll:
+    """
+    Year to date state of a payroll run period by period
+
+    Raises KeyError when year is not valid.
+    """
+    def __init__(self, year, size, periodsPerYear=12):
+        self.year = year
+        self.periodsPerYear = periodsPerYear
+        self.schedule = getYearSchedule(year)
+        self.period = 0
+        self.payToDate = np.zeros(size)
+        self.payeToDate = np.zeros(size)
+        self.niToDate = np.zeros(size)
+        self._niArrays = scheduleArrays(
+            self.schedule.ni.scaled(1 / periodsPerYear)
+        )
+
+    def __len__(self):
+        return len(self.payToDate)
+
+    def advance(self, incomeTaxable, incomeNonTaxable=None,
+                expensePreTax=None, expensePostTax=None):
+        """
+        Run the next period for every employee from that period's amounts
+
+        Rows with a negative amount, or pre tax expenses above taxable
+        income, are flagged invalid and leave their year to date as it
+        was. Returns a PeriodResult.
+        """
+        if self.period >= self.periodsPerYear:
+            raise ValueError(f'Tax year {self.year} already complete')
+
+        size = self.payToDate.shape
+        incomeTaxable, incomeNonTaxable, expensePreTax, expensePostTax = \
+            np.broadcast_arrays(*(
+                _asColumn(values, size) for values in (
+                    incomeTaxable, incomeNonTaxable, expensePreTax,
+                    expensePostTax
+                )
+            ))
+        self.period += 1
+
+        status = isArrayValid(incomeTaxable) & \
+            isArrayValid(incomeNonTaxable) & isArrayValid(expensePreTax) & \
+            isArrayValid(expensePostTax) & (incomeTaxable >= expensePreTax)
+        taxablePay = np.where(status, incomeTaxable - expensePreTax, 0.0)
+
+        self.payToDate += taxablePay
+        payeDue = roundPennies(_taxDue(
+            self.payToDate,
+            *scheduleArrays(
+                self.schedule.paye.scaled(self.period / self.periodsPerYear)
+            )
+        ))
+        payePaid = np.where(
+            status, roundPennies(payeDue - self.payeToDate), 0.0
+        )
+        niPaid = np.where(
+            status, roundPennies(_taxDue(taxablePay, *self._niArrays)), 0.0
+        )
+        self.payeToDate += payePaid
+        self.niToDate += niPaid
+
+        netPay = np.where(
+            status,
+            roundPennies(
+                taxablePay + incomeNonTaxable - payePaid - niPaid
+                - expensePostTax
+            ),
+            0.0
+        )
+
+        return PeriodResult(
+            self.period,
+            FloatArraySuccessType(taxablePay, status),
+            FloatArraySuccessType(payePaid, status),
+            FloatArraySuccessType(niPaid, status),
+            FloatArraySuccessType(netPay, status),
+        )
+
+    def advanceBatch(self, batch):
+        """Run the next period from an EmployeeBatch's annual amounts"""
+        return self.advance(*(
+            batch.column(name) / self.periodsPerYear
+            for name in batch.columns
+        ))
+
+    def save(self, path):
+        """Write the year to date state to an .npz file"""
+        np.savez(
+            path,
+            year=self.year,
+            period=self.period,
+            periodsPerYear=self.periodsPerYear,
+            payToDate=self.payToDate,
+            payeToDate=self.payeToDate,
+            niToDate=self.niToDate,
+        )
+        return True
+
+    @classmethod
+    def load(cls, path):
+        """Return the MonthlyPayroll saved at path"""
+        with np.load(path) as state:
+            payroll = cls(
+                str(state['year']),
+                len(state['payToDate']),
+                int(state['periodsPerYear'])
+            )
+            payroll.period = int(state['period'])
+            payroll.payToDate[:] = state['payToDate']
+            payroll.payeToDate[:] = state['payeToDate']
+            payroll.niToDate[:] = state['niToDate']
+
+        return payroll
@@ -0,0 +1,84 @@
+"""
+Multi-process payroll runner.
+
+Splits a payroll into chunks and calculates them with calculateBatch in
+a pool of worker processes. The rate tables are sent to each worker once
+when it starts rather than with every chunk, and results are joined back
+in input order.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import income_calculator
+from batch_calculator import BatchResult, calculateBatch
+
+
+def _initWorker(taxRates, pensionBands):
+    """Install the parent's rate tables in a worker process"""
+    taxRates = dict(taxRates)  # forked workers share the module's dicts
+    pensionBands = dict(pensionBands)
+    income_calculator.taxRates.clear()
+    income_calculator.taxRates.update(taxRates)
+    income_calculator.pensionBands.clear()
+    income_calculator.pensionBands.update(pensionBands)
+    income_calculator.clearScheduleCache()
+
+
+def _calculateChunk(task):
+    """Calculate one chunk of rows in a worker"""
+    year, columns = task
+    return calculateBatch(year, *columns)
+
+
+def _chunks(year, columns, chunkSize):
+    """Yield (year, columns) tasks covering consecutive row ranges"""
+    for start in range(0, len(columns[0]), chunkSize):
+        yield year, tuple(
+            column[start:start + chunkSize] for column in columns
+        )
+
+
+def runParallel(year, incomeTaxable, incomeNonTaxable=None,
+                expensePreTax=None, expensePostTax=None, workers=None,
+                chunkSize=100000):
+    """
+    Return calculateBatch results computed across worker processes
+
+    workers defaults to the number of CPUs. Results are identical to a
+    single calculateBatch call and in the same row order.
+    """
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+    columns = [incomeTaxable]
+    for column in (incomeNonTaxable, expensePreTax, expensePostTax):
+        if column is None:
+            column = np.zeros(incomeTaxable.shape)
+        columns.append(np.broadcast_to(
+            np.asarray(column, dtype=np.float64), incomeTaxable.shape
+        ))
+
+    if len(incomeTaxable) == 0:
+        return calculateBatch(year, *columns)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initWorker,
+        initargs=(income_calculator.taxRates, income_calculator.pensionBands),
+    ) as executor:
+        results = executor.map(
+            _calculateChunk, _chunks(year, columns, chunkSize)
+        )
+        return BatchResult.concatenate(results)
+
+
+def runBatchParallel(batch, year, workers=None, chunkSize=100000):
+    """Return runParallel results for every employee of an EmployeeBatch"""
+    return runParallel(
+        year,
+        *(batch.column(name) for name in batch.columns),
+        workers=workers,
+        chunkSize=chunkSize,
+    )
@@ -0,0 +1,185 @@
+"""
+Memory-mapped binary payroll files.
+
+A payroll file is a .npy file holding one fixed-width record per employee
+(employee_name as UTF-8 bytes plus the four input columns as float64),
+so it opens with np.load(mmap_mode='r') as a structured array without
+parsing or copying. calculatePayroll feeds the mapped columns straight
+into calculateBatch a chunk at a time and writes each row's results to
+the same row of a parallel mapped results file, so only the pages of
+the rows being calculated are read or written.
+
+    python payroll_binary.py convert employees.csv employees.npy
+    python payroll_binary.py calculate employees.npy results.npy 2021-2022
+"""
+
+import argparse
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from batch_calculator import BatchResult, EmployeeBatch, calculateBatch
+from payroll_pipeline import PipelineStats, chunked, parseRecord, \
+    readRecords
+
+
+nameWidth = 32
+
+
+def recordDtype(width=nameWidth):
+    """Return the structured dtype of one employee record"""
+    return np.dtype(
+        [('employee_name', f'S{width}')]
+        + [(name, '<f8') for name in EmployeeBatch.columns]
+    )
+
+
+resultDtype = np.dtype(
+    [(field, '<f8') for field in BatchResult.fields]
+    + [(f'{field}Status', '?') for field in BatchResult.fields]
+)
+
+
+def encodeNames(names, width=nameWidth):
+    """Return names as an array of fixed-width UTF-8 bytes"""
+    encoded = [str(name).encode() for name in names]
+    longest = max(map(len, encoded), default=0)
+    if longest > width:
+        raise ValueError(f'Employee name of {longest} bytes, limit {width}')
+
+    return np.array(encoded, dtype=f'S{width}')
+
+
+def decodeNames(records):
+    """Return the employee names of mapped records as strings"""
+    return [name.decode() for name in records['employee_name'].tolist()]
+
+
+def writePayroll(path, batch, width=nameWidth, chunkRows=1000000):
+    """Write an EmployeeBatch to a payroll file, return the mapped records"""
+    records = open_memmap(
+        path, mode='w+', dtype=recordDtype(width), shape=(len(batch),)
+    )
+    for start in range(0, len(batch), chunkRows):
+        stop = min(start + chunkRows, len(batch))
+        records['employee_name'][start:stop] = encodeNames(
+            batch.names[start:stop], width
+        )
+        for name in batch.columns:
+            records[name][start:stop] = batch.column(name)[start:stop]
+
+    records.flush()
+    return records
+
+
+def openPayroll(path, mode='r'):
+    """Return the records of a payroll or results file, mapped not read"""
+    return np.load(path, mmap_mode=mode)
+
+
+def convertRecords(inputPath, outputPath, width=nameWidth, chunkSize=100000):
+    """
+    Convert CSV or JSONL records to a payroll file
+
+    Records parseRecord rejects are skipped and counted. Returns the
+    PipelineStats of the conversion.
+    """
+    stats = PipelineStats()
+    batch = EmployeeBatch()
+
+    for chunk in chunked(readRecords(inputPath), chunkSize):
+        names = []
+        values = []
+        for record in chunk:
+            stats.rowsRead += 1
+            name, parsed = parseRecord(record)
+            if name is None:
+                stats.rowsRejected += 1
+            else:
+                names.append(name)
+                values.append(parsed)
+
+        if names:
+            batch.extend(names, *zip(*values))
+            stats.rowsWritten += len(names)
+
+    writePayroll(outputPath, batch, width)
+    stats.seconds = time.perf_counter() - stats.started
+    return stats
+
+
+def calculatePayroll(inputPath, outputPath, year, percentage=0.0,
+                     pre_tax=False, post_tax=False, start=0, stop=None,
+                     chunkRows=1000000):
+    """
+    Calculate rows start to stop of a payroll file into a results file
+
+    The results file has one resultDtype record per payroll row. It is
+    created when missing, otherwise only rows start to stop are
+    rewritten, so a rerun of part of a payroll leaves the other results
+    in place. Returns the mapped results.
+    """
+    records = openPayroll(inputPath)
+    stop = len(records) if stop is None else min(stop, len(records))
+
+    try:
+        results = openPayroll(outputPath, mode='r+')
+    except FileNotFoundError:
+        results = open_memmap(
+            outputPath, mode='w+', dtype=resultDtype, shape=(len(records),)
+        )
+    if results.dtype != resultDtype or len(results) != len(records):
+        raise ValueError(f'{outputPath} does not match {inputPath}')
+
+    for first in range(start, stop, chunkRows):
+        last = min(first + chunkRows, stop)
+        chunk = records[first:last]
+        result = calculateBatch(
+            year,
+            *(chunk[name] for name in EmployeeBatch.columns),
+            percentage=percentage,
+            pre_tax=pre_tax,
+            post_tax=post_tax,
+        )
+
+        rows = results[first:last]
+        for field in BatchResult.fields:
+            rows[field] = getattr(result, field).value
+            rows[f'{field}Status'] = getattr(result, field).status
+
+    results.flush()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='CSV/JSONL to payroll file')
+    convert.add_argument('input')
+    convert.add_argument('output')
+    convert.add_argument('--name-width', type=int, default=nameWidth)
+
+    calculate = commands.add_parser('calculate', help='payroll to results')
+    calculate.add_argument('input')
+    calculate.add_argument('output')
+    calculate.add_argument('year', help="Tax year e.g. '2021-2022'")
+    calculate.add_argument('--start', type=int, default=0)
+    calculate.add_argument('--stop', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        print(convertRecords(args.input, args.output, args.name_width))
+    else:
+        started = time.perf_counter()
+        calculatePayroll(
+            args.input, args.output, args.year,
+            start=args.start, stop=args.stop
+        )
+        print(f'{args.output} written in '
+              f'{time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
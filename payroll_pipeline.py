@@ -0,0 +1,274 @@
+"""
+Streaming payroll pipeline.
+
+Reads employee records lazily from CSV or JSONL, calculates each chunk
+with the batch, scalar or cached scalar calculator and streams the results
+to an output file, so memory use depends on the chunk size rather than
+the size of the extract. Rows with values isFloatValid would reject are
+written to a reject file instead of stopping the run.
+
+Input records hold employee_name plus any of incomeTaxable,
+incomeNonTaxable, expensePreTax and expensePostTax (missing values are
+0.0).
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from batch_calculator import calculateBatch
+from income_calculator import calculatePayslip, isFloatValid, \
+    payslipCache
+
+
+inputFields = (
+    'incomeTaxable', 'incomeNonTaxable', 'expensePreTax', 'expensePostTax'
+)
+outputFields = (
+    'employee_name', 'grossIncome', 'payePaid', 'niPaid', 'deductions',
+    'netIncome', 'status'
+)
+
+
+class PipelineStats:
+    """Row counts and throughput of a pipeline run"""
+    def __init__(self):
+        self.rowsRead = 0
+        self.rowsWritten = 0
+        self.rowsRejected = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def rowsPerSecond(self):
+        if self.seconds <= 0:
+            return 0.0
+        return self.rowsRead / self.seconds
+
+    def __repr__(self):
+        return f'{self.rowsRead} rows read, {self.rowsWritten} written, '\
+               f'{self.rowsRejected} rejected in {self.seconds:.2f}s '\
+               f'({self.rowsPerSecond:,.0f} rows/s)'
+
+
+def _isJsonl(path):
+    return str(path).endswith(('.jsonl', '.ndjson'))
+
+
+class MalformedRecord:
+    """Stands in for a JSONL line that is not valid JSON"""
+    __slots__ = ('line', 'reason')
+
+    def __init__(self, line, reason):
+        self.line = line
+        self.reason = reason
+
+
+def readRecords(path):
+    """
+    Yield each record of a CSV or JSONL file as a dict
+
+    A JSONL line that does not decode is yielded as a MalformedRecord so
+    it can be rejected without ending the read.
+    """
+    with open(path, newline='') as file:
+        if _isJsonl(path):
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as error:
+                        yield MalformedRecord(
+                            line.rstrip('\r\n'), f'Invalid JSON: {error}'
+                        )
+        else:
+            yield from csv.DictReader(file)
+
+
+def parseRecord(record):
+    """
+    Return (employee_name, values) for a record
+
+    Returns (None, reason) when the name is missing or a value is not a
+    number or is rejected by isFloatValid.
+    """
+    if isinstance(record, MalformedRecord):
+        return None, record.reason
+    if not isinstance(record, dict) or record.get('employee_name') in \
+            (None, ''):
+        return None, 'Employee name missing'
+
+    values = []
+    for field in inputFields:
+        value = record.get(field)
+        if value in (None, ''):
+            value = 0.0
+        elif isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                return None, f'{field} not valid'
+
+        if isinstance(value, bool) or not isFloatValid(value):
+            return None, f'{field} not valid'
+        values.append(value)
+
+    return record['employee_name'], values
+
+
+def chunked(iterable, chunkSize):
+    """Yield lists of up to chunkSize items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunkSize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _calculateBatchChunk(year, names, values):
+    """Yield output rows for one chunk using calculateBatch"""
+    result = calculateBatch(year, *zip(*values))
+    columns = (
+        result.grossIncome.value.tolist(),
+        result.payePaid.value.tolist(),
+        result.niPaid.value.tolist(),
+        result.deductions.value.tolist(),
+        result.netIncome.value.tolist(),
+        result.netIncome.status.tolist(),
+    )
+    for name, row in zip(names, zip(*columns)):
+        yield (name,) + row
+
+
+def _calculateScalarChunk(year, names, values):
+    """Yield output rows for one chunk using calculatePayslip"""
+    for name, row in zip(names, values):
+        payslip = calculatePayslip(year, *row)
+        yield (
+            name,
+            payslip.grossIncome,
+            payslip.payePaid,
+            payslip.niPaid,
+            payslip.deductions,
+            payslip.netIncome,
+            payslip.status,
+        )
+
+
+def _calculateCachedChunk(year, names, values):
+    """Yield output rows for one chunk using the shared payslipCache"""
+    for name, row in zip(names, values):
+        payslip = payslipCache.payslip(year, *row)
+        yield (
+            name,
+            payslip.grossIncome,
+            payslip.payePaid,
+            payslip.niPaid,
+            payslip.deductions,
+            payslip.netIncome,
+            payslip.status,
+        )
+
+
+calculators = {
+    'batch': _calculateBatchChunk,
+    'scalar': _calculateScalarChunk,
+    'cached': _calculateCachedChunk,
+}
+
+
+class _RowWriter:
+    """Write output rows as CSV or JSONL depending on the file name"""
+    def __init__(self, file, path):
+        self.jsonl = _isJsonl(path)
+        self.file = file
+        if not self.jsonl:
+            self.writer = csv.writer(file)
+            self.writer.writerow(outputFields)
+
+    def writeRows(self, rows):
+        if self.jsonl:
+            self.file.writelines(
+                json.dumps(dict(zip(outputFields, row))) + '\n'
+                for row in rows
+            )
+        else:
+            self.writer.writerows(rows)
+
+
+def runPipeline(inputPath, outputPath, year, rejectPath=None,
+                chunkSize=10000, mode='batch', progress=None):
+    """
+    Calculate every record of inputPath into outputPath chunk by chunk
+
+    mode is 'batch', 'scalar' or 'cached', which shares payslips between
+    identical rows. Rejected rows are written as JSONL to rejectPath with
+    their row number and reason, or dropped if no rejectPath is given.
+    progress is called with the PipelineStats after each chunk. Returns
+    the final PipelineStats.
+    """
+    calculate = calculators[mode]
+    stats = PipelineStats()
+
+    with open(outputPath, 'w', newline='') as output, \
+            open(rejectPath or os.devnull, 'w') as rejects:
+        writer = _RowWriter(output, outputPath)
+
+        for chunk in chunked(readRecords(inputPath), chunkSize):
+            names = []
+            values = []
+            for record in chunk:
+                stats.rowsRead += 1
+                name, parsed = parseRecord(record)
+                if name is None:
+                    stats.rowsRejected += 1
+                    rejects.write(json.dumps({
+                        'row': stats.rowsRead,
+                        'reason': parsed,
+                        'record': record.line
+                        if isinstance(record, MalformedRecord) else record,
+                    }) + '\n')
+                else:
+                    names.append(name)
+                    values.append(parsed)
+
+            if names:
+                writer.writeRows(calculate(year, names, values))
+                stats.rowsWritten += len(names)
+
+            stats.seconds = time.perf_counter() - stats.started
+            if progress is not None:
+                progress(stats)
+
+    stats.seconds = time.perf_counter() - stats.started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('input', help='CSV or JSONL employee records')
+    parser.add_argument('output', help='CSV or JSONL results file')
+    parser.add_argument('year', help="Tax year e.g. '2021-2022'")
+    parser.add_argument('--rejects', help='JSONL file for rejected rows')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--mode', choices=sorted(calculators), default='batch')
+    args = parser.parse_args(argv)
+
+    stats = runPipeline(
+        args.input,
+        args.output,
+        args.year,
+        rejectPath=args.rejects,
+        chunkSize=args.chunk_size,
+        mode=args.mode,
+        progress=print,
+    )
+    print(stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Streaming payroll statistics.
+
+PayrollStats summarises any number of payslips without keeping them:
+exact totals of every figure in whole pence, a QuantileSketch of net
+income for the median, p90 and p99 take-home, and optional PayHistograms
+counting payslips between fixed edges. Payslips are added one at a time
+from calculatePayslip or a row at a time from FloatSuccessTypes, or a
+BatchResult at a time from calculateBatch.
+
+Every part is mergeable: merge adds another summary's counts into this
+one, and the merged result is the same whatever order the partials are
+combined in, so workers can each summarise their own chunk and send
+back a few kilobytes instead of their rows.
+"""
+
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+from batch_calculator import BatchResult
+from pence_calculator import toPence, toPenceArray
+
+
+class PayTotals:
+    """Exact totals of each BatchResult field in whole pence"""
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.pence = dict.fromkeys(BatchResult.fields, 0)
+
+    def total(self, field):
+        """Return the total of field in pounds"""
+        return self.pence[field] / 100
+
+    def addFigures(self, status, figures):
+        """Add one payslip's {field: value} figures, failed ones counted"""
+        if not status:
+            self.failed += 1
+            return False
+
+        self.count += 1
+        for field, value in figures.items():
+            self.pence[field] += toPence(value)
+        return True
+
+    def addBatch(self, result):
+        """Add the rows of a BatchResult whose net income succeeded"""
+        valid = result.netIncome.status
+        count = int(np.count_nonzero(valid))
+        self.count += count
+        self.failed += len(valid) - count
+        for field in BatchResult.fields:
+            self.pence[field] += int(
+                toPenceArray(getattr(result, field).value[valid]).sum()
+            )
+        return True
+
+    def merge(self, other):
+        self.count += other.count
+        self.failed += other.failed
+        for field in self.pence:
+            self.pence[field] += other.pence[field]
+        return self
+
+
+class QuantileSketch:
+    """
+    Bounded memory quantile estimates with a relative error guarantee
+
+    Values are counted in logarithmic buckets so any quantile comes back
+    within relativeAccuracy of a value in the data, as in DDSketch.
+    Values within a penny of zero share one bucket. Past maxBuckets the
+    buckets of the smallest magnitudes are folded together, which only
+    loses accuracy in the low tail.
+    """
+    def __init__(self, relativeAccuracy=0.01, maxBuckets=2048):
+        if not 0 < relativeAccuracy < 1:
+            raise ValueError('relativeAccuracy must be between 0 and 1')
+
+        self.relativeAccuracy = relativeAccuracy
+        self.maxBuckets = maxBuckets
+        self.gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def _keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._logGamma).astype(np.int64)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        """Add one value"""
+        self.count += 1
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if abs(value) < 0.01:
+            self.zeros += 1
+            return True
+
+        buckets = self.positive if value > 0 else self.negative
+        key = math.ceil(math.log(abs(value)) / self._logGamma)
+        buckets[key] = buckets.get(key, 0) + 1
+        self._collapse(buckets)
+        return True
+
+    def addArray(self, values):
+        """Add every value of an array"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return True
+
+        self.count += len(values)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+        small = np.abs(values) < 0.01
+        self.zeros += int(np.count_nonzero(small))
+        for buckets, magnitudes in (
+                (self.positive, values[~small & (values > 0)]),
+                (self.negative, -values[~small & (values < 0)])):
+            keys, counts = np.unique(
+                self._keys(magnitudes), return_counts=True
+            )
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                buckets[key] = buckets.get(key, 0) + count
+            self._collapse(buckets)
+        return True
+
+    def _collapse(self, buckets):
+        """
+        Fold keys more than maxBuckets below the highest into the lowest
+        key kept
+
+        The fold depends only on the highest key, never on how many
+        buckets happen to be held, so adds and merges in any order give
+        the same buckets.
+        """
+        if not buckets:
+            return
+        floor = max(buckets) - self.maxBuckets + 1
+        low = [key for key in buckets if key < floor]
+        if low:
+            folded = sum(buckets.pop(key) for key in low)
+            buckets[floor] = buckets.get(floor, 0) + folded
+
+    def merge(self, other):
+        if other.gamma != self.gamma or other.maxBuckets != self.maxBuckets:
+            raise ValueError('QuantileSketch settings differ')
+
+        for buckets, others in ((self.positive, other.positive),
+                                (self.negative, other.negative)):
+            for key, count in others.items():
+                buckets[key] = buckets.get(key, 0) + count
+            self._collapse(buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def quantile(self, q):
+        """Return the estimated q quantile, nan when empty"""
+        if not 0 <= q <= 1:
+            raise ValueError('Quantile must be within 0 - 1 range')
+        if self.count == 0:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return self._clamp(-self._value(key))
+        seen += self.zeros
+        if seen > rank:
+            return self._clamp(0.0)
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._clamp(self._value(key))
+
+        return self.maximum
+
+    def _clamp(self, value):
+        return min(max(value, self.minimum), self.maximum)
+
+
+class PayHistogram:
+    """
+    Number and exact pence total of payslips between fixed edges of field
+
+    Bin 0 holds values below edges[0] and the last bin values at or above
+    edges[-1], so there is one more bin than edges.
+    """
+    def __init__(self, edges, field='netIncome'):
+        if field not in BatchResult.fields:
+            raise ValueError(f'{field} is not a BatchResult field')
+
+        self.edges = tuple(sorted(edges))
+        self.field = field
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.pence = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    def addValue(self, value):
+        """Add one successful payslip's figure"""
+        index = bisect_right(self.edges, value)
+        self.counts[index] += 1
+        self.pence[index] += toPence(value)
+        return True
+
+    def addArray(self, values):
+        """Add an array of successful payslips' figures"""
+        values = np.asarray(values, dtype=np.float64)
+        bins = np.searchsorted(self.edges, values, side='right')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        np.add.at(self.pence, bins, toPenceArray(values))
+        return True
+
+    def merge(self, other):
+        if other.edges != self.edges or other.field != self.field:
+            raise ValueError('PayHistogram edges or field differ')
+
+        self.counts += other.counts
+        self.pence += other.pence
+        return self
+
+
+class PayrollStats:
+    """
+    Totals, net income quantiles and histograms of a stream of payslips
+
+    Failed payslips are counted in totals.failed and otherwise left out.
+    """
+    def __init__(self, histograms=(), relativeAccuracy=0.01,
+                 maxBuckets=2048):
+        self.totals = PayTotals()
+        self.netIncome = QuantileSketch(relativeAccuracy, maxBuckets)
+        self.histograms = [
+            PayHistogram(edges, field) for edges, field in histograms
+        ]
+
+    def __len__(self):
+        return self.totals.count
+
+    def addFigures(self, **figures):
+        """
+        Add one payslip from FloatSuccessType figures named by field
+
+        The payslip counts as failed when any figure failed. Figures not
+        given add nothing to their totals.
+        """
+        if 'netIncome' not in figures:
+            raise ValueError('netIncome is needed')
+
+        status = all(figure.status for figure in figures.values())
+        values = {field: figure.value for field, figure in figures.items()}
+        return self._addValues(status, values)
+
+    def add(self, payslip):
+        """Add a Payslip"""
+        return self._addValues(payslip.status, {
+            field: getattr(payslip, field) for field in BatchResult.fields
+        })
+
+    def _addValues(self, status, values):
+        if not self.totals.addFigures(status, values):
+            return False
+
+        self.netIncome.add(values['netIncome'])
+        for histogram in self.histograms:
+            if histogram.field in values:
+                histogram.addValue(values[histogram.field])
+        return True
+
+    def addBatch(self, result):
+        """Add every row of a BatchResult"""
+        self.totals.addBatch(result)
+        valid = result.netIncome.status
+        self.netIncome.addArray(result.netIncome.value[valid])
+        for histogram in self.histograms:
+            histogram.addArray(getattr(result, histogram.field).value[valid])
+        return True
+
+    def merge(self, other):
+        """Add another PayrollStats into this one, returns self"""
+        if len(other.histograms) != len(self.histograms):
+            raise ValueError('PayrollStats histograms differ')
+
+        self.totals.merge(other.totals)
+        self.netIncome.merge(other.netIncome)
+        for histogram, others in zip(self.histograms, other.histograms):
+            histogram.merge(others)
+        return self
+
+    def quantile(self, q):
+        """Return the estimated q quantile of net income"""
+        return self.netIncome.quantile(q)
+
+    def summary(self):
+        """Return totals in pounds and the median, p90 and p99 net income"""
+        summary = {
+            field: self.totals.total(field) for field in BatchResult.fields
+        }
+        summary.update(
+            count=self.totals.count,
+            failed=self.totals.failed,
+            median=self.quantile(0.5),
+            p90=self.quantile(0.9),
+            p99=self.quantile(0.99),
+        )
+        return summary
@@ -0,0 +1,341 @@
+"""
+Integer pence calculations.
+
+Every amount is held as a whole number of pence (Python ints for single
+payslips, int64 arrays for batches), thresholds are compiled to pence and
+rates to basis points, so band arithmetic is exact integer arithmetic.
+
+Rounding happens only at these points, always to the nearest penny with
+halves going to the even penny:
+    - toPence, when pounds enter at the API boundary
+    - PAYE, NI and pension, once each from their exact value
+Gross, deductions and net are exact sums of those pence, so totals over
+any number of payslips reconcile exactly.
+"""
+
+from bisect import bisect_left
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_EVEN
+
+import numpy as np
+
+from batch_calculator import BatchResult, FloatArraySuccessType
+from income_calculator import getYearSchedule
+
+
+def toPence(value):
+    """Return pounds as whole pence, rounding half to even"""
+    return int(
+        Decimal(repr(float(value))).scaleb(2)
+        .to_integral_value(ROUND_HALF_EVEN)
+    )
+
+
+def toPounds(pence):
+    """Return pence as pounds"""
+    return pence / 100
+
+
+def toPenceArray(values):
+    """Return an array of pounds as int64 pence, rounding half to even"""
+    return np.rint(
+        np.round(np.asarray(values, dtype=np.float64) * 100, 6)
+    ).astype(np.int64)
+
+
+def _basisPoints(rate_pct):
+    """Return a percentage as whole basis points"""
+    return toPence(rate_pct)
+
+
+def roundDivide(numerator, denominator):
+    """Return numerator / denominator rounded half to even, for ints"""
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or \
+            (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def roundDivideArray(numerator, denominator):
+    """Array counterpart of roundDivide for int64 arrays"""
+    quotient, remainder = np.divmod(numerator, denominator)
+    roundUp = (2 * remainder > denominator) | \
+        ((2 * remainder == denominator) & (quotient % 2 == 1))
+    return quotient + roundUp
+
+
+unitsPerPenny = 10000  # tax is worked in pence x basis points
+
+
+class PenceSchedule(namedtuple('PenceSchedule',
+                               ['thresholds', 'rates', 'cumulative'])):
+    """
+    TaxSchedule with thresholds in pence and rates in basis points
+
+    cumulative holds the exact tax at each threshold in pence x basis
+    points, so no rounding happens until taxDue returns.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fromTaxSchedule(cls, schedule):
+        thresholds = tuple(toPence(value) for value in schedule.thresholds)
+        rates = tuple(_basisPoints(rate * 100) for rate in schedule.rates)
+
+        cumulative = [0]
+        for i in range(1, len(thresholds)):
+            cumulative.append(
+                cumulative[-1] + (thresholds[i] - thresholds[i-1]) * rates[i-1]
+            )
+
+        return cls(thresholds, rates, tuple(cumulative))
+
+    def taxUnits(self, income):
+        """Return exact tax on income pence in pence x basis points"""
+        band = bisect_left(self.thresholds, income) - 1
+        if band < 0:
+            return 0
+
+        return self.cumulative[band] \
+            + (income - self.thresholds[band]) * self.rates[band]
+
+    def taxDue(self, income):
+        """Return tax on income pence, rounded once to the penny"""
+        return roundDivide(self.taxUnits(income), unitsPerPenny)
+
+    def taxDueArray(self, income):
+        """Return tax on an int64 array of income pence"""
+        thresholds = np.asarray(self.thresholds, dtype=np.int64)
+        rates = np.asarray(self.rates, dtype=np.int64)
+        cumulative = np.asarray(self.cumulative, dtype=np.int64)
+        if len(thresholds) == 0:
+            return np.zeros(np.shape(income), dtype=np.int64)
+
+        band = np.searchsorted(thresholds, income, side='left') - 1
+        inBand = band >= 0
+        band = np.maximum(band, 0)
+        units = cumulative[band] + (income - thresholds[band]) * rates[band]
+
+        return np.where(
+            inBand, roundDivideArray(units, unitsPerPenny), 0
+        ).astype(np.int64)
+
+
+_penceSchedules = {}
+
+
+def getPenceSchedules(year):
+    """
+    Return PAYE and NI PenceSchedules and pension band for year
+
+    Raises KeyError when year is not valid.
+    """
+    schedule = getYearSchedule(year)
+    try:
+        cached = _penceSchedules[year]
+    except KeyError:
+        cached = None
+    if cached is None or cached[0] is not schedule:
+        pensionBand = None
+        if schedule.pensionBand is not None:
+            pensionBand = tuple(toPence(value) for value in
+                                schedule.pensionBand)
+        cached = _penceSchedules[year] = (
+            schedule,
+            PenceSchedule.fromTaxSchedule(schedule.paye),
+            PenceSchedule.fromTaxSchedule(schedule.ni),
+            pensionBand,
+        )
+
+    return cached[1:]
+
+
+class PencePayslip:
+    """Payslip with every amount in whole pence"""
+    __slots__ = ('grossIncome', 'payePaid', 'niPaid', 'pension',
+                 'deductions', 'netIncome', 'status', 'message')
+
+    def __init__(self, grossIncome=0, payePaid=0, niPaid=0, pension=0,
+                 deductions=0, netIncome=0, status=True, message=''):
+        self.grossIncome = grossIncome
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.pension = pension
+        self.deductions = deductions
+        self.netIncome = netIncome
+        self.status = status
+        self.message = message
+
+    def __repr__(self):
+        if not self.status:
+            return f'PencePayslip error: {self.message}'
+
+        return f'PencePayslip(gross={self.grossIncome}, '\
+               f'paye={self.payePaid}, ni={self.niPaid}, '\
+               f'pension={self.pension}, deductions={self.deductions}, '\
+               f'net={self.netIncome})'
+
+
+def _pensionUnits(pensionBand, incomeTaxable, percentage):
+    """Return (pension numerator, denominator) for whole pence income"""
+    lower_band, upper_band = pensionBand
+    pensionable_earnings = min(
+        max(incomeTaxable - lower_band, 0), upper_band - lower_band
+    )
+    return pensionable_earnings * _basisPoints(percentage), unitsPerPenny
+
+
+def calculatePayslipPence(year, incomeTaxable, incomeNonTaxable=0,
+                          expensePreTax=0, expensePostTax=0, percentage=0.0,
+                          pre_tax=False, post_tax=False):
+    """
+    Return a PencePayslip for amounts given in whole pence
+
+    Checks and messages follow calculatePayslip. A post tax pension is
+    80% of the pre tax figure, rounded once.
+    """
+    if incomeTaxable < 0 or incomeNonTaxable < 0:
+        return PencePayslip(status=False, message="Value not valid")
+
+    if not (expensePreTax >= 0 and incomeTaxable > expensePreTax):
+        return PencePayslip(status=False, message="Taxable income invalid")
+
+    try:
+        paye, ni, pensionBand = getPenceSchedules(year)
+    except KeyError:
+        return PencePayslip(status=False, message="Year not valid")
+
+    pension = 0
+    if percentage:
+        if post_tax == pre_tax:
+            return PencePayslip(
+                status=False,
+                message="Pension must be either pre OR post tax"
+            )
+        if not (percentage >= 0 and percentage <= 100):
+            return PencePayslip(
+                status=False,
+                message="Percentage must be within 0 - 100 range"
+            )
+        if pensionBand is None:
+            return PencePayslip(status=False, message="Year not valid")
+
+        units, denominator = _pensionUnits(
+            pensionBand, incomeTaxable, percentage
+        )
+        if post_tax:
+            pension = roundDivide(units * 8, denominator * 10)
+            expensePostTax += pension
+        else:
+            pension = roundDivide(units, denominator)
+            expensePreTax += pension
+            if not incomeTaxable > expensePreTax:
+                return PencePayslip(
+                    status=False, message="Taxable income invalid"
+                )
+
+    if expensePostTax < 0:
+        return PencePayslip(status=False, message='Post tax expenses invalid')
+
+    taxableIncome = incomeTaxable - expensePreTax
+    grossIncome = incomeTaxable + incomeNonTaxable
+    payePaid = paye.taxDue(taxableIncome)
+    niPaid = ni.taxDue(taxableIncome)
+    deductions = payePaid + niPaid + expensePostTax + expensePreTax
+
+    return PencePayslip(
+        grossIncome,
+        payePaid,
+        niPaid,
+        pension,
+        deductions,
+        grossIncome - deductions,
+    )
+
+
+def _asPenceColumn(values, size):
+    """Return values as an int64 array, zeros when not given"""
+    if values is None:
+        return np.zeros(size, dtype=np.int64)
+    return np.asarray(values, dtype=np.int64)
+
+
+def calculateBatchPence(year, incomeTaxable, incomeNonTaxable=None,
+                        expensePreTax=None, expensePostTax=None,
+                        percentage=0.0, pre_tax=False, post_tax=False):
+    """
+    Return calculateBatch results for int64 pence arrays
+
+    Each field's value array is int64 pence, rows match
+    calculatePayslipPence.
+    """
+    incomeTaxable = np.asarray(incomeTaxable, dtype=np.int64)
+    size = incomeTaxable.shape
+    incomeNonTaxable, expensePreTax, expensePostTax = np.broadcast_arrays(
+        _asPenceColumn(incomeNonTaxable, size),
+        _asPenceColumn(expensePreTax, size),
+        _asPenceColumn(expensePostTax, size),
+    )
+    zeros = np.zeros(size, dtype=np.int64)
+
+    validTaxable = incomeTaxable >= 0
+    grossStatus = validTaxable & (incomeNonTaxable >= 0)
+    grossIncome = np.where(grossStatus, incomeTaxable + incomeNonTaxable, 0)
+
+    try:
+        paye, ni, pensionBand = getPenceSchedules(year)
+        yearValid = True
+    except KeyError:
+        yearValid = False
+
+    pension = zeros
+    if percentage and yearValid:
+        yearValid = post_tax != pre_tax and \
+            0 <= percentage <= 100 and \
+            pensionBand is not None
+        if yearValid:
+            lower_band, upper_band = pensionBand
+            pensionable_earnings = np.minimum(
+                np.maximum(incomeTaxable - lower_band, 0),
+                upper_band - lower_band
+            )
+            units = pensionable_earnings * _basisPoints(percentage)
+            if post_tax:
+                pension = roundDivideArray(units * 8, unitsPerPenny * 10)
+                expensePostTax = expensePostTax + pension
+            else:
+                pension = roundDivideArray(units, unitsPerPenny)
+                expensePreTax = expensePreTax + pension
+
+    taxStatus = validTaxable & (expensePreTax >= 0) & \
+        (incomeTaxable > expensePreTax)
+    if not yearValid:
+        taxStatus = np.zeros(size, dtype=bool)
+    taxableIncome = np.where(taxStatus, incomeTaxable - expensePreTax, 0)
+
+    if yearValid:
+        payePaid = np.where(taxStatus, paye.taxDueArray(taxableIncome), 0)
+        niPaid = np.where(taxStatus, ni.taxDueArray(taxableIncome), 0)
+    else:
+        payePaid = zeros
+        niPaid = zeros
+
+    deductionsStatus = taxStatus & (expensePostTax >= 0)
+    deductions = np.where(
+        deductionsStatus,
+        payePaid + niPaid + expensePostTax + expensePreTax,
+        0
+    )
+
+    netStatus = grossStatus & deductionsStatus
+    netIncome = np.where(netStatus, grossIncome - deductions, 0)
+
+    return BatchResult(
+        FloatArraySuccessType(grossIncome, grossStatus),
+        FloatArraySuccessType(payePaid, taxStatus),
+        FloatArraySuccessType(niPaid, taxStatus),
+        FloatArraySuccessType(np.where(taxStatus, pension, 0), taxStatus),
+        FloatArraySuccessType(deductions, deductionsStatus),
+        FloatArraySuccessType(netIncome, netStatus),
+    )
@@ -0,0 +1,306 @@
+"""
+Rate table registry.
+
+Loads taxRates and pensionBands from a JSON or TOML data file, validates
+them and compiles each year into a YearSchedule. The validated and
+compiled form is pickled next to the data file, keyed by a hash of the
+file, so later processes skip parsing, validation and compiling until
+the file changes. New tax years ship as data rather than code.
+
+The data file holds two tables, in the same shape as the module level
+dicts in income_calculator:
+    {"pensionBands": {"2021-2022": {"lower_level": ..., "higher_level": ...}},
+     "taxRates": {"2021-2022": {"PAYE_rate1": {"threshold": ...,
+                                               "rate_pct": ...}, ...}}}
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 reads JSON only
+    tomllib = None
+
+
+defaultRatesPath = os.environ.get(
+    'INCOME_CALCULATOR_RATES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tax_rates.json')
+)
+cacheVersion = 1
+
+_bandKey = re.compile(r'^(PAYE|NI)_rate\d+$')
+
+
+class RateTableError(ValueError):
+    """A rate table data file failed validation"""
+
+
+class taxRateBandType:
+    __slots__ = ('threshold', 'rate_pct')
+
+    def __init__(self, threshold, rate_pct):
+        self.threshold = threshold
+        self.rate_pct = rate_pct
+
+
+class TaxSchedule(namedtuple('TaxSchedule',
+                             ['thresholds', 'rates', 'cumulative'])):
+    """
+    Immutable set of tax bands for any number of bands
+
+    thresholds are sorted ascending, rates are fractions rather than
+    percentages and cumulative holds the tax due at each threshold, so
+    tax on any income is one bisect plus one multiply-add.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fromBands(cls, bands):
+        """Compile a schedule from an iterable of taxRateBandType"""
+        bands = sorted(bands, key=lambda band: band.threshold)
+        thresholds = tuple(band.threshold for band in bands)
+        rates = tuple(band.rate_pct/100 for band in bands)
+
+        cumulative = [0.0]
+        for i in range(1, len(bands)):
+            cumulative.append(
+                cumulative[-1] + (thresholds[i] - thresholds[i-1]) * rates[i-1]
+            )
+
+        return cls(thresholds, rates, tuple(cumulative))
+
+    def scaled(self, factor):
+        """
+        Return the schedule with thresholds scaled by factor
+
+        Tax on factor * income is factor * the tax on income, so scaling
+        by 1/12 gives a monthly schedule and by k/12 the schedule for pay
+        to date after k months.
+        """
+        return TaxSchedule(
+            tuple(threshold * factor for threshold in self.thresholds),
+            self.rates,
+            tuple(tax * factor for tax in self.cumulative),
+        )
+
+    def bandIndex(self, income):
+        """Return index of the band income falls in, -1 if below all bands"""
+        return bisect_left(self.thresholds, income) - 1
+
+    def taxDue(self, income):
+        """Return unrounded tax due on income"""
+        band = bisect_left(self.thresholds, income) - 1
+        if band < 0:
+            return 0.0
+
+        return self.cumulative[band] \
+               + (income - self.thresholds[band]) * self.rates[band]
+
+
+class YearSchedule(namedtuple('YearSchedule',
+                              ['year', 'paye', 'ni', 'pensionBand'])):
+    """Compiled PAYE and NI schedules plus (lower, higher) pension band"""
+    __slots__ = ()
+
+
+def _compileBands(yearRates, prefix):
+    """Return a TaxSchedule for every band in yearRates named prefix + n"""
+    return TaxSchedule.fromBands(
+        taxRateBandType(band['threshold'], band['rate_pct'])
+        for key, band in yearRates.items()
+        if key.startswith(prefix)
+    )
+
+
+def compileSchedule(year, yearRates, yearPensionBands=None):
+    """Compile one year's tax rates and optional pension bands"""
+    pensionBand = None
+    if yearPensionBands is not None:
+        pensionBand = (
+            yearPensionBands['lower_level'],
+            yearPensionBands['higher_level'],
+        )
+
+    return YearSchedule(
+        year,
+        _compileBands(yearRates, 'PAYE_rate'),
+        _compileBands(yearRates, 'NI_rate'),
+        pensionBand,
+    )
+
+
+def _isAmount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) \
+        and value >= 0
+
+
+def validateRateTables(taxRates, pensionBands):
+    """Raise RateTableError describing every problem with the tables"""
+    problems = []
+
+    if not isinstance(taxRates, dict) or not isinstance(pensionBands, dict):
+        raise RateTableError('taxRates and pensionBands must be tables')
+
+    for year, yearRates in taxRates.items():
+        if not isinstance(yearRates, dict):
+            problems.append(f'taxRates[{year!r}] must be a table')
+            continue
+
+        thresholds = {'PAYE': [], 'NI': []}
+        for key, band in yearRates.items():
+            where = f'taxRates[{year!r}][{key!r}]'
+            match = _bandKey.match(key)
+            if not match:
+                problems.append(f'{where} is not a PAYE_rateN or NI_rateN')
+                continue
+            if not isinstance(band, dict):
+                problems.append(f'{where} must be a table')
+                continue
+            if not _isAmount(band.get('threshold')):
+                problems.append(f'{where} threshold must be a number >= 0')
+            else:
+                thresholds[match.group(1)].append(band['threshold'])
+            if not _isAmount(band.get('rate_pct')) or band['rate_pct'] > 100:
+                problems.append(f'{where} rate_pct must be within 0 - 100')
+
+        for kind, values in thresholds.items():
+            if not values:
+                problems.append(f'taxRates[{year!r}] has no {kind} bands')
+            elif len(set(values)) != len(values):
+                problems.append(
+                    f'taxRates[{year!r}] has repeated {kind} thresholds'
+                )
+
+    for year, band in pensionBands.items():
+        where = f'pensionBands[{year!r}]'
+        if not isinstance(band, dict):
+            problems.append(f'{where} must be a table')
+            continue
+        lower, higher = band.get('lower_level'), band.get('higher_level')
+        if not (_isAmount(lower) and _isAmount(higher)):
+            problems.append(f'{where} levels must be numbers >= 0')
+        elif lower > higher:
+            problems.append(f'{where} lower_level is above higher_level')
+
+    if problems:
+        raise RateTableError('; '.join(problems))
+
+    return True
+
+
+def parseRateFile(path, content):
+    """Return (taxRates, pensionBands) parsed from file content bytes"""
+    if str(path).endswith('.toml'):
+        if tomllib is None:
+            raise RateTableError('TOML rate files need Python 3.11+')
+        data = tomllib.loads(content.decode())
+    else:
+        data = json.loads(content)
+
+    if not isinstance(data, dict):
+        raise RateTableError('Rate file must hold a table')
+
+    return data.get('taxRates', {}), data.get('pensionBands', {})
+
+
+class RateRegistry:
+    """Validated rate tables and their compiled schedules"""
+    def __init__(self):
+        self.taxRates = {}
+        self.pensionBands = {}
+        self.schedules = {}
+        self.source = None
+        self.fromCache = False
+
+    def years(self):
+        return sorted(self.taxRates)
+
+    def register(self, year, yearRates, yearPensionBands=None):
+        """Validate and add or replace one year"""
+        pensionBands = {} if yearPensionBands is None \
+            else {year: yearPensionBands}
+        validateRateTables({year: yearRates}, pensionBands)
+
+        self.taxRates[year] = yearRates
+        if yearPensionBands is not None:
+            self.pensionBands[year] = yearPensionBands
+        self.schedules[year] = compileSchedule(
+            year, yearRates, yearPensionBands
+        )
+        return True
+
+    def load(self, path=defaultRatesPath, useCache=True):
+        """
+        Replace the registry contents with the tables in path
+
+        With useCache a pickle of the validated and compiled tables is
+        read from, or written to, __pycache__ beside the data file.
+        """
+        with open(path, 'rb') as file:
+            content = file.read()
+
+        cachePath = None
+        if useCache:
+            digest = hashlib.sha256(content).hexdigest()[:32]
+            cachePath = os.path.join(
+                os.path.dirname(os.path.abspath(path)),
+                '__pycache__',
+                f'{os.path.basename(path)}.{digest}.v{cacheVersion}.pickle'
+            )
+            cached = _readCache(cachePath)
+            if cached is not None:
+                self._replace(path, *cached)
+                self.fromCache = True
+                return True
+
+        taxRates, pensionBands = parseRateFile(path, content)
+        validateRateTables(taxRates, pensionBands)
+        schedules = {
+            year: compileSchedule(year, yearRates, pensionBands.get(year))
+            for year, yearRates in taxRates.items()
+        }
+        self._replace(path, taxRates, pensionBands, schedules)
+        self.fromCache = False
+
+        if cachePath is not None:
+            _writeCache(cachePath, (taxRates, pensionBands, schedules))
+        return True
+
+    def _replace(self, path, taxRates, pensionBands, schedules):
+        # update in place so modules holding these dicts see the new years
+        self.taxRates.clear()
+        self.taxRates.update(taxRates)
+        self.pensionBands.clear()
+        self.pensionBands.update(pensionBands)
+        self.schedules.clear()
+        self.schedules.update(schedules)
+        self.source = path
+
+
+def _readCache(cachePath):
+    """Return cached tables, None when missing or unreadable"""
+    try:
+        with open(cachePath, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError):
+        return None
+
+
+def _writeCache(cachePath, tables):
+    """Write cached tables atomically, ignoring read-only locations"""
+    try:
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        temporaryPath = f'{cachePath}.{os.getpid()}.tmp'
+        with open(temporaryPath, 'wb') as file:
+            pickle.dump(tables, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaryPath, cachePath)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,164 @@
+"""
+Benchmark suite for the income calculator.
+
+Times scalar method latency, list ingestion and end to end batch payroll
+throughput, writes the results as JSON and optionally compares them with
+a stored baseline, exiting non-zero when any benchmark is slower than
+the baseline by more than the regression threshold.
+
+    python run_benchmarks.py --output bench.json
+    python run_benchmarks.py --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+from batch_calculator import calculateBatch
+from income_calculator import EmployeeSalaryInfo
+
+
+year = '2021-2022'
+
+
+def measure(func, number, repeat=5):
+    """Return the best seconds per call of func over repeat runs"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def _employee(income=38254.54):
+    e = EmployeeSalaryInfo("benchmark")
+    e.addTaxableIncome([income])
+    e.addNonTaxableIncome([1685])
+    return e
+
+
+def scalarBenchmarks(number):
+    """Return seconds per uncached call of the scalar methods"""
+    e = _employee()
+
+    def uncached(method):
+        def call():
+            e.clearResultCache()
+            method(year)
+        return call
+
+    def addPension():
+        e.resetPreTaxExpense()
+        e.addPension(year, 5, pre_tax=True)
+
+    return {
+        'scalar_getPAYEPaid': measure(uncached(e.getPAYEPaid), number),
+        'scalar_getNIPaid': measure(uncached(e.getNIPaid), number),
+        'scalar_getNetIncome': measure(uncached(e.getNetIncome), number),
+        'scalar_addPension': measure(addPension, number),
+    }
+
+
+def ingestionBenchmarks(listSize):
+    """Return seconds per value of the add* methods for a long list"""
+    values = [float(value) for value in range(listSize)]
+    e = EmployeeSalaryInfo("benchmark")
+    results = {}
+
+    for name in ['addTaxableIncome', 'addNonTaxableIncome',
+                 'addPreTaxExpense', 'addPostTaxExpense',
+                 'addTaxableIncomeBulk', 'addPostTaxExpenseBulk']:
+        method = getattr(e, name)
+        results[f'ingest_{name}'] = measure(
+            lambda: method(values), number=1, repeat=3
+        ) / listSize
+
+    return results
+
+
+def payrollBenchmarks(sizes):
+    """Return seconds per employee of calculateBatch for each payroll size"""
+    rng = np.random.default_rng(0)
+    results = {}
+
+    for size in sizes:
+        incomeTaxable = np.round(rng.uniform(0, 200000, size), 2)
+        expensePreTax = np.round(rng.uniform(0, 5000, size), 2)
+        results[f'payroll_{size}'] = measure(
+            lambda: calculateBatch(
+                year, incomeTaxable, expensePreTax=expensePreTax
+            ),
+            number=1,
+            repeat=3
+        ) / size
+
+    return results
+
+
+def runBenchmarks(sizes=(1000, 100000, 1000000), number=10000,
+                  listSize=100000):
+    """Return every benchmark as {name: seconds per operation}"""
+    results = {}
+    results.update(scalarBenchmarks(number))
+    results.update(ingestionBenchmarks(listSize))
+    results.update(payrollBenchmarks(sizes))
+    return results
+
+
+def compareResults(current, baseline, threshold=0.1):
+    """
+    Return {name: slowdown} for benchmarks slower than baseline
+
+    slowdown is the fractional increase in seconds per operation, and
+    only benchmarks more than threshold slower are returned.
+    """
+    regressions = {}
+    for name, seconds in current.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        slowdown = seconds / previous - 1
+        if slowdown > threshold:
+            regressions[name] = slowdown
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed fractional slowdown, default 0.1')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 100000, 1000000])
+    parser.add_argument('--number', type=int, default=10000,
+                        help='calls per scalar timing')
+    parser.add_argument('--list-size', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.sizes, args.number, args.list_size)
+    for name, seconds in results.items():
+        print(f'{name:32} {seconds * 1e6:12.4f} us/op')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'results': results,
+            }, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        regressions = compareResults(results, baseline, args.threshold)
+        for name, slowdown in regressions.items():
+            print(f'REGRESSION {name}: {slowdown:+.1%} vs baseline')
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
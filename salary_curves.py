@@ -0,0 +1,455 @@
+"""
+Piecewise linear salary curves.
+
+For a given year, non-taxable income, expenses and pension, net pay is a
+piecewise linear function of taxable income whose breakpoints are the
+tax thresholds and pension band limits. Building that function exactly
+lets the gross salary needed for a target net pay be solved segment by
+segment instead of by trial and error, and lets net pay, PAYE, NI and
+effective/marginal rates be evaluated over any income grid without a
+calculation per point.
+"""
+
+import csv
+import math
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from batch_calculator import FloatArraySuccessType, calculateBatch
+from income_calculator import FloatSuccessType, calculatePayslip, \
+    getYearSchedule, taxRates
+
+
+class PiecewiseLinear:
+    """
+    Continuous piecewise linear function through (xs, ys)
+
+    The function is linear between consecutive breakpoints and continues
+    past the last one with slopeAfter. It is not defined below xs[0].
+    """
+    def __init__(self, xs, ys, slopeAfter):
+        self.xs = tuple(xs)
+        self.ys = tuple(ys)
+        self.slopeAfter = slopeAfter
+        self._runningMax = tuple(np.maximum.accumulate(self.ys))
+
+    def __repr__(self):
+        return f'PiecewiseLinear(xs={self.xs}, ys={self.ys}, '\
+               f'slopeAfter={self.slopeAfter})'
+
+    def evaluate(self, x):
+        """Return the function value at x"""
+        i = bisect_left(self.xs, x)
+        if i >= len(self.xs):
+            return self.ys[-1] + (x - self.xs[-1]) * self.slopeAfter
+        if i == 0:
+            return self.ys[0]
+
+        x0, x1 = self.xs[i-1], self.xs[i]
+        y0, y1 = self.ys[i-1], self.ys[i]
+        return y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+
+    def evaluateArray(self, x):
+        """Return the function value at every x of an array"""
+        x = np.asarray(x, dtype=np.float64)
+        xs = np.asarray(self.xs)
+        ys = np.asarray(self.ys)
+        return np.where(
+            x > xs[-1],
+            ys[-1] + (x - xs[-1]) * self.slopeAfter,
+            np.interp(x, xs, ys)
+        )
+
+    def slope(self, x):
+        """Return the slope just above x"""
+        i = bisect_right(self.xs, x)
+        if i >= len(self.xs):
+            return self.slopeAfter
+        if i == 0:
+            return 0.0
+
+        return (self.ys[i] - self.ys[i-1]) / (self.xs[i] - self.xs[i-1])
+
+    def slopeArray(self, x):
+        """Return the slope just above every x of an array"""
+        xs = np.asarray(self.xs)
+        ys = np.asarray(self.ys)
+        slopes = np.concatenate((
+            [0.0], np.diff(ys) / np.diff(xs), [self.slopeAfter]
+        ))
+        return slopes[np.searchsorted(xs, x, side='right')]
+
+    def inverse(self, y):
+        """Return the smallest x with value y, None if y is never reached"""
+        if y < self.ys[0]:
+            return None
+
+        i = bisect_left(self._runningMax, y)
+        if i >= len(self.xs):
+            if self.slopeAfter <= 0:
+                return None
+            return self.xs[-1] + (y - self.ys[-1]) / self.slopeAfter
+        if i == 0:
+            return self.xs[0]
+
+        x0, x1 = self.xs[i-1], self.xs[i]
+        y0, y1 = self.ys[i-1], self.ys[i]
+        return x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+
+    def inverseArray(self, y):
+        """Return inverse for every y of an array, NaN where not reached"""
+        y = np.asarray(y, dtype=np.float64)
+        xs = np.asarray(self.xs)
+        ys = np.asarray(self.ys)
+        runningMax = np.asarray(self._runningMax)
+
+        i = np.searchsorted(runningMax, y, side='left')
+        inside = np.clip(i, 1, len(xs) - 1)
+        x0, x1 = xs[inside - 1], xs[inside]
+        y0, y1 = ys[inside - 1], ys[inside]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            within = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            after = xs[-1] + (y - ys[-1]) / self.slopeAfter
+
+        x = np.where(i == 0, xs[0], np.where(i >= len(xs), after, within))
+        unreachable = (y < ys[0]) | ((i >= len(xs)) & (self.slopeAfter <= 0))
+        return np.where(unreachable, np.nan, x)
+
+
+def _pensionRate(percentage, pre_tax, post_tax):
+    """Return an error message for invalid pension options, else None"""
+    if not percentage:
+        return None
+    if post_tax == pre_tax:
+        return "Pension must be either pre OR post tax"
+    if not (percentage >= 0 and percentage <= 100):
+        return "Percentage must be within 0 - 100 range"
+    return None
+
+
+def _taxableInverse(schedule, threshold, expensePreTax, percentage, pre_tax):
+    """Return the taxable income at which income after expenses = threshold"""
+    if not (percentage and pre_tax):
+        return threshold + expensePreTax
+
+    lower_band, upper_band = schedule.pensionBand
+    rate = percentage/100
+
+    below = threshold + expensePreTax
+    if below <= lower_band:
+        return below
+    above = threshold + expensePreTax + (upper_band - lower_band) * rate
+    if above >= upper_band or rate >= 1:
+        return above
+    return (threshold + expensePreTax - lower_band * rate) / (1 - rate)
+
+
+def _netUnrounded(schedule, incomeTaxable, incomeNonTaxable, expensePreTax,
+                  expensePostTax, percentage, post_tax):
+    """Return net income before rounding, as calculatePayslip works it out"""
+    if percentage:
+        lower_band, upper_band = schedule.pensionBand
+        pension = min(
+            max(incomeTaxable - lower_band, 0.0), upper_band - lower_band
+        ) * (percentage/100)
+        if post_tax:
+            expensePostTax += pension * 0.8
+        else:
+            expensePreTax += pension
+
+    taxableIncome = incomeTaxable - expensePreTax
+    return incomeTaxable + incomeNonTaxable \
+        - schedule.paye.taxDue(taxableIncome) \
+        - schedule.ni.taxDue(taxableIncome) \
+        - expensePreTax - expensePostTax
+
+
+def _curveBreakpoints(schedule, expensePreTax, percentage, pre_tax):
+    """Return sorted taxable incomes where any curve for schedule bends"""
+    breakpoints = set()
+    if percentage:
+        breakpoints.update(schedule.pensionBand)
+    for threshold in schedule.paye.thresholds + schedule.ni.thresholds:
+        breakpoints.add(_taxableInverse(
+            schedule, threshold, expensePreTax, percentage, pre_tax
+        ))
+
+    start = _taxableInverse(schedule, 0.0, expensePreTax, percentage, pre_tax)
+    return [start] + sorted(x for x in breakpoints if x > start)
+
+
+def _curveThrough(func, xs):
+    """Return the PiecewiseLinear through func evaluated at xs"""
+    ys = [func(x) for x in xs]
+    step = 1e6
+    return PiecewiseLinear(xs, ys, (func(xs[-1] + step) - ys[-1]) / step)
+
+
+def _taxableIncome(schedule, incomeTaxable, expensePreTax, percentage,
+                   pre_tax):
+    """Return income after pre tax expenses and any pre tax pension"""
+    if percentage and pre_tax:
+        lower_band, upper_band = schedule.pensionBand
+        expensePreTax += min(
+            max(incomeTaxable - lower_band, 0.0), upper_band - lower_band
+        ) * (percentage/100)
+    return incomeTaxable - expensePreTax
+
+
+def buildNetCurve(year, incomeNonTaxable=0.0, expensePreTax=0.0,
+                  expensePostTax=0.0, percentage=0.0, pre_tax=False,
+                  post_tax=False):
+    """
+    Return net income as a PiecewiseLinear function of taxable income
+
+    The curve starts where taxable income first exceeds the pre tax
+    expenses. Raises KeyError for a year without tax rates or, when a
+    pension is given, without pension bands.
+    """
+    return buildSalaryCurves(
+        year, incomeNonTaxable, expensePreTax, expensePostTax, percentage,
+        pre_tax, post_tax
+    ).net
+
+
+class CurveGrid:
+    """Curve values over an income grid, ready for charting or export"""
+    fields = ('incomeTaxable', 'payePaid', 'niPaid', 'netIncome',
+              'effectiveRate', 'marginalRate')
+
+    def __init__(self, incomeTaxable, payePaid, niPaid, netIncome,
+                 effectiveRate, marginalRate):
+        self.incomeTaxable = incomeTaxable
+        self.payePaid = payePaid
+        self.niPaid = niPaid
+        self.netIncome = netIncome
+        self.effectiveRate = effectiveRate
+        self.marginalRate = marginalRate
+
+    def __len__(self):
+        return len(self.incomeTaxable)
+
+    def toRecords(self):
+        """Return the grid as a list of dicts, one per income"""
+        columns = [getattr(self, field).tolist() for field in self.fields]
+        return [dict(zip(self.fields, row)) for row in zip(*columns)]
+
+    def toCsv(self, path):
+        """Write the grid to a CSV file"""
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(self.fields)
+            writer.writerows(zip(*(
+                getattr(self, field).tolist() for field in self.fields
+            )))
+        return True
+
+
+class SalaryCurves:
+    """
+    PAYE, NI and net income as exact curves of taxable income
+
+    All three curves share the breakpoints of one year's schedule with
+    the given expenses and pension applied.
+    """
+    def __init__(self, year, paye, ni, net, incomeNonTaxable=0.0):
+        self.year = year
+        self.paye = paye
+        self.ni = ni
+        self.net = net
+        self.incomeNonTaxable = incomeNonTaxable
+
+    @property
+    def breakpoints(self):
+        return self.net.xs
+
+    def evaluate(self, incomeTaxable):
+        """
+        Return a CurveGrid for an array of taxable incomes
+
+        Values are unrounded. effectiveRate is the share of gross income
+        lost to deductions and marginalRate the share of the next pound
+        of taxable income lost. Incomes not above the curve start give
+        NaN.
+        """
+        incomeTaxable = np.asarray(incomeTaxable, dtype=np.float64)
+        valid = incomeTaxable > self.net.xs[0]
+
+        def masked(values):
+            return np.where(valid, values, np.nan)
+
+        netIncome = masked(self.net.evaluateArray(incomeTaxable))
+        grossIncome = incomeTaxable + self.incomeNonTaxable
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effectiveRate = np.where(
+                grossIncome > 0, 1 - netIncome / grossIncome, np.nan
+            )
+
+        return CurveGrid(
+            incomeTaxable,
+            masked(self.paye.evaluateArray(incomeTaxable)),
+            masked(self.ni.evaluateArray(incomeTaxable)),
+            netIncome,
+            effectiveRate,
+            masked(1 - self.net.slopeArray(incomeTaxable)),
+        )
+
+
+def buildSalaryCurves(year, incomeNonTaxable=0.0, expensePreTax=0.0,
+                      expensePostTax=0.0, percentage=0.0, pre_tax=False,
+                      post_tax=False):
+    """
+    Return SalaryCurves for year with the given expenses and pension
+
+    Raises KeyError for a year without tax rates or, when a pension is
+    given, without pension bands.
+    """
+    schedule = getYearSchedule(year)
+    if percentage and schedule.pensionBand is None:
+        raise KeyError(year)
+
+    xs = _curveBreakpoints(schedule, expensePreTax, percentage, pre_tax)
+
+    def paye(x):
+        return schedule.paye.taxDue(_taxableIncome(
+            schedule, x, expensePreTax, percentage, pre_tax
+        ))
+
+    def ni(x):
+        return schedule.ni.taxDue(_taxableIncome(
+            schedule, x, expensePreTax, percentage, pre_tax
+        ))
+
+    def net(x):
+        return _netUnrounded(
+            schedule, x, incomeNonTaxable, expensePreTax, expensePostTax,
+            percentage, post_tax
+        )
+
+    return SalaryCurves(
+        year,
+        _curveThrough(paye, xs),
+        _curveThrough(ni, xs),
+        _curveThrough(net, xs),
+        incomeNonTaxable,
+    )
+
+
+def buildAllSalaryCurves(**options):
+    """Return {year: SalaryCurves} for every year in taxRates"""
+    return {
+        year: buildSalaryCurves(year, **options) for year in sorted(taxRates)
+    }
+
+
+def solveGrossForNet(year, targetNet, incomeNonTaxable=0.0,
+                     expensePreTax=0.0, expensePostTax=0.0, percentage=0.0,
+                     pre_tax=False, post_tax=False):
+    """
+    Return the smallest taxable income in pennies giving targetNet net pay
+
+    The exact solution comes from inverting the net pay curve, then is
+    rounded to the penny at which calculatePayslip first reaches the
+    target. Targets below the net pay at the start of the curve are met
+    by the first penny above the pre tax expenses.
+    """
+    message = _pensionRate(percentage, pre_tax, post_tax)
+    if message:
+        return FloatSuccessType(0.0, False, message)
+
+    try:
+        curve = buildNetCurve(
+            year, incomeNonTaxable, expensePreTax, expensePostTax,
+            percentage, pre_tax, post_tax
+        )
+    except KeyError:
+        return FloatSuccessType(0.0, False, "Year not valid")
+
+    if targetNet < curve.ys[0]:
+        exact = curve.xs[0]
+    else:
+        exact = curve.inverse(targetNet)
+    if exact is None:
+        return FloatSuccessType(0.0, False, "Target net income not reachable")
+
+    def netIncome(incomeTaxable):
+        payslip = calculatePayslip(
+            year, incomeTaxable, incomeNonTaxable, expensePreTax,
+            expensePostTax, percentage, pre_tax, post_tax
+        )
+        return payslip.netIncome if payslip.status else -math.inf
+
+    gross = math.ceil(round(exact * 100, 6)) / 100
+    for _ in range(5):
+        if netIncome(gross) >= targetNet:
+            break
+        gross = round(gross + 0.01, 2)
+    for _ in range(5):
+        lower = round(gross - 0.01, 2)
+        if netIncome(lower) < targetNet:
+            break
+        gross = lower
+
+    return FloatSuccessType(gross, True)
+
+
+def _netIncomeArray(year, incomeTaxable, incomeNonTaxable, expensePreTax,
+                    expensePostTax, percentage, pre_tax, post_tax):
+    """Return rounded net income for each taxable income, -inf if invalid"""
+    result = calculateBatch(
+        year, incomeTaxable, incomeNonTaxable, expensePreTax, expensePostTax,
+        percentage, pre_tax, post_tax
+    ).netIncome
+    return np.where(result.status, result.value, -np.inf)
+
+
+def solveGrossForNetArray(year, targetNets, incomeNonTaxable=0.0,
+                          expensePreTax=0.0, expensePostTax=0.0,
+                          percentage=0.0, pre_tax=False, post_tax=False):
+    """
+    Return solveGrossForNet for every target of an array
+
+    All targets share the other inputs, so one curve serves every row.
+    Rows whose target cannot be reached have status False.
+    """
+    targetNets = np.asarray(targetNets, dtype=np.float64)
+    failed = FloatArraySuccessType(
+        np.zeros(targetNets.shape), np.zeros(targetNets.shape, dtype=bool)
+    )
+    if _pensionRate(percentage, pre_tax, post_tax):
+        return failed
+
+    try:
+        curve = buildNetCurve(
+            year, incomeNonTaxable, expensePreTax, expensePostTax,
+            percentage, pre_tax, post_tax
+        )
+    except KeyError:
+        return failed
+
+    exact = np.where(
+        targetNets < curve.ys[0], curve.xs[0], curve.inverseArray(targetNets)
+    )
+    status = ~np.isnan(exact)
+    gross = np.ceil(np.round(np.where(status, exact, 0.0) * 100, 6)) / 100
+
+    def netIncome(incomeTaxable):
+        return _netIncomeArray(
+            year, incomeTaxable, incomeNonTaxable, expensePreTax,
+            expensePostTax, percentage, pre_tax, post_tax
+        )
+
+    for _ in range(5):
+        short = status & (netIncome(gross) < targetNets)
+        if not short.any():
+            break
+        gross = np.where(short, np.round(gross + 0.01, 2), gross)
+    for _ in range(5):
+        lower = np.round(gross - 0.01, 2)
+        over = status & (netIncome(lower) >= targetNets)
+        if not over.any():
+            break
+        gross = np.where(over, lower, gross)
+
+    return FloatArraySuccessType(np.where(status, gross, 0.0), status)
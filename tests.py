@@ -1,6 +1,34 @@
-from unittest import TestCase
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
 
-from income_calculator import EmployeeSalaryInfo, FloatSuccessType
+import numpy as np
+
+from batch_calculator import EmployeeBatch, ResultBuffer, calculateBatch, \
+    calculateYears, getNetIncomeBatch, roundPennies
+import calculation_service
+import income_calculator
+from income_index import IncomeIndex, changedRanges
+import instrumentation
+from parallel_runner import runParallel
+from monthly_payroll import MonthlyPayroll
+import payroll_binary
+from payroll_pipeline import runPipeline
+from payroll_stats import PayHistogram, PayrollStats, QuantileSketch
+from rate_registry import RateRegistry, RateTableError, \
+    validateRateTables
+from pence_calculator import calculateBatchPence, calculatePayslipPence, \
+    roundDivide, toPence, toPenceArray
+from run_benchmarks import compareResults
+from salary_curves import buildAllSalaryCurves, buildNetCurve, \
+    buildSalaryCurves, solveGrossForNet, solveGrossForNetArray
+from income_calculator import EmployeeSalaryInfo, FloatSuccessType, \
+    Payslip, PayslipCache, TaxSchedule, calculatePayslip, \
+    clearScheduleCache, getYearSchedule, taxPeriod, taxRateBandType, \
+    validateValues
 
 
 class ClassTypesTests(TestCase):
@@ -497,3 +525,1981 @@ class DeductionsUnitTests(TestCase):
             )
 
 
+class BatchUnitTests(TestCase):
+    """Class to test the vectorised batch calculation"""
+    year = '2021-2022'
+    incomeTaxable = [29864.12, 5451, 57012.28, 165245.25, 24000, 0, -100]
+    incomeNonTaxable = [0, 300, 1500.5, 0, 3000, 200, 0]
+    expensePreTax = [1000, 0, 2500, 0, 893.04, 0, 0]
+    expensePostTax = [0, 10, 0, 250.75, 0, 0, 0]
+
+    def scalarEmployee(self, row):
+        """Build the scalar employee matching a batch row"""
+        e = EmployeeSalaryInfo("testname")
+        e.incomeTaxable = self.incomeTaxable[row]
+        e.incomeNonTaxable = self.incomeNonTaxable[row]
+        e.expensePreTax = self.expensePreTax[row]
+        e.expensePostTax = self.expensePostTax[row]
+        return e
+
+    def test_matches_scalar_methods(self):
+        """Test every batch figure matches the scalar methods"""
+        result = calculateBatch(
+            self.year,
+            self.incomeTaxable,
+            self.incomeNonTaxable,
+            self.expensePreTax,
+            self.expensePostTax
+        )
+
+        for row in range(len(self.incomeTaxable)):
+            e = self.scalarEmployee(row)
+            expected = {
+                'grossIncome': e.getGrossIncome(),
+                'payePaid': e.getPAYEPaid(self.year),
+                'niPaid': e.getNIPaid(self.year),
+                'deductions': e.getDeductions(self.year),
+                'netIncome': e.getNetIncome(self.year),
+            }
+            for name, scalar in expected.items():
+                batch = getattr(result, name)
+                self.assertEqual(
+                    bool(batch.status[row]),
+                    scalar.status,
+                    msg=f"{name} status differs from scalar in row {row}"
+                )
+                self.assertEqual(
+                    batch.value[row],
+                    scalar.value,
+                    msg=f"{name} value differs from scalar in row {row}"
+                )
+
+    def test_random_payroll_matches_scalar(self):
+        """Test a random payroll matches the scalar methods to the penny"""
+        rng = np.random.default_rng(0)
+        incomeTaxable = np.round(rng.uniform(0, 200000, 500), 2)
+        expensePreTax = np.round(rng.uniform(0, 5000, 500), 2)
+        result = calculateBatch(
+            self.year, incomeTaxable, expensePreTax=expensePreTax
+        )
+
+        for row in range(len(incomeTaxable)):
+            e = EmployeeSalaryInfo("testname")
+            e.incomeTaxable = float(incomeTaxable[row])
+            e.expensePreTax = float(expensePreTax[row])
+            self.assertEqual(
+                result.netIncome.value[row],
+                e.getNetIncome(self.year).value,
+                msg=f"Net income differs for income {incomeTaxable[row]}"
+            )
+
+    def test_invalid_year(self):
+        """Test invalid year flags every tax figure as failed"""
+        result = calculateBatch('', [30000, 40000])
+        self.assertFalse(
+            result.payePaid.status.any(),
+            msg="Invalid year did not return False"
+        )
+        self.assertTrue(
+            result.grossIncome.status.all(),
+            msg="Gross income should not depend on the year"
+        )
+
+    def test_round_pennies_matches_round(self):
+        """Test vectorised rounding agrees with round at half penny ties"""
+        values = np.array([0.045, 1.005, 2.675, 1234.565, 0.125, 10.0])
+        self.assertEqual(
+            roundPennies(values).tolist(),
+            [round(float(value), 2) for value in values],
+            msg="Vectorised rounding differs from round"
+        )
+
+
+class TaxScheduleUnitTests(TestCase):
+    """Class to test compiled tax schedules"""
+    scottishBands = {
+        'PAYE_rate1':{'threshold': 12570.0, 'rate_pct': 19.0},
+        'PAYE_rate2':{'threshold': 14667.0, 'rate_pct': 20.0},
+        'PAYE_rate3':{'threshold': 25296.0, 'rate_pct': 21.0},
+        'PAYE_rate4':{'threshold': 43662.0, 'rate_pct': 41.0},
+        'PAYE_rate5':{'threshold': 150000.0, 'rate_pct': 46.0},
+        'NI_rate1':{'threshold': 9568.0, 'rate_pct': 12.0},
+        'NI_rate2':{'threshold': 50270.0, 'rate_pct': 2.0},
+    }
+
+    def test_schedule_cumulative_tax(self):
+        """Test cumulative tax is precomputed at each threshold"""
+        schedule = TaxSchedule.fromBands([
+            taxRateBandType(50000.0, 40.0),
+            taxRateBandType(10000.0, 20.0),
+        ])
+        self.assertEqual(
+            schedule.thresholds,
+            (10000.0, 50000.0),
+            msg="Thresholds were not sorted"
+        )
+        self.assertEqual(
+            schedule.cumulative,
+            (0.0, 8000.0),
+            msg="Cumulative tax incorrect at thresholds"
+        )
+        self.assertEqual(schedule.taxDue(10000.0), 0.0)
+        self.assertEqual(schedule.taxDue(60000.0), 12000.0)
+
+    def test_schedule_is_cached(self):
+        """Test a year is compiled once and reused"""
+        self.assertIs(
+            getYearSchedule('2021-2022'),
+            getYearSchedule('2021-2022'),
+            msg="Schedule was compiled twice for the same year"
+        )
+
+    def test_scottish_five_band_year(self):
+        """Test PAYE for a year with five PAYE bands"""
+        income_calculator.taxRates['scotland-2021-2022'] = self.scottishBands
+        self.addCleanup(clearScheduleCache)
+        self.addCleanup(
+            income_calculator.taxRates.pop, 'scotland-2021-2022'
+        )
+
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([60000])
+        payePaid = e.getPAYEPaid('scotland-2021-2022')
+        expected = round(
+            (14667 - 12570) * 0.19
+            + (25296 - 14667) * 0.20
+            + (43662 - 25296) * 0.21
+            + (60000 - 43662) * 0.41,
+            2
+        )
+        self.assertTrue(
+            payePaid.status,
+            msg="getPAYEPaid method did not return true"
+        )
+        self.assertEqual(
+            payePaid.value,
+            expected,
+            msg="PAYE incorrectly calculated with five bands"
+        )
+
+        result = calculateBatch('scotland-2021-2022', [60000])
+        self.assertEqual(
+            result.payePaid.value[0],
+            expected,
+            msg="Batch PAYE incorrectly calculated with five bands"
+        )
+
+
+class ResultCacheUnitTests(TestCase):
+    """Class to test memoisation of employee results"""
+    year = '2021-2022'
+
+    def test_repeated_reads_hit_cache(self):
+        """Test repeated reads are served from the cache"""
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([30000])
+        first = e.getNetIncome(self.year)
+        misses = e.cacheMisses
+
+        for _ in range(3):
+            self.assertEqual(
+                e.getNetIncome(self.year).value,
+                first.value,
+                msg="Cached net income differs from first read"
+            )
+            e.getPAYEPaid(self.year)
+        self.assertEqual(
+            e.cacheMisses,
+            misses,
+            msg="Repeated reads recomputed results"
+        )
+        self.assertEqual(e.cacheHits, 6, msg="Cache hits not counted")
+
+    def test_changes_invalidate_cache(self):
+        """Test add, reset, pension and assignment invalidate results"""
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([30000])
+        net = e.getNetIncome(self.year).value
+
+        e.addPension(self.year, 5, pre_tax=True)
+        self.assertNotEqual(
+            e.getNetIncome(self.year).value,
+            net,
+            msg="Pension did not invalidate cached net income"
+        )
+
+        e.resetPreTaxExpense()
+        self.assertEqual(
+            e.getNetIncome(self.year).value,
+            net,
+            msg="Reset did not invalidate cached net income"
+        )
+
+        e.addTaxableIncome([1000])
+        self.assertEqual(
+            e.getGrossIncome().value,
+            31000,
+            msg="Adding income did not invalidate cached gross income"
+        )
+
+        e.incomeTaxable = -1
+        self.assertFalse(
+            e.getPAYEPaid(self.year).status,
+            msg="Assignment did not invalidate cached PAYE"
+        )
+
+    def test_results_cached_per_year(self):
+        """Test each year is memoised separately"""
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([60000])
+        self.assertNotEqual(
+            e.getPAYEPaid('2021-2022').value,
+            e.getPAYEPaid('2018-2019').value,
+            msg="Years share a cached result"
+        )
+        self.assertEqual(e.cacheMisses, 2, msg="Cache misses not counted")
+
+    def test_rate_change_recomputes(self):
+        """Test cached results are not used after the rates change"""
+        year = 'budget-2021-2022'
+        yearRates = {
+            key: dict(band) for key, band in
+            income_calculator.taxRates[self.year].items()
+        }
+        income_calculator.registry.register(year, yearRates)
+        self.addCleanup(clearScheduleCache)
+        self.addCleanup(income_calculator.taxRates.pop, year)
+
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([60000])
+        before = e.getPAYEPaid(year).value
+        net = e.getNetIncome(year).value
+
+        yearRates['PAYE_rate2']['rate_pct'] = 25
+        income_calculator.registry.register(year, yearRates)
+        self.assertEqual(
+            e.getPAYEPaid(year).value,
+            round(getYearSchedule(year).paye.taxDue(60000), 2),
+            msg="Cached PAYE used after the rates changed"
+        )
+        self.assertNotEqual(e.getPAYEPaid(year).value, before)
+        self.assertGreater(e.getNetIncome(year).value, net)
+
+        clearScheduleCache()
+        misses = e.cacheMisses
+        e.getPAYEPaid(year)
+        self.assertEqual(e.cacheMisses, misses + 1)
+
+
+class PayslipUnitTests(TestCase):
+    """Class to test the single pass payslip"""
+    year = '2021-2022'
+
+    def test_matches_separate_methods(self):
+        """Test payslip figures match the separate get methods"""
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([38254.54])
+        e.addNonTaxableIncome([1685])
+        e.addPreTaxExpense([1200])
+        e.addPostTaxExpense([300.5])
+        payslip = e.computePayslip(self.year)
+
+        self.assertTrue(payslip.status, msg="Payslip did not return True")
+        self.assertEqual(payslip.grossIncome, e.getGrossIncome().value)
+        self.assertEqual(payslip.payePaid, e.getPAYEPaid(self.year).value)
+        self.assertEqual(payslip.niPaid, e.getNIPaid(self.year).value)
+        self.assertEqual(payslip.deductions, e.getDeductions(self.year).value)
+        self.assertEqual(payslip.netIncome, e.getNetIncome(self.year).value)
+
+    def test_pension_matches_add_pension(self):
+        """Test payslip pension matches calling addPension"""
+        for testcase in DeductionsUnitTests.testvalues.values():
+            pre_tax = testcase['pensionType'] == 'pre_tax'
+            payslip = calculatePayslip(
+                self.year,
+                testcase['incomeTaxable'],
+                testcase['incomeNonTaxable'],
+                percentage=testcase['pensionPct'],
+                pre_tax=pre_tax,
+                post_tax=not pre_tax
+            )
+
+            e = EmployeeSalaryInfo("testname")
+            e.addTaxableIncome([testcase['incomeTaxable']])
+            pension = e.addPension(
+                self.year,
+                testcase['pensionPct'],
+                pre_tax=pre_tax,
+                post_tax=not pre_tax
+            )
+            self.assertEqual(
+                payslip.pension,
+                pension.value,
+                msg="Payslip pension differs from addPension"
+            )
+            self.assertEqual(
+                payslip.netIncome,
+                testcase['netIncome'],
+                msg="Payslip did not return pre-calculated net income"
+            )
+
+    def test_pre_tax_pension_adds_to_expenses(self):
+        """Test a pre tax pension is added to existing pre tax expenses"""
+        payslip = calculatePayslip(
+            self.year, 40000, expensePreTax=1000, percentage=5, pre_tax=True
+        )
+        self.assertEqual(payslip.netIncome, 29036.12)
+
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([40000])
+        e.addPreTaxExpense([1000, payslip.pension])
+        self.assertEqual(
+            payslip.netIncome,
+            e.getNetIncome(self.year).value,
+            msg="Pension not added to the pre tax expenses"
+        )
+        batch = calculateBatch(
+            self.year, [40000.0], expensePreTax=[1000.0], percentage=5,
+            pre_tax=True
+        )
+        self.assertEqual(batch.netIncome.value[0], payslip.netIncome)
+
+        # addPension replaces the pre tax expenses instead
+        e.resetPreTaxExpense()
+        e.addPreTaxExpense([1000])
+        e.addPension(self.year, 5, pre_tax=True)
+        self.assertEqual(e.getNetIncome(self.year).value, 29716.12)
+
+    def test_period_breakdown(self):
+        """Test net pay split per month, day and hour"""
+        payslip = Payslip(netIncome=39000.0)
+        self.assertEqual(payslip.netMonth, 3250.0)
+        self.assertEqual(payslip.netDay, 150.0)
+        self.assertEqual(payslip.netHour, 20.0)
+
+    def test_payslip_is_slotted(self):
+        """Test payslip records carry no instance dict"""
+        self.assertFalse(
+            hasattr(Payslip(), '__dict__'),
+            msg="Payslip should use __slots__"
+        )
+
+    def test_invalid_inputs(self):
+        """Test failures return the same messages as getNetIncome"""
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([30000])
+        payslip = e.computePayslip('')
+        self.assertFalse(payslip.status, msg="Invalid year returned True")
+        self.assertEqual(payslip.message, e.getNetIncome('').message)
+
+        payslip = e.computePayslip(self.year, 5, pre_tax=True, post_tax=True)
+        self.assertEqual(
+            payslip.message,
+            "Pension must be either pre OR post tax",
+            msg="Error message did not return expected text"
+        )
+
+        e.incomeNonTaxable = -1
+        payslip = e.computePayslip(self.year)
+        self.assertEqual(payslip.message, "Value not valid")
+
+
+class EmployeeBatchUnitTests(TestCase):
+    """Class to test the columnar employee store"""
+    year = '2021-2022'
+
+    def test_append_and_extend(self):
+        """Test rows added singly and in bulk are stored in columns"""
+        batch = EmployeeBatch(capacity=2)
+        batch.append("a", 24000, 3000)
+        batch.extend(
+            ["b", "c", "d"],
+            incomeTaxable=[30000, 40000, 50000],
+            expensePostTax=[10, 20, 30]
+        )
+        self.assertEqual(len(batch), 4, msg="Batch length incorrect")
+        self.assertEqual(
+            batch.column('incomeTaxable').tolist(),
+            [24000, 30000, 40000, 50000],
+            msg="Taxable income column incorrect after growing"
+        )
+        self.assertEqual(
+            batch.column('expensePostTax').tolist(),
+            [0, 10, 20, 30],
+            msg="Post tax expense column incorrect"
+        )
+        with self.assertRaises(ValueError):
+            batch.extend(["e"], incomeTaxable=[1, 2])
+
+    def test_row_view_behaves_like_employee(self):
+        """Test row views match EmployeeSalaryInfo results"""
+        batch = EmployeeBatch()
+        row = batch.append("testname")
+        row.addTaxableIncome([24000])
+        row.addNonTaxableIncome([3000])
+        row.addPension(self.year, 5, pre_tax=True)
+
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([24000])
+        e.addNonTaxableIncome([3000])
+        e.addPension(self.year, 5, pre_tax=True)
+
+        self.assertEqual(batch[0].employee_name, "testname")
+        self.assertEqual(
+            batch[0].getNetIncome(self.year).value,
+            e.getNetIncome(self.year).value,
+            msg="Row view net income differs from EmployeeSalaryInfo"
+        )
+        self.assertEqual(
+            batch.calculate(self.year).netIncome.value[0],
+            22380.12,
+            msg="Batch net income did not return pre-calculated value"
+        )
+
+    def test_from_employees(self):
+        """Test building a batch from employee objects"""
+        employees = []
+        for income in [20000, 45000]:
+            e = EmployeeSalaryInfo(f"employee {income}")
+            e.addTaxableIncome([income])
+            employees.append(e)
+
+        batch = EmployeeBatch.fromEmployees(employees)
+        self.assertEqual(
+            [row.getPAYEPaid(self.year).value for row in batch],
+            [e.getPAYEPaid(self.year).value for e in employees],
+            msg="Batch rows differ from source employees"
+        )
+
+    def test_row_views_not_stale(self):
+        """Test a view sees changes made through other views and columns"""
+        batch = EmployeeBatch()
+        batch.extend(['a'], [30000.0])
+        row = batch[0]
+        net = row.getNetIncome(self.year).value
+
+        batch[0].addTaxableIncome([10000.0])
+        self.assertEqual(
+            row.getNetIncome(self.year).value,
+            batch[0].getNetIncome(self.year).value,
+            msg="View returned results from before another view's change"
+        )
+        self.assertNotEqual(row.getNetIncome(self.year).value, net)
+
+        batch.column('incomeTaxable')[0] = 30000.0
+        self.assertEqual(row.getNetIncome(self.year).value, net)
+        self.assertEqual(row.computePayslip(self.year).netIncome, net)
+
+    def test_result_types_are_slotted(self):
+        """Test per-figure result types carry no instance dict"""
+        self.assertFalse(hasattr(FloatSuccessType(1, True), '__dict__'))
+        self.assertFalse(hasattr(taxRateBandType(1, 1), '__dict__'))
+
+
+class PipelineUnitTests(TestCase):
+    """Class to test the streaming CSV/JSONL pipeline"""
+    year = '2021-2022'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_csv_to_csv_with_rejects(self):
+        """Test CSV rows are calculated and malformed rows rejected"""
+        with open(self.path('in.csv'), 'w') as file:
+            file.write(
+                'employee_name,incomeTaxable,incomeNonTaxable,expensePostTax\n'
+                'a,29864.12,,\n'
+                'b,-10,0,0\n'
+                'c,57012.28,100,abc\n'
+                'd,24000,3000,150\n'
+            )
+        progress = []
+        for mode in ['batch', 'scalar', 'cached']:
+            stats = runPipeline(
+                self.path('in.csv'),
+                self.path(f'{mode}.csv'),
+                self.year,
+                rejectPath=self.path('rejects.jsonl'),
+                chunkSize=2,
+                mode=mode,
+                progress=progress.append
+            )
+            self.assertEqual(stats.rowsRead, 4, msg="Rows not all read")
+            self.assertEqual(stats.rowsWritten, 2, msg="Rows not written")
+            self.assertEqual(stats.rowsRejected, 2, msg="Rows not rejected")
+
+        with open(self.path('batch.csv')) as batch, \
+                open(self.path('scalar.csv')) as scalar:
+            self.assertEqual(
+                batch.read(),
+                scalar.read(),
+                msg="Batch and scalar modes wrote different results"
+            )
+        with open(self.path('cached.csv')) as cached, \
+                open(self.path('scalar.csv')) as scalar:
+            self.assertEqual(cached.read(), scalar.read())
+
+        with open(self.path('rejects.jsonl')) as file:
+            rejects = [json.loads(line) for line in file]
+        self.assertEqual(
+            [reject['row'] for reject in rejects],
+            [2, 3],
+            msg="Reject file did not record the malformed rows"
+        )
+        self.assertEqual(len(progress), 6, msg="Progress not reported")
+
+    def test_jsonl_with_corrupt_line(self):
+        """Test a JSONL line that is not JSON is rejected, not fatal"""
+        with open(self.path('in.jsonl'), 'w') as file:
+            file.write(
+                json.dumps({'employee_name': 'a', 'incomeTaxable': 24000})
+                + '\n{bad json\n'
+                + json.dumps({'employee_name': 'c', 'incomeTaxable': 30000})
+                + '\n'
+            )
+        stats = runPipeline(
+            self.path('in.jsonl'), self.path('out.jsonl'), self.year,
+            rejectPath=self.path('rejects.jsonl')
+        )
+        self.assertEqual(stats.rowsRead, 3)
+        self.assertEqual(stats.rowsWritten, 2, msg="Valid rows not written")
+        self.assertEqual(stats.rowsRejected, 1)
+
+        with open(self.path('rejects.jsonl')) as file:
+            rejects = [json.loads(line) for line in file]
+        self.assertEqual(
+            [(reject['row'], reject['record']) for reject in rejects],
+            [(2, '{bad json')],
+            msg="Corrupt line not written to the reject file"
+        )
+
+    def test_jsonl_output(self):
+        """Test JSONL input and output"""
+        with open(self.path('in.jsonl'), 'w') as file:
+            file.write(json.dumps({
+                'employee_name': 'a', 'incomeTaxable': 29864.12
+            }) + '\n')
+
+        runPipeline(self.path('in.jsonl'), self.path('out.jsonl'), self.year)
+        with open(self.path('out.jsonl')) as file:
+            row = json.loads(file.readline())
+        self.assertEqual(row['payePaid'], 3457.02)
+        self.assertTrue(row['status'])
+
+
+class ParallelRunnerUnitTests(TestCase):
+    """Class to test the multi-process payroll runner"""
+    year = '2021-2022'
+
+    def test_matches_single_process(self):
+        """Test parallel results match calculateBatch in row order"""
+        rng = np.random.default_rng(3)
+        incomeTaxable = np.round(rng.uniform(0, 200000, 1000), 2)
+        expensePreTax = np.round(rng.uniform(0, 5000, 1000), 2)
+
+        expected = calculateBatch(
+            self.year, incomeTaxable, expensePreTax=expensePreTax
+        )
+        result = runParallel(
+            self.year,
+            incomeTaxable,
+            expensePreTax=expensePreTax,
+            workers=2,
+            chunkSize=128
+        )
+        for field in ['grossIncome', 'payePaid', 'niPaid', 'netIncome']:
+            self.assertEqual(
+                getattr(result, field).value.tolist(),
+                getattr(expected, field).value.tolist(),
+                msg=f"Parallel {field} differs from calculateBatch"
+            )
+        self.assertEqual(
+            result.netIncome.status.tolist(),
+            expected.netIncome.status.tolist(),
+            msg="Parallel status differs from calculateBatch"
+        )
+
+
+class CalculationServiceTests(IsolatedAsyncioTestCase):
+    """Class to test the micro-batching calculation service"""
+    year = '2021-2022'
+
+    async def asyncSetUp(self):
+        self.service = calculation_service.CalculationService(window=0.01)
+        await self.service.start()
+
+    async def asyncTearDown(self):
+        await self.service.stop()
+
+    async def request(self, method, path, payload=None):
+        return await calculation_service.request(
+            '127.0.0.1', self.service.port, method, path, payload
+        )
+
+    async def test_single_request(self):
+        """Test a single employee request matches the scalar result"""
+        status, result = await self.request('POST', '/calculate', {
+            'year': self.year, 'incomeTaxable': 29864.12
+        })
+        self.assertEqual(status, 200)
+        self.assertEqual(result['payePaid'], 3457.02)
+        self.assertTrue(result['status'])
+
+    async def test_concurrent_requests_are_coalesced(self):
+        """Test concurrent requests share one batch calculation"""
+        incomes = [10298.98, 32875.21, 75846.94]
+        results = await asyncio.gather(*(
+            self.request('POST', '/calculate', {
+                'year': self.year, 'incomeTaxable': income
+            })
+            for income in incomes
+        ))
+        self.assertEqual(
+            [result['niPaid'] for _, result in results],
+            [87.72, 2796.87, 5395.78],
+            msg="Results were not fanned back to the right caller"
+        )
+        self.assertEqual(
+            self.service.metrics.batches,
+            1,
+            msg="Concurrent requests were not coalesced"
+        )
+
+        status, metrics = await self.request('GET', '/metrics')
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['maxQueueDepth'], 3)
+        self.assertGreater(metrics['p99'], 0.0)
+
+    async def test_bulk_and_invalid_requests(self):
+        """Test bulk requests and rejection of malformed input"""
+        status, results = await self.request('POST', '/calculate', {
+            'year': self.year,
+            'employees': [{'incomeTaxable': 24000}, {'incomeTaxable': 0}]
+        })
+        self.assertEqual(status, 200)
+        self.assertEqual([r['status'] for r in results], [True, False])
+
+        status, result = await self.request('POST', '/calculate', {
+            'year': self.year, 'incomeTaxable': 'string'
+        })
+        self.assertEqual(status, 400, msg="Malformed input was accepted")
+
+        for value in [10**400, float('nan'), float('inf')]:
+            status, result = await self.request('POST', '/calculate', {
+                'year': self.year, 'incomeTaxable': value
+            })
+            self.assertEqual(
+                status, 400, msg=f"{value} was accepted as an amount"
+            )
+
+    async def test_failed_batch_resolves_every_caller(self):
+        """Test a batch that raises fails its callers instead of hanging"""
+        batcher = calculation_service.MicroBatcher(window=0.01)
+        results = await asyncio.wait_for(asyncio.gather(
+            batcher.submit(self.year, [(30000.0, 0.0, 0.0, 0.0)]),
+            batcher.submit(self.year, [(10**400, 0.0, 0.0, 0.0)]),
+            return_exceptions=True
+        ), timeout=5)
+        self.assertTrue(
+            all(isinstance(result, OverflowError) for result in results),
+            msg="Callers of a failed batch were not given its error"
+        )
+        self.assertEqual(batcher.metrics.batches, 1)
+
+
+class BenchmarkUnitTests(TestCase):
+    """Class to test the benchmark regression gate"""
+    def test_compare_results(self):
+        """Test only slowdowns beyond the threshold are regressions"""
+        baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+        current = {'a': 1.05, 'b': 1.5, 'c': 0.5, 'd': 9.0}
+        regressions = compareResults(current, baseline, threshold=0.1)
+        self.assertEqual(
+            list(regressions),
+            ['b'],
+            msg="Regression threshold not applied"
+        )
+        self.assertAlmostEqual(regressions['b'], 0.5)
+
+
+class InstrumentationUnitTests(TestCase):
+    """Class to test opt-in hot path instrumentation"""
+    year = '2021-2022'
+
+    def setUp(self):
+        self.addCleanup(instrumentation.disable)
+        self.addCleanup(instrumentation.reset)
+
+    def test_disabled_leaves_methods_untouched(self):
+        """Test enable wraps methods and disable restores them"""
+        original = EmployeeSalaryInfo.getPAYEPaid
+        self.assertTrue(instrumentation.enable())
+        self.assertIsNot(
+            EmployeeSalaryInfo.getPAYEPaid,
+            original,
+            msg="getPAYEPaid was not instrumented"
+        )
+        self.assertTrue(instrumentation.disable())
+        self.assertIs(
+            EmployeeSalaryInfo.getPAYEPaid,
+            original,
+            msg="getPAYEPaid was not restored"
+        )
+
+    def test_counts_timings_and_failures(self):
+        """Test calls, timings and failure messages are recorded"""
+        class Recorder(instrumentation.InstrumentationHook):
+            def __init__(self):
+                self.calls = []
+                self.exported = None
+
+            def onCall(self, name, seconds, result):
+                self.calls.append(name)
+
+            def export(self, stats):
+                self.exported = stats
+
+        recorder = Recorder()
+        instrumentation.addHook(recorder)
+        self.addCleanup(instrumentation.removeHook, recorder)
+        instrumentation.enable()
+
+        e = EmployeeSalaryInfo("testname")
+        e.addTaxableIncome([30000])
+        e.getNetIncome(self.year)
+        e.getPAYEPaid('')
+        e.getNIPaid('')
+
+        metrics = instrumentation.exportMetrics()
+        paye = metrics['EmployeeSalaryInfo.getPAYEPaid']
+        self.assertEqual(paye['calls'], 2, msg="PAYE calls not counted")
+        self.assertEqual(
+            paye['failures'],
+            {'Year not valid': 1},
+            msg="Failure messages not counted"
+        )
+        self.assertGreater(paye['totalSeconds'], 0.0)
+        self.assertIn('isFloatValid', metrics)
+        self.assertIn('TaxSchedule.taxDue', metrics)
+        self.assertIn('EmployeeSalaryInfo.getNetIncome', recorder.calls)
+        self.assertIs(recorder.exported, instrumentation.stats)
+
+
+class GrossUpUnitTests(TestCase):
+    """Class to test solving gross salary for a target net income"""
+    year = '2021-2022'
+
+    def test_solves_known_net_incomes(self):
+        """Test solving the pre-calculated deduction test cases"""
+        for testcase in DeductionsUnitTests.testvalues.values():
+            pre_tax = testcase['pensionType'] == 'pre_tax'
+            gross = solveGrossForNet(
+                self.year,
+                testcase['netIncome'],
+                incomeNonTaxable=testcase['incomeNonTaxable'],
+                percentage=testcase['pensionPct'],
+                pre_tax=pre_tax,
+                post_tax=not pre_tax
+            )
+            self.assertTrue(gross.status, msg="Solver did not return True")
+            self.assertAlmostEqual(
+                gross.value,
+                testcase['incomeTaxable'],
+                delta=0.02,
+                msg="Solved gross differs from the known gross"
+            )
+
+    def test_solution_is_smallest_penny(self):
+        """Test the solved gross is the first penny reaching the target"""
+        for target in [8000.0, 25000.0, 41234.56, 90000.0, 150000.0]:
+            gross = solveGrossForNet(self.year, target, expensePreTax=1200)
+            below = calculatePayslip(
+                self.year, round(gross.value - 0.01, 2), expensePreTax=1200
+            )
+            self.assertGreaterEqual(
+                calculatePayslip(
+                    self.year, gross.value, expensePreTax=1200
+                ).netIncome,
+                target,
+                msg=f"Solved gross does not reach net {target}"
+            )
+            self.assertLess(
+                below.netIncome,
+                target,
+                msg=f"A penny less than the solved gross reaches {target}"
+            )
+
+    def test_curve_breakpoints(self):
+        """Test the net curve bends at the tax thresholds"""
+        curve = buildNetCurve(self.year)
+        for threshold in [9568.0, 12579.0, 50270.0, 50279.0, 150000.0]:
+            self.assertIn(threshold, curve.xs)
+
+    def test_vectorised_matches_scalar(self):
+        """Test the array solver matches the scalar solver"""
+        targets = [5000.0, 20000.0, 35000.5, 80000.0, -10.0]
+        result = solveGrossForNetArray(
+            self.year, targets, percentage=5, pre_tax=True
+        )
+        for i, target in enumerate(targets):
+            scalar = solveGrossForNet(
+                self.year, target, percentage=5, pre_tax=True
+            )
+            self.assertEqual(bool(result.status[i]), scalar.status)
+            self.assertEqual(result.value[i], scalar.value)
+
+    def test_invalid_inputs(self):
+        """Test invalid year and pension options"""
+        self.assertEqual(
+            solveGrossForNet('', 20000).message,
+            "Year not valid"
+        )
+        self.assertEqual(
+            solveGrossForNet(self.year, 20000, percentage=5).message,
+            "Pension must be either pre OR post tax"
+        )
+
+    def test_targets_below_curve_start(self):
+        """Test targets any valid salary exceeds give the first penny"""
+        for expensePreTax in [0.0, 1000.0]:
+            for target in [1000, -50, 5000.01]:
+                result = solveGrossForNet(
+                    self.year, target, incomeNonTaxable=5000,
+                    expensePreTax=expensePreTax
+                )
+                self.assertTrue(result.status, msg=f"{target} not reached")
+                self.assertEqual(result.value, expensePreTax + 0.01)
+
+            array = solveGrossForNetArray(
+                self.year, [1000, -50, 5000.01], incomeNonTaxable=5000,
+                expensePreTax=expensePreTax
+            )
+            self.assertTrue(array.status.all())
+            self.assertEqual(
+                array.value.tolist(), [expensePreTax + 0.01] * 3,
+                msg="Array solver differs for low targets"
+            )
+
+
+class SalaryCurveUnitTests(TestCase):
+    """Class to test salary curves over income grids"""
+    year = '2021-2022'
+
+    def test_grid_matches_scalar_methods(self):
+        """Test curve values match the scalar methods at grid points"""
+        incomes = [5168.56, 10298.98, 32875.21, 75846.94, 165245.25]
+        grid = buildSalaryCurves(self.year).evaluate(incomes)
+
+        for i, income in enumerate(incomes):
+            e = EmployeeSalaryInfo("testname")
+            e.addTaxableIncome([income])
+            self.assertAlmostEqual(
+                grid.payePaid[i], e.getPAYEPaid(self.year).value, delta=0.01
+            )
+            self.assertAlmostEqual(
+                grid.niPaid[i], e.getNIPaid(self.year).value, delta=0.01
+            )
+            self.assertAlmostEqual(
+                grid.netIncome[i], e.getNetIncome(self.year).value,
+                delta=0.01
+            )
+
+    def test_marginal_and_effective_rates(self):
+        """Test marginal and effective rates by band"""
+        grid = buildSalaryCurves(self.year).evaluate(
+            [5000.0, 11000.0, 30000.0, 60000.0, 200000.0]
+        )
+        self.assertEqual(
+            np.round(grid.marginalRate, 4).tolist(),
+            [0.0, 0.12, 0.32, 0.42, 0.47],
+            msg="Marginal rates incorrect per band"
+        )
+        self.assertEqual(grid.effectiveRate[0], 0.0)
+        self.assertTrue(
+            np.all(np.diff(grid.effectiveRate) > 0),
+            msg="Effective rate should rise with income"
+        )
+
+    def test_every_year_and_export(self):
+        """Test curves for every year and record export"""
+        curves = buildAllSalaryCurves()
+        self.assertEqual(
+            sorted(curves),
+            sorted(income_calculator.taxRates),
+            msg="Not every year has curves"
+        )
+        records = curves['2018-2019'].evaluate([20000.0]).toRecords()
+        self.assertEqual(
+            list(records[0]),
+            ['incomeTaxable', 'payePaid', 'niPaid', 'netIncome',
+             'effectiveRate', 'marginalRate']
+        )
+
+
+class YearMatrixUnitTests(TestCase):
+    """Class to test employees x years calculations"""
+    years = ['2018-2019', '2019-2020', '2020-2021', '2021-2022']
+
+    def test_matrix_matches_scalar_per_year(self):
+        """Test every cell matches a fresh employee with addPension"""
+        incomes = [24000, 38254.54, 75000]
+        result = calculateYears(
+            self.years, incomes, percentage=5, pre_tax=True
+        )
+        self.assertEqual(
+            result.netIncome.value.shape,
+            (3, 4),
+            msg="Result matrix not shaped employees x years"
+        )
+
+        for row, income in enumerate(incomes):
+            for year in self.years:
+                e = EmployeeSalaryInfo("testname")
+                e.addTaxableIncome([income])
+                pension = e.addPension(year, 5, pre_tax=True)
+                column = result.column(year)
+                self.assertEqual(
+                    result.netIncome.value[row, column],
+                    e.getNetIncome(year).value,
+                    msg=f"Net income differs for {income} in {year}"
+                )
+                self.assertEqual(
+                    result.pension.value[row, column],
+                    pension.value,
+                    msg=f"Pension differs for {income} in {year}"
+                )
+
+    def test_inputs_not_mutated(self):
+        """Test pension is not added into the caller's expenses"""
+        batch = EmployeeBatch()
+        batch.extend(["a", "b"], incomeTaxable=[24000, 30000])
+        batch.calculateYears(self.years, percentage=5, post_tax=True)
+        self.assertEqual(
+            batch.column('expensePostTax').tolist(),
+            [0.0, 0.0],
+            msg="Pension was added to stored expenses"
+        )
+
+
+class PenceUnitTests(TestCase):
+    """Class to test integer pence calculations"""
+    year = '2021-2022'
+
+    def test_known_values_in_pence(self):
+        """Test PAYE and NI test cases in whole pence"""
+        testvalues = [
+            (29864.12, 3457.02),
+            (5451, 0.0),
+            (57012.28, 10233.31),
+            (165245.25, 54288.76),
+        ]
+        for income, tax in testvalues:
+            payslip = calculatePayslipPence(self.year, toPence(income))
+            self.assertEqual(
+                payslip.payePaid,
+                toPence(tax),
+                msg=f"PAYE incorrect for income {income}"
+            )
+
+        payslip = calculatePayslipPence(self.year, toPence(32875.21))
+        self.assertEqual(payslip.niPaid, 279687)
+        self.assertIsInstance(payslip.netIncome, int)
+
+    def test_batch_matches_scalar_and_reconciles(self):
+        """Test batch rows match scalar payslips and totals add up"""
+        rng = np.random.default_rng(6)
+        incomeTaxable = toPenceArray(np.round(rng.uniform(0, 2e5, 300), 2))
+        expensePostTax = toPenceArray(np.round(rng.uniform(0, 900, 300), 2))
+        result = calculateBatchPence(
+            self.year,
+            incomeTaxable,
+            expensePostTax=expensePostTax,
+            percentage=5,
+            post_tax=True
+        )
+        self.assertEqual(result.netIncome.value.dtype, np.int64)
+
+        total = 0
+        for i in range(len(incomeTaxable)):
+            payslip = calculatePayslipPence(
+                self.year,
+                int(incomeTaxable[i]),
+                expensePostTax=int(expensePostTax[i]),
+                percentage=5,
+                post_tax=True
+            )
+            self.assertEqual(payslip.netIncome, result.netIncome.value[i])
+            self.assertEqual(
+                payslip.grossIncome - payslip.deductions,
+                payslip.netIncome
+            )
+            total += payslip.netIncome
+        self.assertEqual(
+            total,
+            int(result.netIncome.value.sum()),
+            msg="Batch total does not reconcile with payslips"
+        )
+
+    def test_rounding_half_to_even(self):
+        """Test the documented rounding rule"""
+        self.assertEqual(roundDivide(5, 10), 0)
+        self.assertEqual(roundDivide(15, 10), 2)
+        self.assertEqual(roundDivide(16, 10), 2)
+        self.assertEqual(toPence(0.125), 12)
+        self.assertEqual(toPenceArray([0.125, 1.005]).tolist(), [12, 100])
+
+    def test_invalid_inputs(self):
+        """Test messages follow calculatePayslip"""
+        self.assertEqual(
+            calculatePayslipPence('', 3000000).message,
+            "Year not valid"
+        )
+        self.assertEqual(
+            calculatePayslipPence(self.year, 0).message,
+            "Taxable income invalid"
+        )
+
+
+class RateRegistryUnitTests(TestCase):
+    """Class to test rate tables loaded from a data file"""
+    year = '2021-2022'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def writeRates(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_default_tables_loaded(self):
+        """Test the shipped data file gives the same years and schedules"""
+        self.assertIn(self.year, income_calculator.taxRates)
+        self.assertIn(self.year, income_calculator.pensionBands)
+        self.assertEqual(
+            getYearSchedule(self.year).paye,
+            income_calculator.compileYearSchedule(self.year).paye,
+            msg="Loaded schedule differs from compiled tables"
+        )
+
+    def test_cache_used_on_second_load(self):
+        """Test the compiled cache is written then read back"""
+        path = self.writeRates('rates.json', json.dumps({
+            'taxRates': {self.year: income_calculator.taxRates[self.year]},
+            'pensionBands': {
+                self.year: income_calculator.pensionBands[self.year]
+            },
+        }))
+
+        first = RateRegistry()
+        first.load(path)
+        self.assertFalse(first.fromCache)
+
+        second = RateRegistry()
+        second.load(path)
+        self.assertTrue(second.fromCache, msg="Cache was not used")
+        self.assertEqual(second.schedules, first.schedules)
+        self.assertEqual(second.years(), [self.year])
+
+    def test_toml_tables(self):
+        """Test TOML data files load like JSON"""
+        path = self.writeRates('rates.toml', '''
+[taxRates."2030-2031".PAYE_rate1]
+threshold = 0
+rate_pct = 0
+[taxRates."2030-2031".PAYE_rate2]
+threshold = 10000
+rate_pct = 20
+[taxRates."2030-2031".NI_rate1]
+threshold = 0
+rate_pct = 0
+''')
+        registry = RateRegistry()
+        registry.load(path, useCache=False)
+
+        schedule = registry.schedules['2030-2031']
+        self.assertEqual(schedule.paye.taxDue(20000), 2000.0)
+        self.assertIsNone(schedule.pensionBand)
+
+    def test_invalid_tables(self):
+        """Test validation reports bad bands"""
+        with self.assertRaises(RateTableError):
+            validateRateTables(
+                {self.year: {'PAYE_rate1': {'threshold': -1, 'rate_pct': 0}}},
+                {}
+            )
+        with self.assertRaises(RateTableError):
+            validateRateTables(
+                {self.year: {'NI_rate1': {'threshold': 0, 'rate_pct': 120}}},
+                {}
+            )
+        with self.assertRaises(RateTableError):
+            validateRateTables(
+                {}, {self.year: {'lower_level': 2, 'higher_level': 1}}
+            )
+
+        path = self.writeRates('bad.json', '{"taxRates": {"x": 1}}')
+        with self.assertRaises(RateTableError):
+            RateRegistry().load(path)
+
+    def test_register_year(self):
+        """Test a year can be added at runtime"""
+        registry = RateRegistry()
+        registry.register('2030-2031', {
+            'PAYE_rate1': {'threshold': 0, 'rate_pct': 10},
+            'NI_rate1': {'threshold': 0, 'rate_pct': 5},
+        }, {'lower_level': 0, 'higher_level': 1000})
+
+        schedule = registry.schedules['2030-2031']
+        self.assertEqual(schedule.paye.taxDue(100), 10.0)
+        self.assertEqual(schedule.pensionBand, (0, 1000))
+
+
+class BulkValidationUnitTests(TestCase):
+    """Class to test bulk validation and all or nothing adds"""
+    def test_reports_every_invalid_value(self):
+        """Test all bad entries are reported with their reasons"""
+        report, _ = validateValues([1.0, -2, 'a', 3, None, float('nan')])
+
+        self.assertFalse(report)
+        self.assertEqual(report.indices, [1, 2, 4, 5])
+        self.assertEqual(report.reasons, [
+            'Value is negative', 'Value not a number',
+            'Value not a number', 'Value is NaN'
+        ])
+        self.assertEqual(report.message, '4 of 6 values not valid')
+
+        report, _ = validateValues(np.array([5.0, -1.0, -3.0, 2.0]))
+        self.assertEqual(report.errors(), [
+            (1, 'Value is negative'), (2, 'Value is negative')
+        ])
+
+    def test_bulk_add_matches_loop(self):
+        """Test bulk additions give the same totals as the add methods"""
+        rng = np.random.default_rng(3)
+        values = np.round(rng.uniform(0, 10000, 1000), 2).tolist()
+
+        e1 = EmployeeSalaryInfo("loop")
+        e2 = EmployeeSalaryInfo("bulk")
+        for name in ['addTaxableIncome', 'addNonTaxableIncome',
+                     'addPostTaxExpense']:
+            self.assertTrue(getattr(e1, name)(values))
+            self.assertTrue(getattr(e2, name + 'Bulk')(np.array(values)))
+        self.assertTrue(e1.addPreTaxExpense(values[:10]))
+        self.assertTrue(e2.addPreTaxExpenseBulk(values[:10]))
+
+        for field in ['incomeTaxable', 'incomeNonTaxable', 'expensePreTax',
+                      'expensePostTax']:
+            self.assertEqual(
+                getattr(e1, field), getattr(e2, field),
+                msg=f"{field} differs from loop"
+            )
+
+    def test_bulk_add_is_atomic(self):
+        """Test nothing is added when any value is invalid"""
+        e = EmployeeSalaryInfo("Atomic")
+        e.addTaxableIncome([1000])
+
+        report = e.addTaxableIncomeBulk([500, 600, -1, 700])
+        self.assertFalse(report.status)
+        self.assertEqual(report.indices, [2])
+        self.assertEqual(e.incomeTaxable, 1000, msg="Partial add applied")
+
+        report = e.addPreTaxExpenseBulk([600, 600])
+        self.assertFalse(report)
+        self.assertEqual(e.expensePreTax, 0.0)
+
+        self.assertTrue(e.addTaxableIncomeBulk([500, 600]))
+        self.assertEqual(e.incomeTaxable, 2100)
+
+
+class ResultBufferUnitTests(TestCase):
+    """Class to test batch get functions and result buffers"""
+    year = '2021-2022'
+
+    def setUp(self):
+        rng = np.random.default_rng(17)
+        size = 300
+        self.columns = {
+            'incomeTaxable': np.round(rng.uniform(-1000, 160000, size), 2),
+            'incomeNonTaxable': np.round(rng.uniform(-100, 5000, size), 2),
+            'expensePreTax': np.round(rng.uniform(-100, 20000, size), 2),
+            'expensePostTax': np.round(rng.uniform(-100, 3000, size), 2),
+        }
+        self.batch = EmployeeBatch()
+        self.batch.extend(
+            [f'e{i}' for i in range(size)], **self.columns
+        )
+
+    def assertMatchesScalar(self, buffer, method, *args):
+        for row, employee in enumerate(self.batch):
+            expected = getattr(employee, method)(*args)
+            self.assertEqual(
+                (float(buffer.value[row]), bool(buffer.status[row]),
+                 buffer.message(row)),
+                (expected.value, expected.status, expected.message),
+                msg=f"{method} row {row} differs from scalar"
+            )
+
+    def test_get_methods_match_scalar(self):
+        """Test every batch get method matches its scalar method"""
+        self.assertMatchesScalar(self.batch.getGrossIncome(), 'getGrossIncome')
+        for method in ['getPAYEPaid', 'getNIPaid', 'getDeductions',
+                       'getNetIncome']:
+            for year in [self.year, 'not a year']:
+                self.assertMatchesScalar(
+                    getattr(self.batch, method)(year), method, year
+                )
+
+    def test_buffer_reused(self):
+        """Test results are written into a caller supplied buffer"""
+        out = ResultBuffer(len(self.batch))
+        value = out.value
+
+        result = self.batch.getNetIncome(self.year, out=out)
+        self.assertIs(result, out)
+        self.assertIs(out.value, value, msg="Buffer was reallocated")
+        first = out.value.copy()
+
+        self.batch.getNetIncome('not a year', out=out)
+        self.assertFalse(out.status.any())
+        self.batch.getNetIncome(self.year, out=out)
+        self.assertTrue(np.array_equal(out.value, first))
+
+        row = int(np.flatnonzero(out.status)[0])
+        self.assertEqual(out.result(row).value, first[row])
+
+        with self.assertRaises(ValueError):
+            getNetIncomeBatch(self.year, [1.0, 2.0], out=out)
+
+    def test_scratch_buffer_reused(self):
+        """Test intermediates are worked in a caller supplied buffer"""
+        out = ResultBuffer(len(self.batch))
+        scratch = ResultBuffer(len(self.batch))
+        arrays = (out.value, scratch.value, scratch.status, scratch.error)
+
+        for method in ['getDeductions', 'getNetIncome']:
+            for year in [self.year, 'not a year']:
+                expected = getattr(self.batch, method)(year)
+                getattr(self.batch, method)(year, out=out, scratch=scratch)
+                self.assertTrue(
+                    np.array_equal(out.value, expected.value)
+                    and np.array_equal(out.error, expected.error),
+                    msg=f"{method} differs when given a scratch buffer"
+                )
+        self.assertTrue(all(
+            array is buffer for array, buffer in zip(
+                arrays, (out.value, scratch.value, scratch.status,
+                         scratch.error)
+            )
+        ), msg="Buffer was reallocated")
+
+
+class PayslipCacheUnitTests(TestCase):
+    """Class to test the shared payslip cache"""
+    year = '2021-2022'
+
+    def test_hits_share_payslips(self):
+        """Test normalised inputs share one cached payslip"""
+        cache = PayslipCache()
+        first = cache.payslip(self.year, 30000, 1000)
+        second = cache.payslip(self.year, 30000.0, np.float64(1000))
+        third = cache.payslip(self.year, 30000, 1000, pre_tax=True)
+
+        self.assertIs(first, second, msg="Equal inputs not shared")
+        self.assertIs(first, third, msg="Flags without pension not ignored")
+        self.assertEqual(
+            (cache.hits, cache.misses, len(cache)), (2, 1, 1)
+        )
+        self.assertAlmostEqual(cache.hitRate, 2/3)
+
+        expected = calculatePayslip(self.year, 30000, 1000, percentage=5,
+                                    pre_tax=True)
+        payslip = cache.payslip(self.year, 30000, 1000, percentage=5,
+                                pre_tax=True)
+        self.assertEqual(payslip.netIncome, expected.netIncome)
+        self.assertEqual(cache.misses, 2)
+
+    def test_lru_eviction(self):
+        """Test the least recently used payslip is evicted"""
+        cache = PayslipCache(maxSize=2)
+        cache.payslip(self.year, 10000)
+        cache.payslip(self.year, 20000)
+        cache.payslip(self.year, 10000)
+        cache.payslip(self.year, 30000)
+
+        self.assertEqual(cache.evictions, 1)
+        cache.payslip(self.year, 10000)
+        self.assertEqual(cache.stats()['hits'], 2, msg="Recent entry evicted")
+        cache.payslip(self.year, 20000)
+        self.assertEqual(cache.misses, 4)
+
+    def test_uncacheable_inputs(self):
+        """Test invalid inputs are calculated but not cached"""
+        cache = PayslipCache()
+        self.assertEqual(
+            cache.payslip(self.year, 'abc').message, "Value not valid"
+        )
+        self.assertEqual(
+            cache.payslip('not a year', 1000).message, "Year not valid"
+        )
+        self.assertEqual(len(cache), 0)
+
+    def test_numpy_amounts_share_float_result(self):
+        """Test a hit returns what a miss on plain floats would compute"""
+        expected = calculatePayslip('2018-2019', 144763.25, 0.0, 3000.0)
+        cache = PayslipCache()
+        cache.payslip('2018-2019', np.float64(144763.25), 0.0, 3000)
+        payslip = cache.payslip('2018-2019', 144763.25, 0.0, 3000.0)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(
+            payslip.niPaid, expected.niPaid,
+            msg="Cached payslip depends on the type of the first call"
+        )
+
+    def test_rate_change_recomputes(self):
+        """Test cached payslips are not used after the rates change"""
+        cache = PayslipCache()
+        before = cache.payslip(self.year, 60000)
+        clearScheduleCache()
+        after = cache.payslip(self.year, 60000)
+
+        self.assertIsNot(before, after, msg="Stale payslip returned")
+        self.assertEqual(before.netIncome, after.netIncome)
+
+    def test_batch_deduplicate(self):
+        """Test collapsing duplicate rows gives identical results"""
+        rng = np.random.default_rng(18)
+        grades = np.round(rng.uniform(-1000, 160000, 40), 2)
+        incomeTaxable = grades[rng.integers(0, 40, 2000)]
+        expensePreTax = np.array([0.0, 500.0])[rng.integers(0, 2, 2000)]
+
+        expected = calculateBatch(
+            self.year, incomeTaxable, expensePreTax=expensePreTax,
+            percentage=4, post_tax=True
+        )
+        result = calculateBatch(
+            self.year, incomeTaxable, expensePreTax=expensePreTax,
+            percentage=4, post_tax=True, deduplicate=True
+        )
+        for field in expected.fields:
+            self.assertTrue(np.array_equal(
+                getattr(result, field).value, getattr(expected, field).value
+            ), msg=f"{field} differs when deduplicated")
+            self.assertTrue(np.array_equal(
+                getattr(result, field).status, getattr(expected, field).status
+            ))
+
+
+class IncrementalUpdateUnitTests(TestCase):
+    """Class to test selective invalidation of cached results"""
+    year = '2021-2022'
+
+    def test_unaffected_results_kept(self):
+        """Test changing an expense keeps PAYE and NI cached"""
+        e = EmployeeSalaryInfo("What if")
+        e.addTaxableIncome([45000])
+        e.getNetIncome(self.year)
+        misses = e.cacheMisses
+
+        e.addPostTaxExpense([250])
+        e.getNetIncome(self.year)
+        self.assertEqual(
+            e.cacheMisses - misses, 2,
+            msg="Only deductions and net income should be recomputed"
+        )
+
+        e.addNonTaxableIncome([100])
+        e.getNetIncome(self.year)
+        self.assertEqual(e.cacheMisses - misses, 4)
+
+    def test_add_remove_matches_fresh_employee(self):
+        """Test a sweep of changes gives the results of a fresh employee"""
+        rng = np.random.default_rng(19)
+        e = EmployeeSalaryInfo("What if")
+        e.addTaxableIncome([30000])
+        fields = ['TaxableIncome', 'NonTaxableIncome', 'PostTaxExpense']
+
+        for _ in range(200):
+            field = fields[rng.integers(0, 3)]
+            amount = float(np.round(rng.uniform(0, 5000), 2))
+            getattr(e, 'add' + field)([amount])
+            e.getNetIncome(self.year)
+            if rng.integers(0, 2):
+                self.assertTrue(getattr(e, 'remove' + field)([amount]))
+
+            fresh = EmployeeSalaryInfo("Fresh")
+            fresh.incomeTaxable = e.incomeTaxable
+            fresh.incomeNonTaxable = e.incomeNonTaxable
+            fresh.expensePostTax = e.expensePostTax
+            self.assertEqual(
+                e.getNetIncome(self.year).value,
+                fresh.getNetIncome(self.year).value,
+                msg="Incremental result differs from a full recompute"
+            )
+
+    def test_remove_is_all_or_nothing(self):
+        """Test removing more than was added changes nothing"""
+        e = EmployeeSalaryInfo("What if")
+        e.addTaxableIncome([0.1, 0.2])
+        self.assertFalse(e.removeTaxableIncome([0.1, 1]))
+        self.assertFalse(e.removeTaxableIncome([-1]))
+        self.assertAlmostEqual(e.incomeTaxable, 0.3)
+
+        self.assertTrue(e.removeTaxableIncome([0.1, 0.2]))
+        self.assertEqual(e.incomeTaxable, 0.0)
+
+
+class PayrollBinaryUnitTests(TestCase):
+    """Class to test memory-mapped payroll and results files"""
+    year = '2021-2022'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.payrollPath = os.path.join(directory.name, 'payroll.npy')
+        self.resultsPath = os.path.join(directory.name, 'results.npy')
+        self.directory = directory.name
+
+        rng = np.random.default_rng(20)
+        self.batch = EmployeeBatch()
+        self.batch.extend(
+            [f'employee {i}' for i in range(1000)],
+            np.round(rng.uniform(-100, 160000, 1000), 2),
+            np.round(rng.uniform(0, 3000, 1000), 2),
+            np.round(rng.uniform(0, 9000, 1000), 2),
+            np.round(rng.uniform(0, 500, 1000), 2),
+        )
+        payroll_binary.writePayroll(self.payrollPath, self.batch)
+
+    def test_records_mapped_without_copy(self):
+        """Test the payroll file opens as a memory map of the records"""
+        records = payroll_binary.openPayroll(self.payrollPath)
+
+        self.assertIsInstance(records, np.memmap)
+        self.assertEqual(
+            payroll_binary.decodeNames(records[:2]),
+            ['employee 0', 'employee 1']
+        )
+        self.assertTrue(np.array_equal(
+            records['incomeTaxable'], self.batch.column('incomeTaxable')
+        ))
+
+    def test_results_match_batch(self):
+        """Test results written to the mapped file match calculateBatch"""
+        results = payroll_binary.calculatePayroll(
+            self.payrollPath, self.resultsPath, self.year, chunkRows=300
+        )
+        expected = self.batch.calculate(self.year)
+
+        for field in expected.fields:
+            self.assertTrue(np.array_equal(
+                results[field], getattr(expected, field).value
+            ), msg=f"{field} differs from calculateBatch")
+            self.assertTrue(np.array_equal(
+                results[f'{field}Status'], getattr(expected, field).status
+            ))
+
+    def test_partial_rerun(self):
+        """Test a rerun of some rows leaves the other results in place"""
+        payroll_binary.calculatePayroll(
+            self.payrollPath, self.resultsPath, self.year
+        )
+        before = np.array(payroll_binary.openPayroll(self.resultsPath))
+
+        results = payroll_binary.calculatePayroll(
+            self.payrollPath, self.resultsPath, 'not a year',
+            start=100, stop=200
+        )
+        self.assertFalse(results['netIncomeStatus'][100:200].any())
+        self.assertTrue(np.array_equal(results[:100], before[:100]))
+        self.assertTrue(np.array_equal(results[200:], before[200:]))
+
+    def test_convert_and_limits(self):
+        """Test CSV conversion and the name width limit"""
+        csvPath = os.path.join(self.directory, 'in.csv')
+        with open(csvPath, 'w') as file:
+            file.write('employee_name,incomeTaxable\na,30000\nb,-1\n')
+
+        stats = payroll_binary.convertRecords(csvPath, self.payrollPath)
+        self.assertEqual((stats.rowsWritten, stats.rowsRejected), (1, 1))
+        records = payroll_binary.openPayroll(self.payrollPath)
+        self.assertEqual(records['incomeTaxable'].tolist(), [30000.0])
+
+        with self.assertRaises(ValueError):
+            payroll_binary.encodeNames(['x' * 40])
+
+
+class MonthlyPayrollUnitTests(TestCase):
+    """Class to test the cumulative monthly payroll"""
+    year = '2021-2022'
+
+    def setUp(self):
+        rng = np.random.default_rng(21)
+        self.batch = EmployeeBatch()
+        self.batch.extend(
+            [f'e{i}' for i in range(500)],
+            np.round(rng.uniform(0, 160000, 500), 2),
+            expensePreTax=np.round(rng.uniform(0, 3000, 500), 2),
+        )
+
+    def test_year_matches_annual(self):
+        """Test twelve equal months add up to the annual PAYE and NI"""
+        payroll = MonthlyPayroll(self.year, len(self.batch))
+        for _ in range(12):
+            payroll.advanceBatch(self.batch)
+
+        annual = self.batch.calculate(self.year)
+        valid = annual.payePaid.status
+        self.assertLessEqual(
+            np.abs(payroll.payeToDate - annual.payePaid.value)[valid].max(),
+            0.01 + 1e-9,
+            msg="Cumulative PAYE differs from annual PAYE"
+        )
+        self.assertLessEqual(
+            np.abs(payroll.niToDate - annual.niPaid.value)[valid].max(),
+            0.12,
+            msg="Period NI differs from annual NI by more than rounding"
+        )
+        with self.assertRaises(ValueError):
+            payroll.advanceBatch(self.batch)
+
+    def test_cumulative_refund(self):
+        """Test a month without pay refunds tax overpaid to date"""
+        payroll = MonthlyPayroll(self.year, 1)
+        first = payroll.advance([5000.0])
+        second = payroll.advance([0.0])
+
+        paye = getYearSchedule(self.year).paye
+        self.assertEqual(
+            first.payePaid.value[0], round(paye.taxDue(60000) / 12, 2)
+        )
+        self.assertLess(second.payePaid.value[0], 0, msg="No refund given")
+        self.assertEqual(second.niPaid.value[0], 0.0)
+        self.assertEqual(
+            payroll.payeToDate[0], round(paye.taxDue(30000) / 6, 2)
+        )
+
+    def test_invalid_rows_and_state(self):
+        """Test invalid rows keep their state and state can be saved"""
+        payroll = MonthlyPayroll(self.year, 2)
+        result = payroll.advance([3000.0, -1.0])
+        self.assertEqual(result.netPay.status.tolist(), [True, False])
+        self.assertEqual(payroll.payToDate[1], 0.0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'state.npz')
+            payroll.save(path)
+            loaded = MonthlyPayroll.load(path)
+
+        self.assertEqual(loaded.period, 1)
+        self.assertEqual(loaded.year, self.year)
+        self.assertTrue(np.array_equal(loaded.payeToDate, payroll.payeToDate))
+        with self.assertRaises(KeyError):
+            MonthlyPayroll('not a year', 1)
+
+
+class PayEventUnitTests(TestCase):
+    """Class to test dated pay events and period payslips"""
+    year = '2021-2022'
+
+    def test_tax_months(self):
+        """Test dates map to tax months starting on 6 April"""
+        self.assertEqual(taxPeriod(self.year, datetime.date(2021, 4, 6)), 1)
+        self.assertEqual(taxPeriod(self.year, datetime.date(2021, 5, 5)), 1)
+        self.assertEqual(taxPeriod(self.year, datetime.date(2021, 5, 6)), 2)
+        self.assertEqual(taxPeriod(self.year, datetime.date(2022, 4, 5)), 12)
+        with self.assertRaises(ValueError):
+            taxPeriod(self.year, datetime.date(2022, 4, 6))
+
+    def test_no_events_match_annual(self):
+        """Test a year without events prorates to the annual figures"""
+        e = EmployeeSalaryInfo("Steady")
+        e.addTaxableIncome([42000])
+        e.addPostTaxExpense([600])
+
+        prorated = e.getProratedPayslip(self.year)
+        self.assertAlmostEqual(
+            prorated.payePaid, e.getPAYEPaid(self.year).value, delta=0.011
+        )
+        self.assertAlmostEqual(
+            prorated.niPaid, e.getNIPaid(self.year).value, delta=0.12
+        )
+        self.assertEqual(
+            prorated.netIncome,
+            round(prorated.grossIncome - prorated.deductions, 2)
+        )
+
+    def test_matches_monthly_engine(self):
+        """Test a pay rise and a leaver agree with MonthlyPayroll"""
+        e = EmployeeSalaryInfo("Changes")
+        e.addTaxableIncome([30000])
+        self.assertTrue(e.addEvent(
+            self.year, datetime.date(2021, 9, 10), 'incomeTaxable', 48000
+        ))
+        self.assertTrue(e.addEvent(self.year, 11, 'incomeTaxable', 0))
+
+        payroll = MonthlyPayroll(self.year, 1)
+        for payslip in e.getPeriodPayslips(self.year):
+            pay = 30000 if payslip.period < 6 else \
+                48000 if payslip.period < 11 else 0
+            result = payroll.advance([pay / 12])
+            self.assertEqual(
+                (payslip.payePaid, payslip.niPaid, payslip.netPay),
+                (result.payePaid.value[0], result.niPaid.value[0],
+                 result.netPay.value[0]),
+                msg=f"Month {payslip.period} differs from MonthlyPayroll"
+            )
+
+    def test_new_event_recomputes_later_months(self):
+        """Test only months from a new event on are recomputed"""
+        e = EmployeeSalaryInfo("Starter")
+        self.assertTrue(e.addEvent(self.year, 4, 'incomeTaxable', 36000))
+        first = e.getPeriodPayslips(self.year)
+        self.assertEqual(e.periodsComputed, 12)
+        self.assertEqual(first[2].grossPay, 0.0)
+        self.assertEqual(first[3].grossPay, 3000.0)
+
+        self.assertTrue(e.addEvent(self.year, 10, 'expensePostTax', 1200))
+        second = e.getPeriodPayslips(self.year)
+        self.assertEqual(e.periodsComputed, 15, msg="Earlier months rerun")
+        self.assertIs(second[8], first[8])
+        self.assertEqual(second[9].netPay, first[9].netPay - 100)
+
+        e.addTaxableIncome([100])
+        e.getPeriodPayslips(self.year)
+        self.assertEqual(e.periodsComputed, 27, msg="Field change ignored")
+
+    def test_invalid_events(self):
+        """Test bad events are refused and bad years reported"""
+        e = EmployeeSalaryInfo("Bad")
+        self.assertFalse(e.addEvent(self.year, 13, 'incomeTaxable', 1))
+        self.assertFalse(e.addEvent(self.year, 2, 'bonus', 1))
+        self.assertFalse(e.addEvent(self.year, 2, 'incomeTaxable', -1))
+        self.assertEqual(
+            e.getProratedPayslip('not a year').message, "Year not valid"
+        )
+
+    def test_row_events_not_accepted(self):
+        """Test a row view refuses events rather than losing them"""
+        batch = EmployeeBatch()
+        batch.extend(['a'], [36000.0])
+        self.assertFalse(
+            batch[0].addEvent(self.year, 7, 'incomeTaxable', 48000.0),
+            msg="Row view accepted an event it cannot keep"
+        )
+        self.assertEqual(
+            batch[0].getProratedPayslip(self.year).grossIncome, 36000.0
+        )
+
+        row = batch[0]
+        row.getPeriodPayslips(self.year)
+        batch[0].incomeTaxable = 48000.0
+        self.assertEqual(
+            row.getProratedPayslip(self.year).grossIncome, 48000.0,
+            msg="Row view kept period payslips from before a change"
+        )
+
+
+class IncomeIndexUnitTests(TestCase):
+    """Class to test recalculating rows a rate change affects"""
+    year = 'budget-2021-2022'
+
+    def setUp(self):
+        income_calculator.taxRates[self.year] = {
+            key: dict(band) for key, band in
+            income_calculator.taxRates['2021-2022'].items()
+        }
+        self.addCleanup(clearScheduleCache)
+        self.addCleanup(income_calculator.taxRates.pop, self.year)
+
+        rng = np.random.default_rng(23)
+        self.batch = EmployeeBatch()
+        self.batch.extend(
+            [f'e{i}' for i in range(2000)],
+            np.round(rng.uniform(-100, 200000, 2000), 2),
+            expensePreTax=np.round(rng.uniform(0, 5000, 2000), 2),
+            expensePostTax=np.round(rng.uniform(0, 500, 2000), 2),
+        )
+        self.index = IncomeIndex(self.batch)
+
+    def changeRates(self, key, threshold):
+        income_calculator.taxRates[self.year][key]['threshold'] = threshold
+        clearScheduleCache()
+
+    def assertMatchesFullRun(self):
+        expected = self.batch.calculate(self.year)
+        result = self.index.results[self.year]
+        for field in expected.fields:
+            self.assertTrue(np.array_equal(
+                getattr(result, field).value, getattr(expected, field).value
+            ), msg=f"{field} differs from a full recalculation")
+
+    def test_changed_ranges(self):
+        """Test only incomes above a moved threshold change"""
+        old = getYearSchedule(self.year)
+        self.changeRates('PAYE_rate3', 125140.0)
+        self.assertEqual(
+            changedRanges(old, getYearSchedule(self.year)),
+            [(125140.0, float('inf'))]
+        )
+        self.assertEqual(changedRanges(old, old), [])
+
+    def test_refresh_recalculates_affected_rows(self):
+        """Test a threshold change recalculates only affected employees"""
+        self.index.calculate(self.year)
+        self.changeRates('PAYE_rate3', 125140.0)
+
+        rows = self.index.refresh(self.year)
+        taxable = self.batch.column('incomeTaxable') \
+            - self.batch.column('expensePreTax')
+        self.assertEqual(
+            sorted(rows.tolist()),
+            np.flatnonzero(taxable > 125140.0).tolist(),
+            msg="Recalculated rows are not those above the threshold"
+        )
+        self.assertLess(len(rows), len(self.batch) / 2)
+        self.assertMatchesFullRun()
+
+        self.assertEqual(len(self.index.refresh(self.year)), 0)
+
+    def test_refresh_ni_and_invalid_year(self):
+        """Test NI changes and years becoming valid are picked up"""
+        self.index.calculate(self.year)
+        self.changeRates('NI_rate1', 9000.0)
+        self.index.refresh(self.year)
+        self.assertMatchesFullRun()
+
+        self.index.calculate('not a year')
+        self.assertEqual(
+            len(self.index.refresh('not a year')), len(self.batch)
+        )
+
+
+class BandQueryUnitTests(TestCase):
+    """Class to test band queries over the income index"""
+    year = '2021-2022'
+
+    def setUp(self):
+        rng = np.random.default_rng(24)
+        self.batch = EmployeeBatch()
+        self.batch.extend(
+            [f'e{i}' for i in range(3000)],
+            np.round(rng.uniform(-100, 200000, 3000), 2),
+            expensePreTax=np.round(rng.uniform(0, 5000, 3000), 2),
+        )
+        self.index = IncomeIndex(self.batch)
+
+        incomeTaxable = self.batch.column('incomeTaxable')
+        expensePreTax = self.batch.column('expensePreTax')
+        self.taxable = np.where(
+            incomeTaxable > expensePreTax, incomeTaxable - expensePreTax,
+            -np.inf
+        )
+
+    def test_counts_and_rows(self):
+        """Test band counts and members match a full scan"""
+        for kind in ['paye', 'ni']:
+            schedule = getattr(getYearSchedule(self.year), kind)
+            bands = schedule.bandIndex
+            expected = [bands(income) for income in self.taxable]
+
+            counts = self.index.bandCounts(self.year, kind)
+            for band in range(len(schedule.thresholds)):
+                self.assertEqual(counts[band], expected.count(band))
+                self.assertEqual(
+                    sorted(self.index.bandRows(self.year, band, kind)),
+                    [row for row, value in enumerate(expected)
+                     if value == band],
+                    msg=f"{kind} band {band} members differ from a scan"
+                )
+
+    def test_band_tax_totals(self):
+        """Test per band tax sums to the total of every employee's tax"""
+        valid = np.isfinite(self.taxable)
+        for kind in ['paye', 'ni']:
+            schedule = getattr(getYearSchedule(self.year), kind)
+            total = sum(
+                schedule.taxDue(income) for income in self.taxable[valid]
+            )
+            bandTotal = sum(
+                self.index.bandTax(self.year, band, kind)
+                for band in range(len(schedule.thresholds))
+            )
+            self.assertAlmostEqual(bandTotal, total, delta=1e-4)
+
+        top = getYearSchedule(self.year).paye
+        self.assertAlmostEqual(
+            self.index.bandTax(self.year, 2),
+            sum(0.45 * (income - top.thresholds[2])
+                for income in self.taxable if income > top.thresholds[2]),
+            delta=1e-5
+        )
+        with self.assertRaises(KeyError):
+            self.index.bandCounts('not a year')
+
+
+class PayrollStatsUnitTests(TestCase):
+    """Class to test streaming payroll statistics"""
+    year = '2021-2022'
+
+    def setUp(self):
+        rng = np.random.default_rng(25)
+        size = 20000
+        self.incomeTaxable = np.round(rng.lognormal(10.3, 0.6, size), 2)
+        self.incomeTaxable[:50] = -1.0
+        self.expensePostTax = np.round(rng.uniform(0, 3000, size), 2)
+        self.result = calculateBatch(
+            self.year, self.incomeTaxable, None, None, self.expensePostTax,
+            percentage=5, pre_tax=True
+        )
+        self.edges = getYearSchedule(self.year).paye.thresholds
+
+    def newStats(self):
+        return PayrollStats(histograms=[(self.edges, 'grossIncome')])
+
+    def test_batch_totals_and_quantiles(self):
+        """Test batch totals are exact and quantiles within accuracy"""
+        stats = self.newStats()
+        stats.addBatch(self.result)
+        valid = self.result.netIncome.status
+        self.assertEqual(stats.totals.failed, 50)
+        self.assertEqual(len(stats), np.count_nonzero(valid))
+
+        for field in ['payePaid', 'niPaid', 'pension', 'netIncome']:
+            values = getattr(self.result, field).value[valid]
+            self.assertEqual(
+                stats.totals.pence[field],
+                sum(round(value * 100) for value in values.tolist()),
+                msg=f"{field} total is not exact"
+            )
+
+        net = np.sort(self.result.netIncome.value[valid])
+        for q in [0.5, 0.9, 0.99]:
+            exact = net[int(q * (len(net) - 1))]
+            self.assertLessEqual(
+                abs(stats.quantile(q) - exact), 0.01 * exact + 1e-9,
+                msg=f"Quantile {q} outside the relative accuracy"
+            )
+
+        histogram = stats.histograms[0]
+        gross = self.result.grossIncome.value[valid]
+        self.assertEqual(histogram.counts.sum(), len(gross))
+        self.assertEqual(
+            histogram.counts[-1], np.count_nonzero(gross >= self.edges[-1])
+        )
+
+    def test_scalar_matches_batch(self):
+        """Test payslips added one at a time match a batch"""
+        scalar = self.newStats()
+        for incomeTaxable, expensePostTax in zip(
+                self.incomeTaxable[:2000].tolist(),
+                self.expensePostTax[:2000].tolist()):
+            scalar.add(calculatePayslip(
+                self.year, incomeTaxable, 0.0, 0.0, expensePostTax,
+                percentage=5, pre_tax=True
+            ))
+        batch = self.newStats()
+        batch.addBatch(self.result.take(np.arange(2000)))
+
+        self.assertEqual(scalar.summary(), batch.summary())
+        self.assertEqual(scalar.netIncome.positive, batch.netIncome.positive)
+        self.assertTrue(np.array_equal(
+            scalar.histograms[0].pence, batch.histograms[0].pence
+        ))
+
+        employee = EmployeeSalaryInfo('stats')
+        employee.addTaxableIncome([30000])
+        figures = PayrollStats()
+        figures.addFigures(
+            payePaid=employee.getPAYEPaid(self.year),
+            netIncome=employee.getNetIncome(self.year)
+        )
+        figures.addFigures(netIncome=employee.getNetIncome('not a year'))
+        self.assertEqual(figures.totals.count, 1)
+        self.assertEqual(figures.totals.failed, 1)
+        self.assertEqual(
+            figures.totals.total('netIncome'),
+            employee.getNetIncome(self.year).value
+        )
+
+    def test_merge_in_any_order(self):
+        """Test merged partials match one pass whatever the order"""
+        whole = self.newStats()
+        whole.addBatch(self.result)
+
+        partials = []
+        for rows in np.array_split(np.arange(len(self.result)), 7):
+            partial = self.newStats()
+            partial.addBatch(self.result.take(rows))
+            partials.append(partial)
+
+        for order in [range(7), [6, 2, 4, 0, 5, 1, 3]]:
+            merged = self.newStats()
+            for index in order:
+                merged.merge(partials[index])
+            self.assertEqual(merged.summary(), whole.summary())
+            self.assertEqual(
+                merged.netIncome.positive, whole.netIncome.positive
+            )
+            self.assertTrue(np.array_equal(
+                merged.histograms[0].counts, whole.histograms[0].counts
+            ))
+
+        # few buckets so folding happens, and a low part merged late must
+        # still be folded into the floor of the highest key
+        rng = np.random.default_rng(2025)
+        value = QuantileSketch()._value
+        groups = [
+            [[value(29), value(32)], [value(12)], [value(79), value(81)]],
+            [np.round(rng.lognormal(10, 1.5, size), 2)
+             for size in [3, 40, 1, 500]],
+        ]
+        for parts in groups:
+            sketches = []
+            for part in parts:
+                sketch = QuantileSketch(maxBuckets=3)
+                sketch.addArray(part)
+                sketches.append(sketch)
+            expected = QuantileSketch(maxBuckets=3)
+            expected.addArray(np.concatenate(parts))
+
+            for _ in range(20):
+                merged = QuantileSketch(maxBuckets=3)
+                for index in rng.permutation(len(sketches)):
+                    merged.merge(sketches[index])
+                self.assertEqual(
+                    merged.positive, expected.positive,
+                    msg="Folded buckets depend on the merge order"
+                )
+                self.assertLessEqual(len(merged.positive), 3)
+
+        with self.assertRaises(ValueError):
+            whole.merge(PayrollStats())
+        with self.assertRaises(ValueError):
+            PayHistogram([0, 1]).merge(PayHistogram([0, 2]))
+
+    def test_sketch_bounded(self):
+        """Test the sketch keeps at most maxBuckets buckets per sign"""
+        sketch = QuantileSketch(relativeAccuracy=0.01, maxBuckets=64)
+        values = np.geomspace(0.02, 1e9, 10000)
+        sketch.addArray(values)
+        sketch.addArray(-values[:10])
+        sketch.add(0.0)
+        self.assertLessEqual(len(sketch.positive), 64)
+        self.assertEqual(len(sketch), 10011)
+        self.assertAlmostEqual(
+            sketch.quantile(0.99) / values[int(0.99 * 10010) - 11],
+            1, delta=0.02
+        )
+        self.assertAlmostEqual(
+            sketch.quantile(0) / -values[9], 1, delta=0.01
+        )
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))